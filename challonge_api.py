@@ -0,0 +1,324 @@
+"""Client for the Challonge API (v2.1, JSON:API).
+
+ChallongeClient keeps one aiohttp session - and with it a pool of keep-alive
+connections - for as long as its owner needs it, instead of opening a new
+session (TCP + TLS handshake) per request. cogs/challonge.py owns one for the
+cog's lifetime and closes it in cog_unload.
+
+Transient failures don't reach the caller on the first try: a 429 waits out
+its Retry-After, and 5xx answers and timeouts are retried with exponential
+backoff and jitter - as long as the request is safe to send twice. Every
+request first takes a token from its host's TokenBucket, which keeps the bot
+under Challonge's rate limit; a 429 pauses that bucket for every request.
+Whatever the client gives up on is raised as a ChallongeError subclass.
+
+The base URL is a constructor argument (CHALLONGE_BASE_URL by default), so the
+client can be pointed at a local stand-in server - scripts/stress_challonge.py
+runs it against one that injects failures.
+
+Lives outside cogs/ because main.py loads every module in there as an
+extension; the token buckets live here too, so a reloaded cog keeps sharing
+them.
+"""
+import asyncio
+import collections
+import datetime
+import email.utils
+import random
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+import settings
+
+logger = settings.logging.getLogger("bot")
+
+# Methods that can be sent again after a 5xx or timeout without doing the work twice
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "PATCH", "DELETE"}
+
+
+class ChallongeError(Exception):
+    """A request the client gave up on. `status` is the HTTP status, None if there was no answer."""
+
+    transient = False  # whether the same request could succeed later
+
+    def __init__(self, status, text):
+        super().__init__(f"Challonge API Error ({status}): {text}")
+        self.status = status
+        self.text = text
+
+
+class ChallongeRateLimited(ChallongeError):
+    """429 - still limited after the retries, or told to wait longer than CHALLONGE_BACKOFF_MAX."""
+
+    transient = True
+
+    def __init__(self, status, text, retry_after=None):
+        super().__init__(status, text)
+        self.retry_after = retry_after
+
+
+class ChallongeServerError(ChallongeError):
+    """5xx."""
+
+    transient = True
+
+
+class ChallongeConnectionError(ChallongeError):
+    """No answer: the connection failed or the request timed out. `sent` is False if the
+    request never left (couldn't connect), so it's safe to send again whatever the method."""
+
+    transient = True
+
+    def __init__(self, text, sent=True):
+        super().__init__(None, text)
+        self.sent = sent
+
+
+def _error_for(status, text, retry_after=None):
+    if status == 429:
+        return ChallongeRateLimited(status, text, retry_after)
+    if status >= 500:
+        return ChallongeServerError(status, text)
+    return ChallongeError(status, text)
+
+
+def _retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or an HTTP date); None if absent or invalid."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, in bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Waits for a token and takes it; returns the seconds spent waiting."""
+        waited = 0.0
+        # Waiters queue on the lock, so tokens go out first come, first served
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                delay = self._paused_until - now
+                if delay <= 0:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return waited
+                    delay = (1 - self._tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+    def pause(self, seconds):
+        """Hands out no tokens for the next `seconds` (the server sent a 429)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+
+_buckets = {}
+
+
+def bucket_for(host):
+    """The TokenBucket shared by every request to `host`."""
+    if host not in _buckets:
+        _buckets[host] = TokenBucket(settings.CHALLONGE_RATE_LIMIT, settings.CHALLONGE_RATE_BURST)
+    return _buckets[host]
+
+
+class ChallongeClient:
+    """One pooled aiohttp session for Challonge requests, opened on first use."""
+
+    def __init__(self, api_key, base_url=None, *, max_connections=None, keepalive=None,
+                 timeout=None, connect_timeout=None, retries=None):
+        self.base_url = (base_url or settings.CHALLONGE_BASE_URL).rstrip("/")
+        self.bucket = bucket_for(urlsplit(self.base_url).netloc)
+        self.headers = {
+            "Content-Type": "application/vnd.api+json",
+            "Accept": "application/json",
+            "Authorization-Type": "v1",
+            "Authorization": api_key or "",
+        }
+        self.max_connections = max_connections or settings.CHALLONGE_MAX_CONNECTIONS
+        self.keepalive = keepalive if keepalive is not None else settings.CHALLONGE_KEEPALIVE
+        self.timeout = aiohttp.ClientTimeout(
+            total=timeout or settings.CHALLONGE_TIMEOUT,
+            connect=connect_timeout or settings.CHALLONGE_CONNECT_TIMEOUT,
+        )
+        self.retries = retries if retries is not None else settings.CHALLONGE_RETRIES
+        self._session = None
+
+        # Counters for stats()
+        self.requests = 0
+        self.attempts = 0
+        self.retried = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.throttled = 0
+        self.throttle_wait = 0.0
+        self.statuses = collections.Counter()
+        self.latencies = collections.deque(maxlen=500)  # seconds per attempt, most recent last
+
+    @property
+    def session(self):
+        # Created lazily: aiohttp wants its session made inside the running event loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections,
+                keepalive_timeout=self.keepalive,
+            )
+            self._session = aiohttp.ClientSession(
+                headers=self.headers, timeout=self.timeout, connector=connector,
+            )
+        return self._session
+
+    async def request(self, method, endpoint, json_body=None, params=None):
+        """Sends one request and returns the decoded JSON body ({} for an empty response).
+
+        Retried up to CHALLONGE_RETRIES times on a 429, and on a 5xx or timeout
+        if it's safe to send twice; raises a ChallongeError once it gives up.
+        """
+        url = endpoint if self._owns(endpoint) else f"{self.base_url}/{endpoint.lstrip('/')}"
+        self.requests += 1
+        attempt = 0
+        while True:
+            waited = await self.bucket.acquire()
+            if waited:
+                self.throttled += 1
+                self.throttle_wait += waited
+            try:
+                return await self._send(method, url, json_body, params)
+            except ChallongeError as e:
+                delay = self._retry_delay(method, attempt, e)
+                if delay is None:
+                    self.failures += 1
+                    raise
+                attempt += 1
+                self.retried += 1
+                logger.warning(f"Challonge {method} {endpoint} failed ({e.status or e.text}), "
+                               f"retry {attempt}/{self.retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def paginate(self, endpoint, params=None, page_size=None):
+        """Yields the JSON payload of each page of a list endpoint, in order, as it arrives.
+
+        Follows links.next. A response without pagination links gets the next page
+        number asked for until one comes back empty (or repeats the previous page,
+        i.e. the endpoint doesn't page) - a short page could just mean the server
+        capped per_page. The next page is already being fetched while the caller
+        works through the current one.
+        """
+        params = dict(params or {}, page=1, per_page=page_size or settings.CHALLONGE_PAGE_SIZE)
+        seen = set()
+        previous_first = None
+        fetch = asyncio.ensure_future(self.request("GET", endpoint, params=params))
+        try:
+            while fetch is not None:
+                payload = await fetch
+                fetch = None
+                items = payload.get("data") or []
+                first = items[0].get("id") if items and isinstance(items[0], dict) else None
+                if not items or (first is not None and first == previous_first):
+                    return
+                previous_first = first
+                params = dict(params, page=params["page"] + 1)
+                links = payload.get("links")
+                next_link = (links or {}).get("next")
+                if next_link in seen:
+                    pass  # Pointing back at a page we've had, e.g. the last page linking to itself
+                elif next_link and self._owns(next_link):
+                    seen.add(next_link)
+                    fetch = asyncio.ensure_future(self.request("GET", next_link))
+                elif links is None or next_link:
+                    fetch = asyncio.ensure_future(self.request("GET", endpoint, params=params))
+                yield payload
+        finally:
+            # The caller stopped early (or a page failed) - don't leave the prefetch running
+            if fetch is not None:
+                fetch.cancel()
+
+    def _owns(self, url):
+        """Whether `url` is an absolute link into this client's API (only those get the API key)."""
+        return url.startswith(self.base_url + "/")
+
+    async def _send(self, method, url, json_body, params):
+        self.attempts += 1
+        started = time.perf_counter()
+        try:
+            async with self.session.request(method, url, params=params, json=json_body) as response:
+                self.statuses[response.status] += 1
+                text = await response.text()
+                if response.status // 100 != 2:
+                    retry_after = _retry_after(response.headers.get("Retry-After"))
+                    if response.status == 429:
+                        self.rate_limited += 1
+                        self.bucket.pause(retry_after if retry_after is not None else settings.CHALLONGE_BACKOFF_BASE)
+                    raise _error_for(response.status, text, retry_after)
+                if response.status == 204 or not text:
+                    return {}
+                return await response.json(content_type=None)
+        except aiohttp.ClientConnectorError as e:
+            raise ChallongeConnectionError(str(e) or type(e).__name__, sent=False) from e
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise ChallongeConnectionError(str(e) or type(e).__name__) from e
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+
+    def _retry_delay(self, method, attempt, error):
+        """Seconds to wait before sending `error`'s request again, or None to give up."""
+        if attempt >= self.retries or not error.transient:
+            return None
+        if (isinstance(error, (ChallongeServerError, ChallongeConnectionError))
+                and method.upper() not in IDEMPOTENT_METHODS and getattr(error, "sent", True)):
+            # e.g. a POST that may have gone through anyway - the caller has to check before resending
+            return None
+        # Full jitter: anywhere up to the exponential step, so parallel requests don't retry in lockstep
+        delay = random.uniform(0, min(settings.CHALLONGE_BACKOFF_MAX, settings.CHALLONGE_BACKOFF_BASE * 2 ** attempt))
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after is not None:
+            if retry_after > settings.CHALLONGE_BACKOFF_MAX:
+                return None
+            delay = retry_after + delay / 4
+        return delay
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "attempts": self.attempts,
+            "retries": self.retried,
+            "failures": self.failures,
+            "rate_limited": self.rate_limited,
+            "throttled": self.throttled,
+            "throttle_wait": self.throttle_wait,
+            "statuses": dict(self.statuses),
+            "latency_avg": sum(latencies) / len(latencies) if latencies else 0.0,
+            "latency_p95": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+            "latency_max": latencies[-1] if latencies else 0.0,
+        }
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
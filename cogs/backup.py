@@ -1,6 +1,6 @@
 import settings
+import database
 from discord.ext import commands, tasks
-import shutil
 import os
 import time
 
@@ -17,7 +17,7 @@ def backup_db(custom_name=None, folder='backups_auto'):
     else:
         backup_filename = f'{custom_name}.db'
     backup_path = os.path.join(backup_folder, backup_filename)
-    shutil.copy2('elo_data.db', backup_path)
+    database.backup(backup_path)
 
 def remove_backup(custom_name, folder='backups_manual'):
     backup_folder = os.path.join('backups', folder)
@@ -48,12 +48,12 @@ class BackupCog(commands.Cog):
     @tasks.loop(hours=(4*7*24)) 
     async def backup_task(self):
         delete_oldest_files(os.path.join('backups', 'backups_auto'))
-        backup_db()
+        await database.run(backup_db)
 
     @commands.hybrid_command(name='backup', description='Make a backup of the database')
     @commands.has_any_role(*settings.BACKUP_ROLES)
     async def backup(self, ctx, custom_name: str):
-        backup_db(custom_name, folder='backups_manual')
+        await database.run(backup_db, custom_name, 'backups_manual')
         await ctx.send(f"Backup made with the name `{custom_name}`.")
 
     @commands.hybrid_command(name='remove_backup', description='Remove a backup from the server')
@@ -1,26 +1,28 @@
+import asyncio
 import datetime
+import json
 import os
 import re
-import sqlite3
+import time
 from io import BytesIO
-from typing import Dict, Any, List, Optional
+from typing import AsyncIterator, Dict, Any, List, Optional
 
-import aiohttp
 import discord
 from discord import app_commands
 from discord.ext import commands
 from dotenv import load_dotenv
 
+import challonge_api
+import database
+import locks
+import settings
+import standings
+
 # reuse elo-system functions
 from cogs.elo_system import (
-    get_elo,
-    set_elo,
-    calculate_score_change,
-    update_elo,
-    get_highest_elo,
-    set_highest_elo,
-    update_historical_rankings,
-    get_multiplier,
+    _record_matches,
+    cache_match_results,
+    current_settings,
     grant_winner_rank_roles,
     grant_loser_rank_roles,
 )
@@ -33,14 +35,8 @@ CHALLONGE_API_KEY = os.getenv('CHALLONGE_API_TOKEN')
 # (e.g. "doomsumo" for challonge.com/communities/doomsumo). Leave unset to
 # create tournaments under the personal account instead.
 CHALLONGE_COMMUNITY = os.getenv('CHALLONGE_COMMUNITY') or None
-DB_NAME = 'elo_data.db'
-CHALLONGE_BASE_URL = "https://api.challonge.com/v2.1"
-CHALLONGE_HEADERS = {
-    "Content-Type": "application/vnd.api+json",
-    "Accept": "application/json",
-    "Authorization-Type": "v1",
-    "Authorization": CHALLONGE_API_KEY or "",
-}
+BULK_ADD_SIZE = 50  # participants per bulk_add request
+PROGRESS_INTERVAL = 2  # min. seconds between edits of the "Adding participants" message
 
 
 def _unwrap(resource: Dict[str, Any]) -> Dict[str, Any]:
@@ -57,12 +53,43 @@ def _unwrap_list(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
     return [_unwrap(item) for item in payload.get("data", [])]
 
 
+def _import_matches(conn, tournament_id: str, matches: List[tuple], game):
+    """Records (challonge_match_id, winner_id, loser_id, date) matches, in order, in the caller's
+    transaction - skipping those an earlier import already processed - and marks them processed.
+    Returns [(challonge_match_id, MatchResult), ...] for the matches it recorded."""
+    c = conn.cursor()
+    c.execute(
+        "SELECT match_id FROM challonge_processed_matches WHERE match_id IN (SELECT value FROM json_each(?))",
+        (json.dumps([match_id for match_id, *_ in matches]),),
+    )
+    processed = {match_id for match_id, in c.fetchall()}
+    new_matches = [match for match in matches if match[0] not in processed]
+
+    results = _record_matches(conn, [(winner_id, loser_id, date) for _, winner_id, loser_id, date in new_matches], game)
+    processed_at = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    c.executemany(
+        "INSERT OR IGNORE INTO challonge_processed_matches (match_id, tournament_id, processed_at) VALUES (?, ?, ?)",
+        [(match_id, tournament_id, processed_at) for match_id, *_ in new_matches],
+    )
+    return [(match_id, result) for (match_id, *_), result in zip(new_matches, results)]
+
+
+def _worth_retrying(error: Exception) -> bool:
+    """Rate limits, server errors and network trouble pass; other 4xx answers won't change."""
+    return not isinstance(error, challonge_api.ChallongeError) or error.transient
+
+
+def _chunks(items: list, size: int):
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
 class ChallongeCommands(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.client = challonge_api.ChallongeClient(CHALLONGE_API_KEY)
 
-    def get_db_connection(self):
-        return sqlite3.connect(DB_NAME)
+    async def cog_unload(self):
+        await self.client.close()
 
     def clean_url_string(self, text: str):
         """Creates a valid URL string from a tournament name"""
@@ -74,65 +101,135 @@ class ChallongeCommands(commands.Cog):
 
     async def challonge_request(self, method, endpoint, json_body=None, params=None):
         """Helper function for sending Challonge API (v2.1, JSON:API) requests"""
-        url = f"{CHALLONGE_BASE_URL}/{endpoint}"
-
-        async with aiohttp.ClientSession() as session:
-            async with session.request(method, url, headers=CHALLONGE_HEADERS, params=params, json=json_body) as response:
-                if response.status // 100 != 2:
-                    error_text = await response.text()
-                    raise Exception(f"Challonge API Error ({response.status}): {error_text}")
-                if response.status == 204 or not await response.text():
-                    return {}
-                return await response.json()
+        return await self.client.request(method, endpoint, json_body=json_body, params=params)
 
     def _community_params(self) -> Optional[Dict[str, str]]:
         """Query params to scope a tournament-level request to CHALLONGE_COMMUNITY, if configured."""
         return {"community_id": CHALLONGE_COMMUNITY} if CHALLONGE_COMMUNITY else None
 
     # --- Challonge helpers
+    async def iter_participants(self, tournament_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yields flattened participant dicts (attributes + id) for a tournament, page by page as they arrive."""
+        async for page in self.client.paginate(
+            f"tournaments/{tournament_id}/participants.json", params=self._community_params()
+        ):
+            for participant in _unwrap_list(page):
+                yield participant
+
+    async def iter_matches(self, tournament_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yields flattened match dicts (attributes + id) for a tournament, page by page as they arrive."""
+        async for page in self.client.paginate(
+            f"tournaments/{tournament_id}/matches.json", params=self._community_params()
+        ):
+            for match in _unwrap_list(page):
+                yield match
+
     async def get_participants(self, tournament_id: str) -> List[Dict[str, Any]]:
         """Returns flattened participant dicts (attributes + id) for a tournament."""
-        resp = await self.challonge_request(
-            "GET", f"tournaments/{tournament_id}/participants.json", params=self._community_params()
-        )
-        return _unwrap_list(resp)
+        return [participant async for participant in self.iter_participants(tournament_id)]
 
     async def get_matches(self, tournament_id: str) -> List[Dict[str, Any]]:
         """Returns flattened match dicts (attributes + id) for a tournament."""
-        resp = await self.challonge_request(
-            "GET", f"tournaments/{tournament_id}/matches.json", params=self._community_params()
-        )
-        return _unwrap_list(resp)
-
-    def _ensure_processed_table(self):
-        """Ensures the table for preventing duplicate match processing exists."""
-        with self.get_db_connection() as conn:
-            c = conn.cursor()
-            c.execute(
-                """
-                CREATE TABLE IF NOT EXISTS challonge_processed_matches (
-                    match_id INTEGER PRIMARY KEY,
-                    tournament_id TEXT,
-                    processed_at TEXT
+        return [match async for match in self.iter_matches(tournament_id)]
+
+    async def _not_added_yet(self, challonge_id, participants: List[tuple]) -> List[tuple]:
+        """Drops the participants already on the tournament: a request that errored or timed out
+        may still have gone through, and retrying it would add them twice."""
+        try:
+            present = {str(p.get("misc")) for p in await self.get_participants(challonge_id)}
+        except Exception:
+            return participants
+        return [(name, user_id) for name, user_id in participants if str(user_id) not in present]
+
+    async def add_participants(self, challonge_id, participants: List[tuple], progress=None):
+        """Adds (name, discord_user_id) participants to a tournament.
+
+        Goes through the bulk_add endpoint, BULK_ADD_SIZE at a time. A batch it
+        refuses is added with one request per participant instead, at most
+        CHALLONGE_CONCURRENCY in flight. Whatever still failed is retried for up to
+        CHALLONGE_ADD_RETRIES more rounds rather than aborting the tournament.
+        `progress(done, total)` is awaited as participants go in.
+        Returns (added, failed) - failed being (name, user_id, error) tuples.
+        """
+        total = len(participants)
+        added = 0
+        errors: Dict[tuple, Exception] = {}
+        rejected = []  # refused outright (e.g. a name Challonge won't take); retrying won't help
+        use_bulk = True
+        semaphore = asyncio.Semaphore(settings.CHALLONGE_CONCURRENCY)
+        endpoint = f"tournaments/{challonge_id}/participants"
+
+        async def report(count):
+            nonlocal added
+            added += count
+            if progress and count:
+                await progress(added, total)
+
+        async def add_one(name, user_id):
+            async with semaphore:
+                await self.challonge_request(
+                    "POST",
+                    f"{endpoint}.json",
+                    json_body={"data": {"type": "participant", "attributes": {"name": name, "misc": str(user_id)}}},
+                    params=self._community_params(),
                 )
-                """
-            )
-            conn.commit()
-
-    def _is_match_processed(self, match_id: int) -> bool:
-        with self.get_db_connection() as conn:
-            c = conn.cursor()
-            c.execute("SELECT 1 FROM challonge_processed_matches WHERE match_id = ?", (match_id,))
-            return c.fetchone() is not None
-
-    def _mark_match_processed(self, match_id: int, tournament_id: str):
-        with self.get_db_connection() as conn:
-            c = conn.cursor()
-            c.execute(
-                "INSERT OR IGNORE INTO challonge_processed_matches (match_id, tournament_id, processed_at) VALUES (?, ?, ?)",
-                (match_id, tournament_id, datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
-            )
-            conn.commit()
+            await report(1)
+
+        pending = list(participants)
+        for attempt in range(settings.CHALLONGE_ADD_RETRIES + 1):
+            if attempt:
+                await asyncio.sleep(attempt)
+                before = len(pending)
+                pending = await self._not_added_yet(challonge_id, pending)
+                await report(before - len(pending))
+
+            # 1. Bulk add
+            singles = []
+            maybe_added = False
+            for chunk in _chunks(pending, BULK_ADD_SIZE):
+                if not use_bulk:
+                    singles.extend(chunk)
+                    continue
+                try:
+                    await self.challonge_request(
+                        "POST",
+                        f"{endpoint}/bulk_add.json",
+                        json_body={"data": {"type": "Participants", "attributes": {"participants": [
+                            {"name": name, "misc": str(user_id)} for name, user_id in chunk
+                        ]}}},
+                        params=self._community_params(),
+                    )
+                    await report(len(chunk))
+                except Exception as e:
+                    if isinstance(e, challonge_api.ChallongeError) and e.status in (404, 405):
+                        use_bulk = False  # Not available here, don't keep asking
+                    elif not isinstance(e, challonge_api.ChallongeError) or (
+                            e.status is None or e.status >= 500) and getattr(e, "sent", True):
+                        maybe_added = True
+                    singles.extend(chunk)
+            if maybe_added:
+                before = len(singles)
+                singles = await self._not_added_yet(challonge_id, singles)
+                await report(before - len(singles))
+
+            # 2. One request per participant for whatever the bulk add didn't take
+            results = await asyncio.gather(*(add_one(*p) for p in singles), return_exceptions=True)
+            pending = []
+            for participant, result in zip(singles, results):
+                if isinstance(result, Exception):
+                    errors[participant] = result
+                    if _worth_retrying(result):
+                        pending.append(participant)
+                    else:
+                        rejected.append(participant)
+            if not pending:
+                break
+        else:
+            before = len(pending)
+            pending = await self._not_added_yet(challonge_id, pending)
+            await report(before - len(pending))
+
+        return added, [(name, user_id, errors[(name, user_id)]) for name, user_id in rejected + pending]
 
     @app_commands.command(
         name="create_tournament",
@@ -152,14 +249,11 @@ class ChallongeCommands(commands.Cog):
         participants = []
         tournament_name = None
 
-        with self.get_db_connection() as conn:
-            c = conn.cursor()
-            # Fetch tournament name, usernames and user IDs associated with that message ID
-            c.execute(
-                "SELECT tournament_name, username, user_id FROM tournament_signups WHERE message_id = ?",
-                (msg_id_int,)
-            )
-            rows = c.fetchall()
+        # Fetch tournament name, usernames and user IDs associated with that message ID
+        rows = await database.fetchall(
+            "SELECT tournament_name, username, user_id FROM tournament_signups WHERE message_id = ?",
+            (msg_id_int,)
+        )
 
         if not rows:
             await interaction.followup.send(f"❌ No signup entries found in the database for message ID `{message_id}`.")
@@ -206,24 +300,23 @@ class ChallongeCommands(commands.Cog):
                 else f"https://challonge.com/{url_slug}"
             )
 
-            # 3. Add participants (one request per participant)
-            for name, user_id in participants:
-                participant_body = {
-                    "data": {
-                        "type": "participant",
-                        "attributes": {
-                            "name": name,
-                            "misc": str(user_id),
-                        },
-                    }
-                }
+            # 3. Add participants, reporting progress on a message that becomes the summary
+            status = await interaction.followup.send(
+                f"⏳ Adding {len(participants)} participants to **{tournament_name}**...", wait=True
+            )
+            last_edit = 0.0
 
-                await self.challonge_request(
-                    "POST",
-                    f"tournaments/{challonge_id}/participants.json",
-                    json_body=participant_body,
-                    params=self._community_params(),
-                )
+            async def progress(done, total):
+                nonlocal last_edit
+                if done < total and time.monotonic() - last_edit < PROGRESS_INTERVAL:
+                    return
+                last_edit = time.monotonic()
+                try:
+                    await status.edit(content=f"⏳ Adding participants to **{tournament_name}**: {done}/{total}")
+                except discord.HTTPException:
+                    pass
+
+            added, failed = await self.add_participants(challonge_id, participants, progress)
 
             # 4. Send success embed
             embed = discord.Embed(
@@ -232,9 +325,15 @@ class ChallongeCommands(commands.Cog):
                 color=discord.Color.gold()
             )
             embed.add_field(name="Link", value=f"[Open Tournament]({full_challonge_url})", inline=False)
-            embed.add_field(name="Participants", value=f"{len(participants)} players added.", inline=False)
+            embed.add_field(name="Participants", value=f"{added}/{len(participants)} players added.", inline=False)
+            if failed:
+                failed_text = "\n".join(f"{name} (<@{user_id}>): {str(error)[:100]}" for name, user_id, error in failed)
+                if len(failed_text) > 1000:
+                    failed_text = failed_text[:997] + "..."
+                embed.add_field(name="⚠️ Not added - add them on Challonge", value=failed_text, inline=False)
+                embed.color = discord.Color.orange()
 
-            await interaction.followup.send(embed=embed)
+            await status.edit(content=None, embed=embed)
 
         except Exception as e:
             await interaction.followup.send(f"⚠️ Error communicating with Challonge: {str(e)}")
@@ -255,10 +354,9 @@ class ChallongeCommands(commands.Cog):
 
         # 1. Load the tournament name from local DB
         tournament_name = None
-        with self.get_db_connection() as conn:
-            c = conn.cursor()
-            c.execute("SELECT tournament_name FROM tournament_signups WHERE message_id = ? LIMIT 1", (msg_id_int,))
-            row = c.fetchone()
+        row = await database.fetchone(
+            "SELECT tournament_name FROM tournament_signups WHERE message_id = ? LIMIT 1", (msg_id_int,)
+        )
 
         if not row:
             await interaction.followup.send(f"❌ No local database entry found for message ID `{message_id}`.")
@@ -268,15 +366,16 @@ class ChallongeCommands(commands.Cog):
 
         try:
             # 2. Find the tournament on Challonge by its name
-            index_resp = await self.challonge_request("GET", "tournaments.json", params=self._community_params())
-
             target_id = None
             found_url = None
 
-            for t in _unwrap_list(index_resp):
-                if t.get('name') == tournament_name:
-                    target_id = t.get('id')
-                    found_url = t.get('full_challonge_url') or f"https://challonge.com/{t.get('url')}"
+            async for page in self.client.paginate("tournaments.json", params=self._community_params()):
+                for t in _unwrap_list(page):
+                    if t.get('name') == tournament_name:
+                        target_id = t.get('id')
+                        found_url = t.get('full_challonge_url') or f"https://challonge.com/{t.get('url')}"
+                        break
+                if target_id:
                     break
 
             if not target_id:
@@ -306,6 +405,7 @@ class ChallongeCommands(commands.Cog):
         - Registers missing players (equivalent to /register)
         - Records matches and updates ELO (equivalent to /report)
         - Prevents double-processing via match_id
+        - Writes everything in one transaction, so an import lands completely or not at all
         """
         await interaction.response.defer(thinking=True)
 
@@ -319,135 +419,115 @@ class ChallongeCommands(commands.Cog):
             await interaction.followup.send("❌ This command must be used in a server.")
             return
 
-        # Create table if not present
-        self._ensure_processed_table()
-
+        # Mapping: Challonge participant ID -> Discord user ID (from participant.misc)
+        p_to_discord: Dict[int, int] = {}
+        p_to_name: Dict[int, str] = {}
         try:
-            participants = await self.get_participants(tournament_id)
-            matches = await self.get_matches(tournament_id)
+            async for p in self.iter_participants(tournament_id):
+                pid = p.get('id')
+                if pid is None:
+                    continue
+                pid = int(pid)  # JSON:API ids come back as strings; keep this in sync with match participant_ids (ints)
+                p_to_name[pid] = p.get('name') or str(pid)
+                misc = p.get('misc')
+                # misc should contain our Discord user ID (int)
+                try:
+                    if misc is not None and str(misc).strip() != "":
+                        p_to_discord[pid] = int(str(misc))
+                except Exception:
+                    # Ignore malformed misc values
+                    pass
         except Exception as e:
             await interaction.followup.send(f"⚠️ Error loading Challonge data: {e}")
             return
 
-        # Mapping: Challonge participant ID -> Discord user ID (from participant.misc)
-        p_to_discord: Dict[int, int] = {}
-        p_to_name: Dict[int, str] = {}
-        for p in participants:
-            pid = p.get('id')
-            if pid is None:
-                continue
-            pid = int(pid)  # JSON:API ids come back as strings; keep this in sync with match participant_ids (ints)
-            p_to_name[pid] = p.get('name') or str(pid)
-            misc = p.get('misc')
-            # misc should contain our Discord user ID (int)
-            try:
-                if misc is not None and str(misc).strip() != "":
-                    p_to_discord[pid] = int(str(misc))
-            except Exception:
-                # Ignore malformed misc values
-                pass
-
-        processed = 0
         skipped_no_discord = 0
         skipped_unfinished = 0
-        skipped_already = 0
-        newly_registered = 0
         processed_lines: List[str] = []  # Collect pretty lines to show in an embed at the end
         role_grant_lines: List[str] = []  # Collect role-earned/warning lines, shown after the match list
         # Roles granted to a given Discord user earlier in this same import run - add_roles() doesn't
         # update discord.py's local member cache, so without this a player winning/losing several
         # matches in one import would get the same "earned X role" message repeated per match.
         granted_role_ids_by_user: Dict[int, set] = {}
+        # One settings snapshot for the whole import, so toggling the multiplier mid-import
+        # can't leave half the matches rated one way and half the other
+        game = await current_settings()
+
+        # Challonge match ID -> (winner Discord ID, loser Discord ID, date, winner participant ID,
+        # loser participant ID), in the order Challonge lists them. Pages are sorted into this as
+        # they arrive; nothing is written until every page is in (see _import_matches).
+        to_import: Dict[int, tuple] = {}
 
         # Confirmed against a real v2.1 tournament: matches have no player1_id/player2_id
         # or scores_csv (those are v1 fields). Instead there's `points_by_participant`
         # (an array of {participant_id, scores}) and an explicit `tie` flag for draws.
-        for m in matches:
-            match_id = m.get('id')
-            state = m.get('state')
-            winner_id = m.get('winner_id')
-            tie = bool(m.get('tie'))
-            completed_at = (m.get('timestamps') or {}).get('updated_at')  # no dedicated completed_at field in v2.1
-            points = m.get('points_by_participant') or []
-
-            # Only 1v1 matches with both participants recorded
-            if not match_id or len(points) != 2:
-                continue
-            player1_id = points[0].get('participant_id')
-            player2_id = points[1].get('participant_id')
-            if player1_id is None or player2_id is None:
-                continue
-
-            if state != 'complete' or tie or not winner_id:
-                skipped_unfinished += 1
-                continue
-
-            if self._is_match_processed(int(match_id)):
-                skipped_already += 1
-                continue
-
-            # Determine Discord IDs
-            d1 = p_to_discord.get(int(player1_id))
-            d2 = p_to_discord.get(int(player2_id))
-            if d1 is None or d2 is None:
-                skipped_no_discord += 1
-                continue
+        try:
+            async for m in self.iter_matches(tournament_id):
+                match_id = m.get('id')
+                state = m.get('state')
+                winner_id = m.get('winner_id')
+                tie = bool(m.get('tie'))
+                completed_at = (m.get('timestamps') or {}).get('updated_at')  # no dedicated completed_at field in v2.1
+                points = m.get('points_by_participant') or []
+
+                # Only 1v1 matches with both participants recorded
+                if not match_id or len(points) != 2:
+                    continue
+                player1_id = points[0].get('participant_id')
+                player2_id = points[1].get('participant_id')
+                if player1_id is None or player2_id is None:
+                    continue
+
+                if state != 'complete' or tie or not winner_id:
+                    skipped_unfinished += 1
+                    continue
+
+                # Determine Discord IDs
+                d1 = p_to_discord.get(int(player1_id))
+                d2 = p_to_discord.get(int(player2_id))
+                if d1 is None or d2 is None:
+                    skipped_no_discord += 1
+                    continue
+
+                # Determine winner/loser
+                if int(winner_id) == int(player1_id):
+                    w_disc, l_disc = d1, d2
+                    w_pid, l_pid = int(player1_id), int(player2_id)
+                else:
+                    w_disc, l_disc = d2, d1
+                    w_pid, l_pid = int(player2_id), int(player1_id)
+
+                date_str = (
+                    datetime.datetime.fromisoformat(completed_at.replace("Z", "+00:00")).strftime('%Y-%m-%d %H:%M:%S')
+                    if isinstance(completed_at, str) and completed_at
+                    else datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                )
+                to_import.setdefault(int(match_id), (w_disc, l_disc, date_str, w_pid, l_pid))
+        except Exception as e:
+            await interaction.followup.send(f"⚠️ Error loading Challonge data: {e} - nothing was imported.")
+            return
 
-            # Determine winner/loser
-            if int(winner_id) == int(player1_id):
-                w_disc, l_disc = d1, d2
-                w_pid, l_pid = int(player1_id), int(player2_id)
-            else:
-                w_disc, l_disc = d2, d1
-                w_pid, l_pid = int(player2_id), int(player1_id)
-
-            # Register if needed (equivalent to /register)
-            g1 = get_elo(w_disc)
-            if g1 is None:
-                set_elo(w_disc, 1200)
-                newly_registered += 1
-            g2 = get_elo(l_disc)
-            if g2 is None:
-                set_elo(l_disc, 1200)
-                newly_registered += 1
-
-            # ELO update (equivalent to /report but without role/message logic)
-            date_str = (
-                datetime.datetime.fromisoformat(completed_at.replace("Z", "+00:00")).strftime('%Y-%m-%d %H:%M:%S')
-                if isinstance(completed_at, str) and completed_at
-                else datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            )
+        # Register, rate and record every new match in one transaction (equivalent to /register +
+        # /report per match), holding all the players involved so a concurrent /report can't interleave
+        players = {disc for w_disc, l_disc, *_ in to_import.values() for disc in (w_disc, l_disc)}
+        matches = [(match_id, w_disc, l_disc, date_str) for match_id, (w_disc, l_disc, date_str, _, _) in to_import.items()]
+        try:
+            async with locks.players.hold(*players):
+                imported = await database.run_write(_import_matches, str(tournament_id), matches, game)
+                cache_match_results([result for _, result in imported])
+        except Exception as e:
+            await interaction.followup.send(f"⚠️ Error recording the matches: {e} - nothing was imported.")
+            return
+        if imported:
+            standings.changed()
 
-            old_elo_winner = get_elo(w_disc)
-            old_elo_loser = get_elo(l_disc)
-            score_change = calculate_score_change(w_disc, l_disc)
-            update_elo(w_disc, l_disc)
-            elo_winner = get_elo(w_disc)
-            elo_loser = get_elo(l_disc)
-
-            # Maintain highest ELO as done in /report
-            if get_highest_elo(w_disc) is None:
-                set_highest_elo(w_disc, elo_winner)
-            if get_highest_elo(l_disc) is None:
-                set_highest_elo(l_disc, elo_loser)
-            if elo_winner > (get_highest_elo(w_disc) or 0):
-                set_highest_elo(w_disc, elo_winner)
-            if elo_loser > (get_highest_elo(l_disc) or 0):
-                set_highest_elo(l_disc, elo_loser)
-
-            # Insert match into match_data (same as /report)
-            multiplier = get_multiplier()
-            with self.get_db_connection() as conn:
-                c = conn.cursor()
-                c.execute(
-                    'INSERT INTO match_data (date, winner_id, loser_id, elo_change, elo_winner, elo_loser, multiplier) VALUES (?, ?, ?, ?, ?, ?, ?)',
-                    (date_str, w_disc, l_disc, score_change, elo_winner, elo_loser, multiplier),
-                )
-                conn.commit()
+        processed = len(imported)
+        skipped_already = len(matches) - processed
+        newly_registered = sum(len(result.new_players) for _, result in imported)
 
-            # Mark match as processed
-            self._mark_match_processed(int(match_id), str(tournament_id))
-            processed += 1
+        for match_id, result in imported:
+            w_disc, l_disc = result.winner_id, result.loser_id
+            _, _, _, w_pid, l_pid = to_import[match_id]
 
             # Grant rank roles based on standing, same logic as /report (Challenger/Baller for the
             # winner, Challenger for the loser) - only possible for players still in the server.
@@ -480,21 +560,15 @@ class ChallongeCommands(commands.Cog):
                         p_to_name.get(l_pid, str(l_disc)) if l_pid is not None else str(l_disc)
                     )
                 )
-                w_delta = score_change * multiplier
-                l_delta = -score_change
+                w_delta = result.score_change * result.multiplier
+                l_delta = -result.score_change
                 processed_lines.append(
-                    f"{w_name} - {l_name}: +{w_delta} / {l_delta}  ({old_elo_winner}->{elo_winner} | {old_elo_loser}->{elo_loser})"
+                    f"{w_name} - {l_name}: +{w_delta} / {l_delta}  ({result.old_elo_winner}->{result.elo_winner} | {result.old_elo_loser}->{result.elo_loser})"
                 )
             except Exception:
                 # If anything goes wrong while building the pretty line, just skip it
                 pass
 
-        # Update historical rankings after import
-        try:
-            update_historical_rankings()
-        except Exception:
-            pass
-
         # Build an embed summary
         summary_lines = [
             f"Processed: {processed}",
@@ -658,6 +732,21 @@ class ChallongeCommands(commands.Cog):
         except Exception as e:
             await interaction.followup.send(f"⚠️ Error performing substitution: {e}")
 
+    @app_commands.command(name="challonge_stats", description="Show Challonge API request, retry and latency counters")
+    @app_commands.checks.has_any_role(*settings.STAFF_ROLES)
+    async def challonge_stats(self, interaction: discord.Interaction):
+        stats = self.client.stats()
+        statuses = ", ".join(f"{status}: {count}" for status, count in sorted(stats["statuses"].items())) or "-"
+        await interaction.response.send_message(
+            f"**Challonge API:** {stats['requests']} requests, {stats['attempts']} attempts\n"
+            f"Retries: {stats['retries']} • Failed: {stats['failures']} • Rate limited (429): {stats['rate_limited']}\n"
+            f"Throttled: {stats['throttled']} ({stats['throttle_wait']:.1f}s waited)\n"
+            f"Latency: avg {stats['latency_avg'] * 1000:.0f} ms • p95 {stats['latency_p95'] * 1000:.0f} ms • "
+            f"max {stats['latency_max'] * 1000:.0f} ms\n"
+            f"Responses: {statuses}",
+            ephemeral=True
+        )
+
 
 async def setup(bot):
     await bot.add_cog(ChallongeCommands(bot))
@@ -1,153 +1,475 @@
-import sqlite3
 import discord
 from discord import app_commands
 import math
 import datetime
 import asyncio
+import json
+import time
+from io import BytesIO
+from typing import NamedTuple
 import settings
+import database
+import ratings
+import locks
+import game_settings
+import standings
 from cogs.backup import backup_db
 
+logger = settings.logging.getLogger("bot")
+
 
 # Role IDs live in settings.py now - see settings.RANK_ROLES / settings.STAFF_ROLES.
 roles = settings.RANK_ROLES
 
 
-# Create a connection to the SQLite database
-# If the database doesn't exist, it will be created
-with sqlite3.connect('elo_data.db') as conn:
-    c = conn.cursor()
-    
-    try:
-        # Create the table if it doesn't exist
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS elo_data (
-                player_id INTEGER PRIMARY KEY,
-                elo INTEGER,
-                highest_elo INTEGER,
-                inactive INTEGER DEFAULT 0
-            )
-        ''')
-
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS match_data (
-                game_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT,
-                winner_id INTEGER,
-                loser_id INTEGER,
-                elo_change INTEGER,
-                elo_winner INTEGER,
-                elo_loser INTEGER,
-                multiplier INTEGER DEFAULT 1
-            )
-        ''')
-
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS historical_rankings (
-                ranking_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                player_id INTEGER,
-                date TEXT,
-                rank INTEGER
-            )
-        ''')
-
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS settings (
-                setting_name TEXT PRIMARY KEY,
-                setting_value TEXT
-            )
-        ''')
-
-    except sqlite3.Error as e:
-        print(f"SQLite error: {e}")
-        conn.rollback()
-
-
 # ELO-related functions
-def get_multiplier():
-    with sqlite3.connect('elo_data.db') as conn:
-        c = conn.cursor()
-        c.execute('SELECT setting_value FROM settings WHERE setting_name = "elo_multiplier"')
-        result = c.fetchone()
-        if result and result[0] == 'on':
-            return 2
-        return 1
-
-def calculate_elo_rank(winner_rank, loser_rank, k=40):
-
-    if winner_rank >= 1800:
-        k = 20
-    if winner_rank >= 2400:
-        k = 10
+# The underscore versions take an open connection so several of them can share one
+# transaction; the async versions are what commands await (see database.py).
+# Player reads are served from ratings.cache, and every write updates it once committed.
+# Tunables (multiplier, K-factor tiers, starting ELO) come from a game_settings snapshot,
+# taken once per match (or per import) and passed down so one match never mixes values.
+async def current_settings():
+    return await game_settings.store.current()
+
+def calculate_elo_rank(winner_rank, loser_rank, k=None):
+    if k is None:
+        k = game_settings.DEFAULTS.k_factor(winner_rank)
 
     rank_diff = loser_rank - winner_rank
     expected_outcome = 1 / (1 + math.pow(10, rank_diff / 400))
     return winner_rank + k * (1 - expected_outcome)
 
-def update_elo(winner, loser):
-    winner_elo = get_elo(winner)
-    loser_elo = get_elo(loser)
+def compute_elo_change(winner_elo, loser_elo, multiplier=1, game=game_settings.DEFAULTS):
+    """Returns (score_change, winner_new_elo, loser_new_elo) for one match, with K from `game`'s tiers.
+    The winner gains score_change * multiplier, the loser always loses score_change."""
+    winner_new_elo = int(calculate_elo_rank(winner_elo, loser_elo, game.k_factor(winner_elo)))
+    score_change = winner_new_elo - winner_elo
+    return score_change, winner_elo + score_change * multiplier, loser_elo - score_change
 
-    winner_new_elo = int(calculate_elo_rank(winner_elo, loser_elo))
-    loser_new_elo = loser_elo - (winner_new_elo - winner_elo)
+async def _cached_player(player_id):
+    """(elo, highest_elo, inactive) from the rating cache, loading it on first use."""
+    if not ratings.cache.loaded:
+        await database.run_read(ratings.cache.load)
+    return ratings.cache.get(player_id)
 
-    multiplier = get_multiplier()
-
-    if multiplier == 2:
-        winner_new_elo = winner_new_elo + (winner_new_elo - winner_elo)
+def _get_elo(conn, player_id):
+    c = conn.cursor()
+    c.execute('SELECT elo FROM elo_data WHERE player_id = ?', (player_id,))
+    result = c.fetchone()
+    return result[0] if result else None
 
-    set_elo(winner, winner_new_elo)
-    set_elo(loser, loser_new_elo)
+async def get_elo(player_id):
+    player = await _cached_player(player_id)
+    return player[0] if player else None
 
-def calculate_score_change(winner, loser):
-    winner_elo = get_elo(winner)
-    loser_elo = get_elo(loser)
+def _set_elo(conn, player_id, elo):
+    c = conn.cursor()
+    c.execute('INSERT OR IGNORE INTO elo_data (player_id, elo) VALUES (?, ?)', (player_id, elo))
+    c.execute('UPDATE elo_data SET elo = ? WHERE player_id = ?', (elo, player_id))
 
-    winner_new_elo = int(calculate_elo_rank(winner_elo, loser_elo))
-    winner_score_change = winner_new_elo - winner_elo
+async def set_elo(player_id, elo):
+    await database.run_write(_set_elo, player_id, elo)
+    ratings.cache.update(player_id, elo=elo)
+    standings.changed()
 
-    return winner_score_change
+def _get_highest_elo(conn, player_id):
+    c = conn.cursor()
+    c.execute('SELECT highest_elo FROM elo_data WHERE player_id = ?', (player_id,))
+    result = c.fetchone()
+    return result[0] if result else None
 
-def get_elo(player_id):
-    with sqlite3.connect('elo_data.db') as conn:
-        c = conn.cursor()
-        c.execute('SELECT elo FROM elo_data WHERE player_id = ?', (player_id,))
-        result = c.fetchone()
-        return result[0] if result else None
+async def get_highest_elo(player_id):
+    player = await _cached_player(player_id)
+    return player[1] if player else None
 
-def set_elo(player_id, elo):
-    with sqlite3.connect('elo_data.db') as conn:
-        c = conn.cursor()
-        c.execute('INSERT OR IGNORE INTO elo_data (player_id, elo) VALUES (?, ?)', (player_id, elo))
-        c.execute('UPDATE elo_data SET elo = ? WHERE player_id = ?', (elo, player_id))
-        conn.commit()
+def _set_inactive(conn, player_id, inactive):
+    c = conn.cursor()
+    c.execute("UPDATE elo_data SET inactive = ? WHERE player_id = ?", (inactive, player_id))
 
-def get_highest_elo(player_id):
-    with sqlite3.connect('elo_data.db') as conn:
-        c = conn.cursor()
-        c.execute('SELECT highest_elo FROM elo_data WHERE player_id = ?', (player_id,))
-        result = c.fetchone()
-        return result[0] if result else None
+async def set_inactive_flag(player_id, inactive):
+    await database.run_write(_set_inactive, player_id, int(inactive))
+    if await get_elo(player_id) is not None:  # UPDATE is a no-op for unregistered players
+        ratings.cache.update(player_id, inactive=int(inactive))
+        standings.changed()
 
-def set_highest_elo(player_id, highest_elo):
-    with sqlite3.connect('elo_data.db') as conn:
-        c = conn.cursor()
-        c.execute('UPDATE elo_data SET highest_elo = ? WHERE player_id = ?', (highest_elo, player_id))
-        conn.commit()
+def _reset_all_elo(conn, elo):
+    c = conn.cursor()
+    c.execute("UPDATE elo_data SET elo = ?", (elo,))
+    return c.rowcount
 
+async def reset_all_elo_to(elo):
+    """Sets every player's ELO to `elo`; returns how many players were changed."""
+    changed = await database.run_write(_reset_all_elo, elo)
+    ratings.cache.set_all_elo(elo)
+    standings.changed()
+    return changed
 
-def update_historical_rankings():
-    """Update the historical rankings table."""
-    with sqlite3.connect('elo_data.db') as conn:
-        c = conn.cursor()
-        c.execute('SELECT player_id FROM elo_data ORDER BY elo DESC')
-        current_rankings = c.fetchall()
-        current_date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-        # Store new rankings in historical_rankings table
-        for i, (player_id,) in enumerate(current_rankings):
-            c.execute("INSERT INTO historical_rankings (player_id, date, rank) VALUES (?, ?, ?)", (player_id, current_date, i+1))
+def _update_historical_rankings(conn):
+    """Records the current ranking, delta-encoded: only players whose rank changed
+    since their last historical_rankings row get a new one. A player's rank at any
+    moment is therefore their latest row at or before it (see get_rank_at)."""
+    c = conn.cursor()
+    # player_id breaks ties so equal-ELO players don't swap places (and rows) every match.
+    # Each player's last recorded rank is a seek on idx_historical_rankings_player_latest,
+    # so this costs the same however long the history gets.
+    c.execute('''
+        SELECT e.player_id,
+               (SELECT h.rank FROM historical_rankings h
+                WHERE h.player_id = e.player_id
+                ORDER BY h.ranking_id DESC
+                LIMIT 1)
+        FROM elo_data e
+        ORDER BY e.elo DESC, e.player_id
+    ''')
+    current_rankings = c.fetchall()
+    current_date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    changed = [
+        (player_id, current_date, rank)
+        for rank, (player_id, last_rank) in enumerate(current_rankings, start=1)
+        if last_rank != rank
+    ]
+    c.executemany("INSERT INTO historical_rankings (player_id, date, rank) VALUES (?, ?, ?)", changed)
+
+def _get_rank_at(conn, player_id, date):
+    c = conn.cursor()
+    c.execute('''
+        SELECT rank FROM historical_rankings
+        WHERE player_id = ? AND date <= ?
+        ORDER BY date DESC, ranking_id DESC
+        LIMIT 1
+    ''', (player_id, date))
+    result = c.fetchone()
+    return result[0] if result else None
+
+async def get_rank_at(player_id, date):
+    """A player's rank as of `date` ('YYYY-MM-DD HH:MM:SS'), or None if they weren't ranked yet."""
+    return await database.run_read(_get_rank_at, player_id, date)
+
+def _get_rankings_at(conn, date):
+    c = conn.cursor()
+    c.execute('''
+        SELECT player_id, rank FROM (
+            SELECT player_id, rank,
+                   ROW_NUMBER() OVER (PARTITION BY player_id ORDER BY date DESC, ranking_id DESC) AS rn
+            FROM historical_rankings
+            WHERE date <= ?
+        )
+        WHERE rn = 1
+        ORDER BY rank
+    ''', (date,))
+    return c.fetchall()
+
+async def get_rankings_at(date):
+    """The full ranking as of `date`: [(player_id, rank), ...] ordered by rank."""
+    return await database.run_read(_get_rankings_at, date)
+
+
+# Player stats
+# player_stats holds wins/losses/streaks/last match date per player so views don't have to
+# aggregate match_data on every render. Every match_data insert updates it in the same
+# transaction - one match at a time through _insert_match, or a batch in _record_matches,
+# which folds the batch into the players' rows with compute_player_stats. Removals and
+# edits recompute the players involved.
+def _apply_match_stats(conn, winner_id, loser_id, date):
+    c = conn.cursor()
+    # In an upsert's SET clause every column still refers to the row's old values
+    c.execute('''
+        INSERT INTO player_stats (player_id, wins, losses, games_played, current_streak, best_streak, last_match_date)
+        VALUES (?, 1, 0, 1, 1, 1, ?)
+        ON CONFLICT(player_id) DO UPDATE SET
+            wins = wins + 1,
+            games_played = games_played + 1,
+            current_streak = CASE WHEN current_streak > 0 THEN current_streak + 1 ELSE 1 END,
+            best_streak = MAX(best_streak, CASE WHEN current_streak > 0 THEN current_streak + 1 ELSE 1 END),
+            last_match_date = MAX(COALESCE(last_match_date, ''), excluded.last_match_date)
+    ''', (winner_id, date))
+    c.execute('''
+        INSERT INTO player_stats (player_id, wins, losses, games_played, current_streak, best_streak, last_match_date)
+        VALUES (?, 0, 1, 1, -1, 0, ?)
+        ON CONFLICT(player_id) DO UPDATE SET
+            losses = losses + 1,
+            games_played = games_played + 1,
+            current_streak = CASE WHEN current_streak < 0 THEN current_streak - 1 ELSE -1 END,
+            last_match_date = MAX(COALESCE(last_match_date, ''), excluded.last_match_date)
+    ''', (loser_id, date))
+
+def _insert_match(conn, date, winner_id, loser_id, elo_change, elo_winner, elo_loser, multiplier):
+    """Inserts one match_data row and updates both players' stats; returns the new game_id."""
+    c = conn.cursor()
+    c.execute('INSERT INTO match_data (date, winner_id, loser_id, elo_change, elo_winner, elo_loser, multiplier) VALUES (?, ?, ?, ?, ?, ?, ?)',
+              (date, winner_id, loser_id, elo_change, elo_winner, elo_loser, multiplier))
+    _apply_match_stats(conn, winner_id, loser_id, date)
+    return c.lastrowid
+
+def compute_player_stats(matches, stats=None):
+    """Folds (winner_id, loser_id, date) rows, in game_id order, into
+    {player_id: (wins, losses, games_played, current_streak, best_streak, last_match_date)},
+    carrying on from `stats` (same shape, e.g. the players' player_stats rows) if given."""
+    stats = dict(stats or {})
+    for winner_id, loser_id, date in matches:
+        wins, losses, games, streak, best, last = stats.get(winner_id, (0, 0, 0, 0, 0, None))
+        streak = streak + 1 if streak > 0 else 1
+        stats[winner_id] = (wins + 1, losses, games + 1, streak, max(best, streak), max(last or '', date or '') or None)
+
+        wins, losses, games, streak, best, last = stats.get(loser_id, (0, 0, 0, 0, 0, None))
+        streak = streak - 1 if streak < 0 else -1
+        stats[loser_id] = (wins, losses + 1, games + 1, streak, best, max(last or '', date or '') or None)
+    return stats
+
+def _refresh_player_stats(conn, player_ids):
+    """Recomputes player_stats for a few players from their own matches (after a removal or edit)."""
+    c = conn.cursor()
+    for player_id in set(player_ids):
+        c.execute('SELECT winner_id, loser_id, date FROM match_data WHERE winner_id = ? OR loser_id = ? ORDER BY game_id', (player_id, player_id))
+        stats = compute_player_stats(c.fetchall()).get(player_id)
+        if stats is None:
+            c.execute('DELETE FROM player_stats WHERE player_id = ?', (player_id,))
+        else:
+            c.execute('INSERT OR REPLACE INTO player_stats (player_id, wins, losses, games_played, current_streak, best_streak, last_match_date) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                      (player_id, *stats))
 
-        conn.commit()
+def _rebuild_player_stats(conn):
+    """Rebuilds the whole player_stats table from match_data; returns the number of players."""
+    c = conn.cursor()
+    c.execute('SELECT winner_id, loser_id, date FROM match_data ORDER BY game_id')
+    stats = compute_player_stats(c.fetchall())
+    c.execute('DELETE FROM player_stats')
+    c.executemany('INSERT INTO player_stats (player_id, wins, losses, games_played, current_streak, best_streak, last_match_date) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                  [(player_id, *values) for player_id, values in stats.items()])
+    return len(stats)
+
+async def rebuild_player_stats():
+    players = await database.run_write(_rebuild_player_stats)
+    standings.changed()  # streaks and W/L numbers may have moved
+    return players
+
+
+class MatchResult(NamedTuple):
+    """Everything /report needs to render a recorded match."""
+    game_id: int
+    date: str
+    winner_id: int
+    loser_id: int
+    old_elo_winner: int
+    old_elo_loser: int
+    elo_winner: int
+    elo_loser: int
+    score_change: int
+    multiplier: int
+    new_players: tuple  # player IDs that were registered (at the starting ELO) by this match
+    highest_elo_winner: int
+    highest_elo_loser: int
+
+def _record_match(conn, winner_id, loser_id, date, game):
+    c = conn.cursor()
+    c.execute('SELECT player_id, elo, highest_elo FROM elo_data WHERE player_id IN (?, ?)', (winner_id, loser_id))
+    players = {player_id: (elo, highest_elo) for player_id, elo, highest_elo in c.fetchall()}
+
+    # Register new players (equivalent to /register)
+    new_players = tuple(pid for pid in (winner_id, loser_id) if players.get(pid, (None, None))[0] is None)
+    for pid in new_players:
+        _set_elo(conn, pid, game.starting_elo)
+        players[pid] = (game.starting_elo, players.get(pid, (None, None))[1])
+
+    old_elo_winner, highest_winner = players[winner_id]
+    old_elo_loser, highest_loser = players[loser_id]
+    multiplier = game.elo_multiplier
+    score_change, elo_winner, elo_loser = compute_elo_change(old_elo_winner, old_elo_loser, multiplier, game)
+
+    # Update ELO and highest ELO achieved
+    highest_winner = max(elo_winner, highest_winner or elo_winner)
+    highest_loser = max(elo_loser, highest_loser or elo_loser)
+    c.executemany('UPDATE elo_data SET elo = ?, highest_elo = ? WHERE player_id = ?', [
+        (elo_winner, highest_winner, winner_id),
+        (elo_loser, highest_loser, loser_id),
+    ])
+
+    game_id = _insert_match(conn, date, winner_id, loser_id, score_change, elo_winner, elo_loser, multiplier)
+
+    _update_historical_rankings(conn)
+
+    return MatchResult(game_id, date, winner_id, loser_id, old_elo_winner, old_elo_loser,
+                       elo_winner, elo_loser, score_change, multiplier, new_players,
+                       highest_winner, highest_loser)
+
+async def record_match(winner_id, loser_id, date=None, game=None):
+    """Records one match in a single transaction: registers missing players, updates both players'
+    elo/highest_elo, inserts the match_data row and snapshots the rankings. Returns a MatchResult.
+    `game` is the settings snapshot to use; by default the current settings are snapshotted."""
+    if date is None:
+        date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')  # 'YYYY-MM-DD HH:MM:SS'
+    game = game or await current_settings()
+    async with locks.players.hold(winner_id, loser_id):
+        result = await database.run_write(_record_match, winner_id, loser_id, date, game)
+        cache_match_results([result])
+    standings.changed()
+    return result
+
+def _record_matches(conn, matches, game):
+    """_record_match for a batch of (winner_id, loser_id, date), applied in order.
+
+    The players' ratings and stats are read once, the matches are played out in
+    memory, and each table is then written with a single executemany - inside the
+    caller's transaction, so the batch lands completely or not at all. The rankings
+    are snapshotted once, at the end. Returns a MatchResult per match."""
+    if not matches:
+        return []
+    c = conn.cursor()
+    player_ids = json.dumps(sorted({pid for winner_id, loser_id, _ in matches for pid in (winner_id, loser_id)}))
+    c.execute('SELECT player_id, elo, highest_elo FROM elo_data WHERE player_id IN (SELECT value FROM json_each(?))', (player_ids,))
+    players = {player_id: (elo, highest_elo) for player_id, elo, highest_elo in c.fetchall()}
+    c.execute('''
+        SELECT player_id, wins, losses, games_played, current_streak, best_streak, last_match_date
+        FROM player_stats WHERE player_id IN (SELECT value FROM json_each(?))
+    ''', (player_ids,))
+    stats = {player_id: tuple(values) for player_id, *values in c.fetchall()}
+
+    multiplier = game.elo_multiplier
+    registered = []
+    results = []
+    for winner_id, loser_id, date in matches:
+        # Register new players (equivalent to /register)
+        new_players = tuple(pid for pid in (winner_id, loser_id) if players.get(pid, (None, None))[0] is None)
+        for pid in new_players:
+            players[pid] = (game.starting_elo, players.get(pid, (None, None))[1])
+            registered.append((pid, game.starting_elo))
+
+        old_elo_winner, highest_winner = players[winner_id]
+        old_elo_loser, highest_loser = players[loser_id]
+        score_change, elo_winner, elo_loser = compute_elo_change(old_elo_winner, old_elo_loser, multiplier, game)
+        highest_winner = max(elo_winner, highest_winner or elo_winner)
+        highest_loser = max(elo_loser, highest_loser or elo_loser)
+        players[winner_id] = (elo_winner, highest_winner)
+        players[loser_id] = (elo_loser, highest_loser)
+        results.append(MatchResult(None, date, winner_id, loser_id, old_elo_winner, old_elo_loser,
+                                   elo_winner, elo_loser, score_change, multiplier, new_players,
+                                   highest_winner, highest_loser))
+
+    c.executemany('INSERT OR IGNORE INTO elo_data (player_id, elo) VALUES (?, ?)', registered)
+    touched = sorted({pid for result in results for pid in (result.winner_id, result.loser_id)})
+    c.executemany('UPDATE elo_data SET elo = ?, highest_elo = ? WHERE player_id = ?',
+                  [(*players[pid], pid) for pid in touched])
+
+    c.executemany('INSERT INTO match_data (date, winner_id, loser_id, elo_change, elo_winner, elo_loser, multiplier) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                  [(r.date, r.winner_id, r.loser_id, r.score_change, r.elo_winner, r.elo_loser, r.multiplier) for r in results])
+    # Nothing else writes while this transaction is open, so the newest game_ids are this batch's
+    c.execute('SELECT game_id FROM match_data ORDER BY game_id DESC LIMIT ?', (len(results),))
+    game_ids = sorted(game_id for game_id, in c.fetchall())
+    results = [result._replace(game_id=game_id) for result, game_id in zip(results, game_ids)]
+
+    stats = compute_player_stats([(r.winner_id, r.loser_id, r.date) for r in results], stats)
+    c.executemany('INSERT OR REPLACE INTO player_stats (player_id, wins, losses, games_played, current_streak, best_streak, last_match_date) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                  [(pid, *stats[pid]) for pid in touched])
+
+    _update_historical_rankings(conn)
+    return results
+
+def cache_match_results(results):
+    """Write-through for committed MatchResults, in match order: each player's latest
+    elo and highest_elo end up in ratings.cache."""
+    for result in results:
+        ratings.cache.update(result.winner_id, elo=result.elo_winner, highest_elo=result.highest_elo_winner)
+        ratings.cache.update(result.loser_id, elo=result.elo_loser, highest_elo=result.highest_elo_loser)
+
+
+# Full-history replay
+# Recomputes every rating from match_data alone, so drift from /change_elo, /remove_game,
+# season resets or formula changes shows up as a difference from elo_data.
+def replay_matches(matches, game=game_settings.DEFAULTS):
+    """Replays (game_id, winner_id, loser_id, multiplier, elo_winner, elo_loser) rows, in game_id order,
+    with the same formula and per-match multiplier as /report, and `game`'s K tiers and starting ELO.
+    Returns (elo, highest_elo, first_drift) dicts keyed by player_id; first_drift holds the first game
+    whose stored post-match ELO for that player disagrees with the replay."""
+    elo = {}
+    highest = {}
+    first_drift = {}
+    # Ratings cluster, so the same (winner_elo, loser_elo) pair comes up again and again -
+    # memoising the score change skips most of the pow() work on long histories.
+    score_changes = {}
+
+    for game_id, winner_id, loser_id, multiplier, stored_winner, stored_loser in matches:
+        winner_elo = elo.get(winner_id, game.starting_elo)
+        loser_elo = elo.get(loser_id, game.starting_elo)
+
+        score_change = score_changes.get((winner_elo, loser_elo))
+        if score_change is None:
+            score_change = compute_elo_change(winner_elo, loser_elo, game=game)[0]
+            score_changes[(winner_elo, loser_elo)] = score_change
+
+        winner_elo += score_change * (multiplier or 1)
+        loser_elo -= score_change
+        elo[winner_id] = winner_elo
+        elo[loser_id] = loser_elo
+        if winner_elo > highest.get(winner_id, winner_elo - 1):
+            highest[winner_id] = winner_elo
+        if loser_elo > highest.get(loser_id, loser_elo - 1):
+            highest[loser_id] = loser_elo
+
+        if stored_winner != winner_elo and winner_id not in first_drift:
+            first_drift[winner_id] = game_id
+        if stored_loser != loser_elo and loser_id not in first_drift:
+            first_drift[loser_id] = game_id
+
+    return elo, highest, first_drift
+
+class EloDivergence(NamedTuple):
+    """One player whose stored ratings don't match a full replay of match_data."""
+    player_id: int
+    stored_elo: int
+    replayed_elo: int
+    stored_highest: int
+    replayed_highest: int
+    first_drift_game: int  # None if every stored match row agrees with the replay
+
+def _audit_elo(conn):
+    """Replays match_data and compares it with elo_data.
+    Returns (matches replayed, [EloDivergence, ...] sorted by largest ELO difference first)."""
+    c = conn.cursor()
+    c.execute('SELECT game_id, winner_id, loser_id, multiplier, elo_winner, elo_loser FROM match_data ORDER BY game_id')
+    c.arraysize = 5000
+
+    match_count = 0
+    def stream():
+        nonlocal match_count
+        while rows := c.fetchmany():
+            match_count += len(rows)
+            yield from rows
+
+    game = game_settings.store.snapshot(conn)
+    elo, highest, first_drift = replay_matches(stream(), game)
+
+    c.execute('SELECT player_id, elo, highest_elo FROM elo_data')
+    divergences = []
+    for player_id, stored_elo, stored_highest in c.fetchall():
+        # Registered players without any matches should still be sitting at the starting ELO
+        replayed_elo = elo.get(player_id, game.starting_elo)
+        replayed_highest = highest.get(player_id, stored_highest)
+        if stored_elo != replayed_elo or stored_highest != replayed_highest:
+            divergences.append(EloDivergence(player_id, stored_elo, replayed_elo, stored_highest,
+                                             replayed_highest, first_drift.get(player_id)))
+
+    divergences.sort(key=lambda d: abs((d.stored_elo or 0) - d.replayed_elo), reverse=True)
+    return match_count, divergences
+
+def _audit_and_rewrite_elo(conn):
+    match_count, divergences = _audit_elo(conn)
+    c = conn.cursor()
+    c.executemany('UPDATE elo_data SET elo = ?, highest_elo = ? WHERE player_id = ?',
+                  [(d.replayed_elo, d.replayed_highest, d.player_id) for d in divergences])
+    _update_historical_rankings(conn)
+    return match_count, divergences
+
+async def audit_elo(rewrite=False):
+    """Replays all matches and reports players whose elo/highest_elo differ from the replay.
+    With rewrite=True the replayed values are written back in the same transaction."""
+    if not rewrite:
+        return await database.run_read(_audit_elo)
+    result = await database.run_write(_audit_and_rewrite_elo)
+    await database.run_read(ratings.cache.load)
+    standings.changed()
+    return result
 
 # Other functions
 async def grant_winner_rank_roles(member: discord.Member, extra_role_ids: frozenset = frozenset()):
@@ -212,13 +534,28 @@ def create_embed(description):
     return embed 
 
 
+def create_match_embed(result: MatchResult, winner: discord.Member, loser: discord.Member):
+    """Create the "Match reported" embed for a recorded match."""
+    description = (f"Match played by {winner.mention} :crossed_swords: {loser.mention}\n"
+                f"Game No.{result.game_id} {'(with multiplier)' if result.multiplier == 2 else ''} successfully submitted!\n\u200b```\n\n"
+                f"Player:\t\t\tELO:\n"
+                f"――――――――――――――――――――――――――――――――――――\n"
+                f"{winner.display_name[:15]:<15}\t({result.old_elo_winner} > {result.elo_winner}) +{result.score_change * result.multiplier}\n"
+                f"{loser.display_name[:15]:<15}\t({result.old_elo_loser} > {result.elo_loser}) -{result.score_change}```")
+    return create_embed(description)
+
+
 # Commands
 @app_commands.command(name = "register", description = "Register a player")
 @discord.app_commands.checks.has_any_role(*settings.STAFF_ROLES)
 async def register(interaction, player: discord.Member):
-    if get_elo(player.id) is None:
-            set_elo(player.id, 1200)
-            await interaction.response.send_message(f"{player.mention} has been registered with an initial ELO of 1200")
+    starting_elo = (await current_settings()).starting_elo
+    async with locks.players.hold(player.id):
+        registered = await get_elo(player.id) is None
+        if registered:
+            await set_elo(player.id, starting_elo)
+    if registered:
+        await interaction.response.send_message(f"{player.mention} has been registered with an initial ELO of {starting_elo}")
     else:
         await interaction.response.send_message(f"{player.mention} is already registered")
 
@@ -230,19 +567,17 @@ async def report(interaction: discord.Interaction, winner: discord.Member, loser
         return
 
     await interaction.response.defer()
-    new_players = []
 
-    # Check for new players
-    if get_elo(winner.id) is None and get_elo(loser.id) is not None:
-        set_elo(winner.id, 1200)
-        new_players.append(f"{winner.mention} has been registered with an initial ELO of 1200")
-    if get_elo(loser.id) is None and get_elo(winner.id) is not None:
-        set_elo(loser.id, 1200)
-        new_players.append(f"{loser.mention} has been registered with an initial ELO of 1200")
-    if get_elo(winner.id) is None and get_elo(loser.id) is None:
-        set_elo(winner.id, 1200)
-        set_elo(loser.id, 1200)
-        new_players.append(f"{winner.mention} & {loser.mention} both have been registered with an ELO of 1200")
+    # Register new players, update the ELO scores and store the match in one go
+    result = await record_match(winner.id, loser.id)
+
+    new_players = []
+    if len(result.new_players) == 2:
+        new_players.append(f"{winner.mention} & {loser.mention} both have been registered with an ELO of {result.old_elo_winner}")
+    elif result.new_players:
+        new_player = winner if result.new_players[0] == winner.id else loser
+        starting_elo = result.old_elo_winner if new_player is winner else result.old_elo_loser
+        new_players.append(f"{new_player.mention} has been registered with an initial ELO of {starting_elo}")
     if new_players: 
         await interaction.followup.send("\n".join(new_players))
 
@@ -254,150 +589,281 @@ async def report(interaction: discord.Interaction, winner: discord.Member, loser
     for msg in loser_role_msgs:
         await interaction.followup.send(msg)
 
-    # Update the ELO scores
-    #date = datetime.date.today().isoformat()  # get the current date in 'YYYY-MM-DD' format
-    date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')  # 'YYYY-MM-DD HH:MM:SS'
-    old_elo_winner = get_elo(winner.id)
-    old_elo_loser = get_elo(loser.id)
-    score_change = calculate_score_change(winner.id, loser.id)
-    update_elo(winner.id, loser.id)
-    elo_winner = get_elo(winner.id)
-    elo_loser = get_elo(loser.id)
-
-    # Update highest ELO achieved
-    if get_highest_elo(winner.id) is None:
-        set_highest_elo(winner.id, elo_winner)
-    if get_highest_elo(loser.id) is None:
-        set_highest_elo(loser.id, elo_loser)
-    if elo_winner > get_highest_elo(winner.id):
-        set_highest_elo(winner.id, elo_winner)
-    if elo_loser > get_highest_elo(loser.id):
-        set_highest_elo(loser.id, elo_loser)
-
-    # Update historical rankings
-    update_historical_rankings() 
-    # Check multiplier status for k-factor
-    multiplier = get_multiplier()
-
-    # Insert a new row into the match_data table
-    with sqlite3.connect('elo_data.db') as conn:
-        c = conn.cursor()
-        c.execute('INSERT INTO match_data (date, winner_id, loser_id, elo_change, elo_winner, elo_loser, multiplier) VALUES (?, ?, ?, ?, ?, ?, ?)', (date, winner.id, loser.id, score_change, elo_winner, elo_loser, multiplier))
-        last_game_id = c.lastrowid
-        conn.commit()
-
-    # send embed message
-    description = (f"Match played by {winner.mention} :crossed_swords: {loser.mention}\n"
-                f"Game No.{last_game_id} {'(with multiplier)' if multiplier == 2 else ''} successfully submitted!\n\u200b```\n\n"
-                f"Player:\t\t\tELO:\n"
-                f"――――――――――――――――――――――――――――――――――――\n"
-                f"{winner.display_name[:15]:<15}\t({old_elo_winner} > {elo_winner}) +{score_change * multiplier}\n"
-                f"{loser.display_name[:15]:<15}\t({old_elo_loser} > {elo_loser}) -{score_change}```")
- 
-    await interaction.followup.send(embed=create_embed(description))
+    await interaction.followup.send(embed=create_match_embed(result, winner, loser))
 
 @app_commands.command(name = "set_elo", description = "Sets the elo of a player")
 @discord.app_commands.checks.has_any_role(*settings.STAFF_ROLES)
 async def change_elo(interaction, player: discord.Member, elo: int):
-    if get_elo(player.id) is None:
+    if await get_elo(player.id) is None:
         await interaction.response.send_message(f"{player.mention} is not registered.")
     else:
-        set_elo(player.id, elo)
+        await set_elo(player.id, elo)
         await interaction.response.send_message(f"{player.mention}'s ELO has been set to {elo}.")
 
 @app_commands.command(name = "show_elo", description = "Show elo")
 async def elo(interaction, player: discord.Member):
-    if get_elo(player.id) is None:
+    if await get_elo(player.id) is None:
         await interaction.response.send_message(f"{player.mention} is not registered.")
     else:
-        elo = get_elo(player.id)
+        elo = await get_elo(player.id)
         await interaction.response.send_message(f"{player.mention}'s ELO is {elo:.0f}.")
 
 @app_commands.command(name = "show_highest_elo", description = "Show highest elo achieved")
 async def highest_elo(interaction, player: discord.Member):
-    if get_highest_elo(player.id) is None:
+    if await get_highest_elo(player.id) is None:
         await interaction.response.send_message(f"{player.mention} is not registered.")
     else:
-        highest_elo = get_highest_elo(player.id)
+        highest_elo = await get_highest_elo(player.id)
         await interaction.response.send_message(f"{player.mention}'s highest ELO achieved is {highest_elo:.0f}.")
 
 @app_commands.command(name = "game", description = "Show game details")
 async def game(interaction: discord.Interaction, game_id: int):
-    with sqlite3.connect('elo_data.db') as conn:
-        c = conn.cursor()
-        c.execute('SELECT * FROM match_data WHERE game_id = ?', (game_id,))
-        result = c.fetchone()
-        if result is None:
-            await interaction.response.send_message(f"No game found with ID {game_id}.")
-        else:
-            game_id, date, winner_id, loser_id, elo_change, elo_winner, elo_loser, multiplier = result
+    result = await database.fetchone('SELECT * FROM match_data WHERE game_id = ?', (game_id,))
+
+    if result is None:
+        await interaction.response.send_message(f"No game found with ID {game_id}.")
+    else:
+        game_id, date, winner_id, loser_id, elo_change, elo_winner, elo_loser, multiplier = result
 
-            # Fetch the winner and loser as Member objects
-            winner = await interaction.guild.fetch_member(winner_id)
-            loser = await interaction.guild.fetch_member(loser_id)
+        # Fetch the winner and loser as Member objects
+        winner = await interaction.guild.fetch_member(winner_id)
+        loser = await interaction.guild.fetch_member(loser_id)
 
-            await interaction.response.send_message(f"Game ID: {game_id}\nDate: {date}\nWinner: {winner.name} ({elo_winner - elo_change * multiplier}  > {elo_winner}) +{elo_change * multiplier}\nLoser: {loser.name} ({elo_loser + elo_change}  > {elo_loser}) -{elo_change}")
+        await interaction.response.send_message(f"Game ID: {game_id}\nDate: {date}\nWinner: {winner.name} ({elo_winner - elo_change * multiplier}  > {elo_winner}) +{elo_change * multiplier}\nLoser: {loser.name} ({elo_loser + elo_change}  > {elo_loser}) -{elo_change}")
+
+class Rerating(NamedTuple):
+    """Outcome of removing or editing a past match."""
+    match: tuple          # the match_data row as it was before the change
+    elo_before: dict      # player_id -> current ELO before, for every player whose rating changed
+    elo: dict             # player_id -> current ELO after
+    highest_elo: dict     # player_id -> highest ELO after, for every player of the game or a re-rated match
+    rerated_matches: int  # later match_data rows that had to be rewritten
+
+def _highest_elo_from_matches(conn, player_id):
+    """The highest post-match ELO in a player's stored matches (None if they have none left),
+    which is what replay_matches counts as their highest ELO."""
+    c = conn.cursor()
+    c.execute('''
+        SELECT MAX(elo) FROM (
+            SELECT elo_winner AS elo FROM match_data WHERE winner_id = ?
+            UNION ALL
+            SELECT elo_loser AS elo FROM match_data WHERE loser_id = ?
+        )
+    ''', (player_id, player_id))
+    return c.fetchone()[0]
+
+def _rerate_after(conn, game_id, deltas, players=()):
+    """Replays the matches after game_id that involve a player in `deltas`, then updates elo_data.
+
+    `deltas` maps player_id -> (corrected rating - stored rating) right after game_id. Each later
+    match of such a player is recomputed from its stored pre-match ratings shifted by those deltas,
+    which keeps any /change_elo adjustments made in between, and the players it touches pick up a
+    delta of their own. Matches between unaffected players are skipped, so the cost is the number
+    of matches after game_id, not the whole history. The highest ELO of `players` (the players of
+    game_id) and of everyone in a re-rated match is recomputed from their remaining matches.
+    Returns a Rerating without its `match`."""
+    deltas = {pid: delta for pid, delta in deltas.items() if delta}
+    game = game_settings.store.snapshot(conn)
+    touched = set(players)
+    rewritten = []
+
+    c = conn.cursor()
+    c.execute('SELECT game_id, winner_id, loser_id, elo_change, elo_winner, elo_loser, multiplier FROM match_data WHERE game_id > ? ORDER BY game_id', (game_id,))
+    for later_id, winner_id, loser_id, elo_change, elo_winner, elo_loser, multiplier in c.fetchall():
+        if winner_id not in deltas and loser_id not in deltas:
+            continue
+        multiplier = multiplier or 1
+        winner_pre = elo_winner - elo_change * multiplier + deltas.get(winner_id, 0)
+        loser_pre = elo_loser + elo_change + deltas.get(loser_id, 0)
+        new_change, new_winner, new_loser = compute_elo_change(winner_pre, loser_pre, multiplier, game)
+
+        for pid, stored, new in ((winner_id, elo_winner, new_winner), (loser_id, elo_loser, new_loser)):
+            if new != stored:
+                deltas[pid] = new - stored
+            else:
+                deltas.pop(pid, None)
+            touched.add(pid)
+        if (new_change, new_winner, new_loser) != (elo_change, elo_winner, elo_loser):
+            rewritten.append((new_change, new_winner, new_loser, later_id))
+
+    c.executemany('UPDATE match_data SET elo_change = ?, elo_winner = ?, elo_loser = ? WHERE game_id = ?', rewritten)
+
+    elo_before, elo = {}, {}
+    for pid, delta in deltas.items():
+        elo_before[pid] = _get_elo(conn, pid)
+        elo[pid] = elo_before[pid] + delta
+    c.executemany('UPDATE elo_data SET elo = ? WHERE player_id = ?', [(elo[pid], pid) for pid in elo])
+
+    # Recomputed rather than maxed with the stored value: a peak reached only in the removed
+    # or rewritten matches has to go, or /audit_elo would report it as drift
+    highest_elo = {pid: _highest_elo_from_matches(conn, pid) for pid in touched | elo.keys()}
+    c.executemany('UPDATE elo_data SET highest_elo = ? WHERE player_id = ?', [(highest_elo[pid], pid) for pid in highest_elo])
+
+    _update_historical_rankings(conn)
+    return Rerating(None, elo_before, elo, highest_elo, len(rewritten))
+
+def _remove_game(conn, game_id):
+    """Deletes a game and re-rates every later match it influenced, in one transaction.
+    Returns a Rerating, or None if there's no such game."""
+    c = conn.cursor()
+    c.execute('SELECT * FROM match_data WHERE game_id = ?', (game_id,))
+    match = c.fetchone()
+    if match is None:
+        return None
+    game_id, date, winner_id, loser_id, elo_change, elo_winner, elo_loser, multiplier = match
+
+    c.execute('DELETE FROM match_data WHERE game_id = ?', (game_id,))
+    _refresh_player_stats(conn, (winner_id, loser_id))
+    # Without the game both players simply keep their pre-match ratings
+    rerating = _rerate_after(conn, game_id, {winner_id: -elo_change * (multiplier or 1), loser_id: elo_change},
+                             (winner_id, loser_id))
+    return rerating._replace(match=match)
+
+def _edit_result(conn, game_id):
+    """Swaps the winner and loser of a game, recomputing it from the players' pre-match ratings,
+    and re-rates every later match it influenced. Returns a Rerating, or None if there's no such game."""
+    c = conn.cursor()
+    c.execute('SELECT * FROM match_data WHERE game_id = ?', (game_id,))
+    match = c.fetchone()
+    if match is None:
+        return None
+    game_id, date, winner_id, loser_id, elo_change, elo_winner, elo_loser, multiplier = match
+    multiplier = multiplier or 1
+
+    winner_pre = elo_winner - elo_change * multiplier
+    loser_pre = elo_loser + elo_change
+    new_change, new_winner_elo, new_loser_elo = compute_elo_change(loser_pre, winner_pre, multiplier, game_settings.store.snapshot(conn))
+    c.execute('UPDATE match_data SET winner_id = ?, loser_id = ?, elo_change = ?, elo_winner = ?, elo_loser = ? WHERE game_id = ?',
+              (loser_id, winner_id, new_change, new_winner_elo, new_loser_elo, game_id))
+    _refresh_player_stats(conn, (winner_id, loser_id))
+
+    rerating = _rerate_after(conn, game_id, {loser_id: new_winner_elo - elo_loser, winner_id: new_loser_elo - elo_winner},
+                             (winner_id, loser_id))
+    return rerating._replace(match=match)
+
+async def _players_since(game_id):
+    rows = await database.fetchall('SELECT winner_id FROM match_data WHERE game_id >= ? UNION SELECT loser_id FROM match_data WHERE game_id >= ?',
+                                   (game_id, game_id))
+    return {player_id for player_id, in rows}
+
+async def rerate_game(game_id, edit=False):
+    """Removes (or, with edit=True, swaps the result of) a past game and re-rates what came after it."""
+    # The re-rating can reach anyone who played game_id or a later match, so hold all of their
+    # locks, like record_match does for its two players. A match recorded while we waited may
+    # have brought in someone new; then take their lock too and check again.
+    players = await _players_since(game_id)
+    while True:
+        async with locks.players.hold(*players):
+            involved = await _players_since(game_id)
+            if involved <= players:
+                rerating = await database.run_write(_edit_result if edit else _remove_game, game_id)
+                if rerating is not None:
+                    for pid, elo in rerating.elo.items():
+                        ratings.cache.update(pid, elo=elo)
+                    for pid, highest_elo in rerating.highest_elo.items():
+                        ratings.cache.update(pid, highest_elo=highest_elo)
+                break
+        players |= involved
+    if rerating is not None:
+        standings.changed()
+    return rerating
+
+def describe_rerating(rerating):
+    """One line per player whose current ELO moved, for the remove/edit command replies."""
+    lines = []
+    for pid, elo in rerating.elo.items():
+        change = elo - rerating.elo_before[pid]
+        lines.append(f"<@{pid}>'s ELO is now: {elo} ({rerating.elo_before[pid]}{change:+})")
+    if rerating.rerated_matches:
+        lines.append(f"{rerating.rerated_matches} later match(es) re-rated.")
+    return "\n".join(lines)
 
 @app_commands.command(name = "remove_game", description = "Remove a game and undo ELO changes")
 @discord.app_commands.checks.has_any_role(*settings.STAFF_ROLES)
 async def remove_game(interaction, game_id: int):
-    # Fetch the game details
-    with sqlite3.connect('elo_data.db') as conn:
-        c = conn.cursor()
-        c.execute('SELECT * FROM match_data WHERE game_id = ?', (game_id,))
-        result = c.fetchone()
-        if result is None:
-            await interaction.response.send_message(f"No game found with ID {game_id}.")
-        else:
-            game_id, date, winner_id, loser_id, elo_change, elo_winner, elo_loser, multiplier = result
+    await interaction.response.defer()
+    # Delete the game and re-rate everything it influenced in one transaction
+    rerating = await rerate_game(game_id)
+    if rerating is None:
+        await interaction.followup.send(f"No game found with ID {game_id}.")
+        return
 
-            # Undo the ELO changes
-            set_elo(winner_id, get_elo(winner_id) - elo_change * multiplier)
-            set_elo(loser_id, get_elo(loser_id) + elo_change)
+    await interaction.followup.send(f"Game {game_id} removed and ELO changes undone.\n{describe_rerating(rerating)}")
 
-            # Fetch the winner and loser as Member objects
-            winner = await interaction.guild.fetch_member(winner_id)
-            loser = await interaction.guild.fetch_member(loser_id)
+@app_commands.command(name = "edit_result", description = "Swap the winner and loser of a game and re-rate later matches")
+@discord.app_commands.checks.has_any_role(*settings.STAFF_ROLES)
+async def edit_result(interaction, game_id: int):
+    await interaction.response.defer()
+    rerating = await rerate_game(game_id, edit=True)
+    if rerating is None:
+        await interaction.followup.send(f"No game found with ID {game_id}.")
+        return
 
-            # Delete the game from the match_data table
-            c.execute('DELETE FROM match_data WHERE game_id = ?', (game_id,))
-            conn.commit()
+    _, _, winner_id, loser_id, *_ = rerating.match
+    await interaction.followup.send(
+        f"Game {game_id} result edited: <@{loser_id}> is now the winner against <@{winner_id}>.\n"
+        f"{describe_rerating(rerating)}"
+    )
 
-            await interaction.response.send_message(f"Game {game_id} removed and ELO changes undone.\n{winner.name}'s ELO is now: {get_elo(winner_id)} ({get_elo(winner_id) + elo_change * multiplier}-{elo_change * multiplier})\n{loser.name}'s ELO is now: {get_elo(loser_id)} ({get_elo(loser_id) - elo_change}+{elo_change})")
+def _toggle_elo_multiplier(conn):
+    """Flips the multiplier setting; returns the multiplier that was active before."""
+    # Read the stored value inside the transaction rather than trusting the cache
+    current_multiplier = game_settings.store.load(conn).elo_multiplier
+    game_settings.store.write(conn, "elo_multiplier", 2 if current_multiplier == 1 else 1)
+    return current_multiplier
 
 @app_commands.command(name="toggle_elo_multiplier", description="Toggle the ELO multiplier")
 @discord.app_commands.checks.has_any_role(*settings.STAFF_ROLES)
 async def toggle_elo_multiplier(interaction):
-    with sqlite3.connect('elo_data.db') as conn:
-        c = conn.cursor()
-        current_multiplier = get_multiplier()
-        if current_multiplier == 1:
-            c.execute('INSERT OR REPLACE INTO settings (setting_name, setting_value) VALUES (?, ?)', ("elo_multiplier", "on"))
-            await interaction.response.send_message("ELO multiplier has been turned ON :sparkles:. Winners will now receive double the ELO points!")
-        else:
-            c.execute('INSERT OR REPLACE INTO settings (setting_name, setting_value) VALUES (?, ?)', ("elo_multiplier", "off"))
-            await interaction.response.send_message("ELO multiplier has been turned OFF. Winners will now receive the regular ELO points.")
-        conn.commit()
+    current_multiplier = await database.run_write(_toggle_elo_multiplier)
+    game_settings.store.invalidate()
+
+    if current_multiplier == 1:
+        await interaction.response.send_message("ELO multiplier has been turned ON :sparkles:. Winners will now receive double the ELO points!")
+    else:
+        await interaction.response.send_message("ELO multiplier has been turned OFF. Winners will now receive the regular ELO points.")
+
+@app_commands.command(name="elo_settings", description="Show the ELO settings, or change one of them")
+@app_commands.describe(setting="Setting to change (leave empty to just show them)",
+                       value="New value, e.g. 1200, or 0:40,1800:20,2400:10 for K-factor tiers")
+@app_commands.choices(setting=[
+    app_commands.Choice(name="Starting ELO", value="starting_elo"),
+    app_commands.Choice(name="K-factor tiers", value="k_factor_tiers"),
+    app_commands.Choice(name="ELO multiplier", value="elo_multiplier"),
+])
+@discord.app_commands.checks.has_any_role(*settings.STAFF_ROLES)
+async def elo_settings(interaction, setting: app_commands.Choice[str] = None, value: str = None):
+    if setting is not None:
+        if value is None:
+            await interaction.response.send_message(f"Please give a new value for {setting.name}.", ephemeral=True)
+            return
+        parse, _ = game_settings.FIELDS[setting.value]
+        try:
+            await game_settings.store.set(setting.value, parse(value))
+        except ValueError as e:
+            await interaction.response.send_message(f"❌ Invalid value for {setting.name}: {e}", ephemeral=True)
+            return
+
+    game = await current_settings()
+    tiers = ", ".join(f"{threshold}+: K={k}" for threshold, k in game.k_factor_tiers)
+    await interaction.response.send_message(
+        f"{f'✅ {setting.name} updated.' if setting else ''}\n"
+        f"**ELO settings**\nStarting ELO: {game.starting_elo}\nK-factor tiers: {tiers}\nWinner multiplier: {game.elo_multiplier}x"
+    )
 
 @app_commands.command(name='set_inactive', description='Mark a player as inactive')
 @discord.app_commands.checks.has_any_role(*settings.STAFF_ROLES)
 async def set_inactive(interaction, player_id: str):
-    with sqlite3.connect('elo_data.db') as conn:
-        c = conn.cursor()
-        player_id = int(player_id)
-        c.execute("UPDATE elo_data SET inactive = 1 WHERE player_id = ?", (player_id,))
-        conn.commit()
-        await interaction.response.send_message(f"Player with ID {player_id} has been set to inactive :man_detective:")
+    player_id = int(player_id)
+    await set_inactive_flag(player_id, True)
+    await interaction.response.send_message(f"Player with ID {player_id} has been set to inactive :man_detective:")
 
 @app_commands.command(name='set_active', description='Mark a player as active')
 @discord.app_commands.checks.has_any_role(*settings.STAFF_ROLES)
 async def set_active(interaction, player_id: str):
-    with sqlite3.connect('elo_data.db') as conn:
-        c = conn.cursor()
-        player_id = int(player_id)
-        c.execute("UPDATE elo_data SET inactive = 0 WHERE player_id = ?", (player_id,))
-        conn.commit()
-        await interaction.response.send_message(f"Player with ID {player_id} has been set to active")
+    player_id = int(player_id)
+    await set_inactive_flag(player_id, False)
+    await interaction.response.send_message(f"Player with ID {player_id} has been set to active")
 
 @app_commands.command(name='get_player_id')
 async def get_player_id(interaction, member: discord.Member):
@@ -408,10 +874,7 @@ async def get_player_id(interaction, member: discord.Member):
 @discord.app_commands.checks.has_any_role(*settings.STAFF_ROLES)
 async def list_inactive(interaction: discord.Interaction):
     """Lists all players marked as inactive in the database."""
-    with sqlite3.connect('elo_data.db') as conn:
-        c = conn.cursor()
-        c.execute("SELECT player_id FROM elo_data WHERE inactive = 1")
-        inactive_players = c.fetchall()
+    inactive_players = await database.fetchall("SELECT player_id FROM elo_data WHERE inactive = 1")
 
     if not inactive_players:
         await interaction.response.send_message("No inactive players found.")
@@ -453,11 +916,12 @@ async def clean_commands(interaction: discord.Interaction):
 
     await interaction.response.send_message("✅ Global commands cleared and guild commands re-synced.", ephemeral=True)
 
-@app_commands.command(name="reset_all_elo", description="Reset everyone's ELO to 1200 (dangerous)")
+@app_commands.command(name="reset_all_elo", description="Reset everyone's ELO to the starting ELO (dangerous)")
 @discord.app_commands.checks.has_any_role(*settings.STAFF_ROLES)
 async def reset_all_elo(interaction: discord.Interaction):
+    starting_elo = (await current_settings()).starting_elo
     warning = (
-        "⚠️ **This will reset ALL players' ELO to 1200.**\n"
+        f"⚠️ **This will reset ALL players' ELO to {starting_elo}.**\n"
         "This is a big irreversible operation.\n\n"
         "React with ✅ within 10 seconds to confirm."
     )
@@ -493,35 +957,97 @@ async def reset_all_elo(interaction: discord.Interaction):
     try:
 #        backup_name = f"pre_reset_{time.strftime('%Y%m%d-%H%M%S')}"
         backup_name = f"pre_reset_{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}"
-        backup_db(custom_name=backup_name, folder='backups_auto')
+        await database.run(backup_db, backup_name, 'backups_auto')
 
-        with sqlite3.connect('elo_data.db') as conn:
-            c = conn.cursor()
-            c.execute("UPDATE elo_data SET elo = 1200")
-            changed = c.rowcount
-            conn.commit()
+        changed = await reset_all_elo_to(starting_elo)
     except Exception as e:
         await interaction.followup.send(f"❌ Backup or reset failed: {e}\nNo changes were made.")
         return
 
     await interaction.followup.send(
         f"🗄️ Backup created: `{backup_name}.db` in `backups/backups_auto/`.\n"
-        f"✅ Reset complete. Set ELO to 1200 for **{changed}** players."
+        f"✅ Reset complete. Set ELO to {starting_elo} for **{changed}** players."
+    )
+
+
+@app_commands.command(name="audit_elo", description="Replay every match and compare the result with the stored ELOs")
+@app_commands.describe(rewrite="Overwrite stored ELO/highest ELO with the replayed values (makes a backup first)")
+@discord.app_commands.checks.has_any_role(*settings.STAFF_ROLES)
+async def audit_elo_command(interaction: discord.Interaction, rewrite: bool = False):
+    await interaction.response.defer(ephemeral=True)
+
+    backup_note = ""
+    try:
+        if rewrite:
+            backup_name = f"pre_audit_{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}"
+            await database.run(backup_db, backup_name, 'backups_auto')
+            backup_note = f"🗄️ Backup created: `{backup_name}.db` in `backups/backups_auto/`.\n"
+
+        started = time.perf_counter()
+        match_count, divergences = await audit_elo(rewrite)
+        elapsed = time.perf_counter() - started
+    except Exception as e:
+        await interaction.followup.send(f"❌ Audit failed: {e}", ephemeral=True)
+        return
+
+    summary = f"{backup_note}Replayed **{match_count}** matches in {elapsed:.2f}s. "
+    if not divergences:
+        await interaction.followup.send(summary + "✅ Every stored ELO matches the replay.", ephemeral=True)
+        return
+
+    summary += f"**{len(divergences)}** players differ from the replay" + (" and have been rewritten." if rewrite else ".")
+    lines = ["player_id\tstored_elo\treplayed_elo\tstored_highest\treplayed_highest\tfirst_drift_game"]
+    lines += ["\t".join(str(value) for value in d) for d in divergences]
+    file = discord.File(fp=BytesIO("\n".join(lines).encode()), filename="elo_audit.tsv")
+    await interaction.followup.send(summary, file=file, ephemeral=True)
+
+
+@app_commands.command(name="rebuild_player_stats", description="Recompute wins, losses and streaks for everyone from the match history")
+@discord.app_commands.checks.has_any_role(*settings.STAFF_ROLES)
+async def rebuild_player_stats_command(interaction: discord.Interaction):
+    await interaction.response.defer(ephemeral=True)
+    started = time.perf_counter()
+    players = await rebuild_player_stats()
+    await interaction.followup.send(f"✅ Rebuilt stats for **{players}** players in {time.perf_counter() - started:.2f}s.", ephemeral=True)
+
+
+@app_commands.command(name="cache_stats", description="Show rating and leaderboard cache hit/miss counters")
+@discord.app_commands.checks.has_any_role(*settings.STAFF_ROLES)
+async def cache_stats(interaction: discord.Interaction):
+    stats = ratings.cache.stats()
+    board_stats = standings.leaderboards.stats()
+    await interaction.response.send_message(
+        f"**Rating cache:** {stats['players']} players cached\n"
+        f"Hits: {stats['hits']} • Misses: {stats['misses']} • Hit rate: {stats['hit_rate']:.1%}\n"
+        f"**Leaderboard cache:** {board_stats['entries']} leaderboards cached (standings version {standings.version})\n"
+        f"Hits: {board_stats['hits']} • Misses: {board_stats['misses']} • Hit rate: {board_stats['hit_rate']:.1%}",
+        ephemeral=True
     )
 
 
 async def setup(bot):
+    # Load every player's rating once up front; writes keep it current from here on
+    await database.run_read(ratings.cache.load)
+    await current_settings()
+    # First start after the player_stats migration: fill it from the existing history
+    if await database.fetchone('SELECT 1 FROM match_data LIMIT 1') and not await database.fetchone('SELECT 1 FROM player_stats LIMIT 1'):
+        logger.info(f"Built player_stats for {await rebuild_player_stats()} players from match history")
     bot.tree.add_command(register)
     bot.tree.add_command(report)
     bot.tree.add_command(elo)
     bot.tree.add_command(change_elo)
     bot.tree.add_command(game)
     bot.tree.add_command(remove_game)
+    bot.tree.add_command(edit_result)
     bot.tree.add_command(highest_elo)
     bot.tree.add_command(toggle_elo_multiplier)
+    bot.tree.add_command(elo_settings)
     bot.tree.add_command(set_inactive)
     bot.tree.add_command(set_active)
     bot.tree.add_command(get_player_id)
     bot.tree.add_command(list_inactive)
     bot.tree.add_command(clean_commands)
     bot.tree.add_command(reset_all_elo)
+    bot.tree.add_command(audit_elo_command)
+    bot.tree.add_command(rebuild_player_stats_command)
+    bot.tree.add_command(cache_stats)
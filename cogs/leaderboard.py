@@ -1,20 +1,248 @@
 import discord
 import settings
 from discord import app_commands
+from discord.ext import commands, tasks
 import sqlite3
-from cogs.paginator import PaginationView
+import database
+import standings
+from cogs.paginator import PaginationView, months_cutoff
+import asyncio
 import datetime
-from collections import defaultdict
+import hashlib
+import json
+from typing import NamedTuple
 
 logger = settings.logging.getLogger("bot")
 
+# Filter shown by default, always snapshotted
+DEFAULT_FILTER = ("months", 0)
+
+
+def leaderboard_query(filter_mode, filter_data, limit=None):
+    """(sql, params) for the ranked [(player_id, elo), ...] rows of a leaderboard filter."""
+    query = """
+        SELECT e.player_id, e.elo
+        FROM elo_data e
+        WHERE e.inactive = 0
+    """
+    params = []
+
+    if filter_mode == "months":
+        if filter_data > 0:
+            cutoff_str = months_cutoff(filter_data)
+            query = """
+                SELECT DISTINCT e.player_id, e.elo
+                FROM elo_data e
+                JOIN (
+                    SELECT winner_id AS p FROM match_data WHERE date >= ?
+                    UNION
+                    SELECT loser_id  AS p FROM match_data WHERE date >= ?
+                ) sub ON sub.p = e.player_id
+                WHERE e.inactive = 0
+            """
+            params = [cutoff_str, cutoff_str]
+
+    elif filter_mode == "gameid":
+        query = """
+            SELECT DISTINCT e.player_id, e.elo
+            FROM elo_data e
+            JOIN (
+                SELECT winner_id AS p FROM match_data WHERE game_id >= ?
+                UNION
+                SELECT loser_id  AS p FROM match_data WHERE game_id >= ?
+            ) sub ON sub.p = e.player_id
+            WHERE e.inactive = 0
+        """
+        params = [filter_data, filter_data]
+
+    query += " ORDER BY e.elo DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    return query, params
+
+
+# Rank snapshots
+# Once a day the full ranking of every tracked filter goes into rank_snapshots, and the
+# movement arrows compare against the snapshot from LEADERBOARD_MOVEMENT_DAYS ago instead
+# of reconstructing old ratings from match_data on every render. A filter is tracked while
+# a live leaderboard shows it (/set_leaderbord takes the first snapshot); the default filter
+# always is. Snapshots of a filter that stops being tracked expire with the rest.
+def _take_rank_snapshots(conn, snapshot_date, filters=None):
+    """Stores the current ranking as of `snapshot_date` for each filter that has none for that
+    day yet, then prunes expired snapshots. Returns the number of filters snapshotted."""
+    c = conn.cursor()
+    if filters is None:
+        c.execute('SELECT DISTINCT filter_mode, filter_data FROM live_leaderboards')
+        filters = {DEFAULT_FILTER, *c.fetchall()}
+
+    taken = 0
+    for filter_mode, filter_data in filters:
+        c.execute('SELECT 1 FROM rank_snapshots WHERE filter_mode = ? AND filter_data = ? AND snapshot_date = ? LIMIT 1',
+                  (filter_mode, filter_data, snapshot_date))
+        if c.fetchone():
+            continue
+        query, params = leaderboard_query(filter_mode, filter_data)
+        c.execute(query, params)
+        ranked = [(filter_mode, filter_data, snapshot_date, player_id, rank)
+                  for rank, (player_id, _elo) in enumerate(c.fetchall(), start=1)]
+        c.executemany('INSERT INTO rank_snapshots (filter_mode, filter_data, snapshot_date, player_id, rank) VALUES (?, ?, ?, ?, ?)',
+                      ranked)
+        taken += 1
+
+    keep_days = max(settings.RANK_SNAPSHOT_KEEP_DAYS, settings.LEADERBOARD_MOVEMENT_DAYS + 1)
+    keep_from = datetime.date.fromisoformat(snapshot_date) - datetime.timedelta(days=keep_days)
+    c.execute('DELETE FROM rank_snapshots WHERE snapshot_date < ?', (keep_from.isoformat(),))
+    return taken
+
+async def take_rank_snapshots(filters=None):
+    """Today's (UTC) snapshot for the given (filter_mode, filter_data) pairs, or every tracked filter."""
+    today = datetime.datetime.utcnow().strftime('%Y-%m-%d')
+    return await database.run_write(_take_rank_snapshots, today, filters)
+
+
+class MovementContext(NamedTuple):
+    """What the movement and streak emoji of one render are looked up in (built by _build_movement_context)."""
+    old_rankings: dict     # player_id -> rank LEADERBOARD_MOVEMENT_DAYS ago
+    recently_active: set   # shown players whose last match was within the last 30 days
+    streaks: dict          # player_id -> current win streak, for those on one
+
+
+def relevant_players_query(filter_mode, filter_data):
+    """(sql, params) for the ids of the players a filter ranks: the same players
+    leaderboard_query lists, so every shown player counts as active in the window."""
+    if filter_mode == "months" and filter_data > 0:
+        cutoff_str = months_cutoff(filter_data)
+        sql = """
+            SELECT DISTINCT p FROM (
+                SELECT winner_id AS p FROM match_data WHERE date >= ?
+                UNION
+                SELECT loser_id  AS p FROM match_data WHERE date >= ?
+            )
+        """
+        return sql, [cutoff_str, cutoff_str]
+    elif filter_mode == "gameid":
+        sql = """
+            SELECT DISTINCT p FROM (
+                SELECT winner_id AS p FROM match_data WHERE game_id >= ?
+                UNION
+                SELECT loser_id  AS p FROM match_data WHERE game_id >= ?
+            )
+        """
+        return sql, [filter_data, filter_data]
+    else:
+        # default: all active players
+        return "SELECT player_id AS p FROM elo_data WHERE inactive = 0", []
+
+def _reconstruct_old_rankings(c, filter_mode, filter_data, since):
+    """
+    Fallback for when there is no rank snapshot from far enough back yet (new install,
+    or a filter that only just started being tracked): rebuilds the ranking as of
+    `since` from the ELO each relevant player had after their first match since then
+    (using your 3-step logic), ranked by that ELO.
+
+    The relevant players are joined in as a CTE rather than bound one placeholder
+    each, so this works the same for 10 players or 50k (no variable limit, no
+    megabyte-sized statements to parse).
+    """
+    # Current ELO of the relevant players (active ones only), then the ELO each of them
+    # had after their first match in the window, picked with the 3-step logic:
+    #   1. first match AFTER the window start (date > since)
+    #   2. if none, oldest match within the window (date = since)
+    #   3. if still none, current ELO (done below)
+    # The second query is cut down to one row per player (rn = 1) and the two are
+    # merged through a dict; joining the ROW_NUMBER() rows in SQL scanned all of them
+    # once per relevant player.
+    rel_sql, rel_params = relevant_players_query(filter_mode, filter_data)
+    c.execute(f"""
+        WITH relevant(p) AS ({rel_sql})
+        SELECT r.p, CASE WHEN e.inactive = 0 THEN e.elo END
+        FROM relevant r
+        LEFT JOIN elo_data e ON e.player_id = r.p
+    """, rel_params)
+    current = c.fetchall()
+
+    c.execute(f"""
+        WITH relevant(p) AS ({rel_sql}),
+        recent AS (
+            SELECT winner_id AS player_id, date, game_id, elo_winner AS elo_after
+            FROM match_data WHERE date >= ?
+            UNION ALL
+            SELECT loser_id  AS player_id, date, game_id, elo_loser  AS elo_after
+            FROM match_data WHERE date >= ?
+        )
+        SELECT player_id, elo_after FROM (
+            SELECT player_id, elo_after,
+                   ROW_NUMBER() OVER (PARTITION BY player_id ORDER BY date > ? DESC, date, game_id) AS rn
+            FROM recent
+            WHERE player_id IN (SELECT p FROM relevant)
+        )
+        WHERE rn = 1
+    """, (*rel_params, since, since, since))
+    first_recent = dict(c.fetchall())
+
+    old_elo_map = {}
+    for pid, current_elo in current:
+        first_recent_elo = first_recent.get(pid)
+        candidate = first_recent_elo if first_recent_elo is not None else current_elo
+        if candidate is not None:
+            old_elo_map[pid] = candidate
+
+    # old rankings (desc by elo)
+    return {
+        pid: rank + 1
+        for rank, (pid, _) in enumerate(sorted(old_elo_map.items(), key=lambda x: x[1], reverse=True))
+    }
+
+def _build_movement_context(conn, filter_mode, filter_data, current_top_rows):
+    """
+    Build all in-memory structures we need in one go, as a MovementContext:
+    - old_rankings: the ranking LEADERBOARD_MOVEMENT_DAYS ago, from the daily rank snapshot
+    - which shown players played in the last 30 days, and their win streaks (from player_stats)
+    Returned rather than stored on the view: a live refresh and a "See all" click on the
+    same view can render at the same time.
+    """
+    c = conn.cursor()
+
+    # prepare time window
+    now = datetime.datetime.utcnow()
+    movement_since = now - datetime.timedelta(days=settings.LEADERBOARD_MOVEMENT_DAYS)
+
+    # Latest snapshot of this filter taken on or before the start of the movement window
+    c.execute('SELECT MAX(snapshot_date) FROM rank_snapshots WHERE filter_mode = ? AND filter_data = ? AND snapshot_date <= ?',
+              (filter_mode, filter_data, movement_since.strftime('%Y-%m-%d')))
+    snapshot_date = c.fetchone()[0]
+    if snapshot_date is not None:
+        c.execute('SELECT player_id, rank FROM rank_snapshots WHERE filter_mode = ? AND filter_data = ? AND snapshot_date = ?',
+                  (filter_mode, filter_data, snapshot_date))
+        old_rankings = dict(c.fetchall())
+    else:
+        old_rankings = _reconstruct_old_rankings(c, filter_mode, filter_data, movement_since.strftime('%Y-%m-%d %H:%M:%S'))
+
+    # Shown players who played in the last 30 days, with their current streak, from
+    # player_stats (kept up to date on every match write, so nothing to walk here).
+    # The ids go in as a single JSON parameter rather than a placeholder per player.
+    active_since = (now - datetime.timedelta(days=31)).strftime('%Y-%m-%d %H:%M:%S')
+    shown_players = json.dumps([pid for pid, _elo in current_top_rows])
+    c.execute("""
+        SELECT player_id, current_streak
+        FROM player_stats
+        WHERE player_id IN (SELECT value FROM json_each(?))
+          AND last_match_date > ?
+    """, (shown_players, active_since))
+    shown_stats = c.fetchall()
+    recently_active = {pid for pid, _streak in shown_stats}
+    # current_streak is negative while on a losing streak; only win streaks get an emoji
+    streaks = {pid: streak for pid, streak in shown_stats if streak > 0}
+    return MovementContext(old_rankings, recently_active, streaks)
+
 
 class LeaderboardView(discord.ui.View):
     """Leaderboard view."""
 
-    def __init__(self, interaction:discord.Interaction, filter_mode: str="months", filter_data: int=0):
+    def __init__(self, interaction:discord.Interaction, filter_mode: str="months", filter_data: int=0, bot=None):
         super().__init__(timeout=None)
-        self.bot = interaction.client
+        self.bot = bot or interaction.client  # live leaderboards re-render without an interaction
         self.interaction = interaction
         self.filter_mode = filter_mode # "months" or "gameid"
         self.filter_data = filter_data # Number of months or game ID
@@ -47,161 +275,15 @@ class LeaderboardView(discord.ui.View):
 
     #start new code
 
-    def _filter_relevant_players_query(self):
-        # Returns (sql, params) for relevant players based on filter
-        if self.filter_mode == "months" and self.filter_data > 0:
-            cutoff_date = datetime.datetime.utcnow() - datetime.timedelta(days=1 * self.filter_data)
-            cutoff_str = cutoff_date.strftime('%Y-%m-%d %H:%M:%S')
-            sql = """
-                SELECT DISTINCT p FROM (
-                    SELECT winner_id AS p FROM match_data WHERE date >= ?
-                    UNION
-                    SELECT loser_id  AS p FROM match_data WHERE date >= ?
-                )
-            """
-            return sql, [cutoff_str, cutoff_str]
-        elif self.filter_mode == "gameid":
-            sql = """
-                SELECT DISTINCT p FROM (
-                    SELECT winner_id AS p FROM match_data WHERE game_id >= ?
-                    UNION
-                    SELECT loser_id  AS p FROM match_data WHERE game_id >= ?
-                )
-            """
-            return sql, [self.filter_data, self.filter_data]
-        else:
-            # default: all active players
-            return "SELECT player_id AS p FROM elo_data WHERE inactive = 0", []
-
-    def _build_context(self, conn, current_top_rows):
-        """
-        Build all in-memory structures we need in one go:
-        - relevant_players
-        - current_elo_map
-        - elo_5_days_ago_map (using your 3-step logic)
-        - old_rankings (sorted by elo_5_days_ago)
-        - streaks
-        """
+    def _fetch_rows_and_context(self, conn, query, params):
+        """Runs the leaderboard query and builds the context for it (called in the DB thread pool).
+        Returns (rows, MovementContext)."""
         c = conn.cursor()
+        c.execute(query, params)
+        elo_rows = c.fetchall()
 
-        # relevant players
-        rel_sql, rel_params = self._filter_relevant_players_query()
-        c.execute(rel_sql, rel_params)
-        relevant_players = {row[0] for row in c.fetchall()}
-        if not relevant_players:
-            self._old_rankings = {}
-            self._streaks = {}
-            self._now_rankings = {}
-            return
-
-        # Last match date per relevant player (one grouped query)
-        placeholders = ",".join(["?"] * len(relevant_players))
-        c.execute(f"""
-            SELECT player_id, MAX(date) AS last_date
-            FROM (
-                SELECT winner_id AS player_id, date FROM match_data WHERE winner_id IN ({placeholders})
-                UNION ALL
-                SELECT loser_id  AS player_id, date FROM match_data WHERE loser_id  IN ({placeholders})
-            ) t
-            GROUP BY player_id
-        """, tuple([*relevant_players, *relevant_players]))
-
-        self._last_match_date = {pid: d for pid, d in c.fetchall()}
-
-        # current ELO for relevant players
-        placeholders = ",".join(["?"] * len(relevant_players))
-        c.execute(f"SELECT player_id, elo FROM elo_data WHERE player_id IN ({placeholders}) AND inactive = 0", tuple(relevant_players))
-        current_elo_map = {pid: elo for pid, elo in c.fetchall()}
-
-        # prepare time window
-        now = datetime.datetime.utcnow()
-        five_days_before = (now - datetime.timedelta(days=5)).strftime('%Y-%m-%d %H:%M:%S')
-        now_str = now.strftime('%Y-%m-%d %H:%M:%S')
-
-        # all matches for relevant players in the last 5 days (winner/loser unified)
-        # We select: player_id, date, elo_after_match
-        match_union_sql = f"""
-            SELECT winner_id AS player_id, date, elo_winner AS elo_after
-            FROM match_data
-            WHERE date >= ? AND winner_id IN ({placeholders})
-            UNION ALL
-            SELECT loser_id  AS player_id, date, elo_loser  AS elo_after
-            FROM match_data
-            WHERE date >= ? AND loser_id  IN ({placeholders})
-        """
-        params = [five_days_before, *relevant_players, five_days_before, *relevant_players]
-        c.execute(match_union_sql, tuple(params))
-        rows = c.fetchall()
-
-        # group by player -> list of (date, elo_after)
-        per_player = defaultdict(list)
-        for pid, d, elo_after in rows:
-            per_player[pid].append((d, elo_after))
-
-        # sort per player by date ASC to find "first after 5 days ago"
-        for pid in per_player:
-            per_player[pid].sort(key=lambda x: x[0])
-
-        # apply 3-step logic to determine "elo_5_days_ago"
-        elo_5_days_ago_map = {}
-        for pid in relevant_players:
-            entries = per_player.get(pid, [])
-
-            # Step 1: first match AFTER 5 days ago (date > five_days_before) -> with our filter it's >=; we emulate ">" by skipping == if desired
-            first_after = None
-            for d, e in entries:
-                if d > five_days_before:
-                    first_after = e
-                    break
-
-            # Step 2: if none, oldest match WITHIN last 5 days (same window; already sorted asc)
-            oldest_within = entries[0][1] if entries else None
-
-            # Choose according to logic; if step1 failed, use step2
-            candidate = first_after if first_after is not None else oldest_within
-
-            # Step 3: if still none, fallback to current ELO
-            if candidate is None:
-                candidate = current_elo_map.get(pid)
-
-            if candidate is not None:
-                elo_5_days_ago_map[pid] = candidate
-
-        # old rankings (desc by elo)
-        self._old_rankings = {
-            pid: rank + 1
-            for rank, (pid, _) in enumerate(sorted(elo_5_days_ago_map.items(), key=lambda x: x[1], reverse=True))
-        }
-
-        # winning streaks: need recent matches ordered by date DESC for all relevant players
-        # (use a single query; then count consecutive wins from most recent backwards)
-        # We only need winner_id/loser_id/date to count wins until first loss.
-        streak_sql = f"""
-            SELECT winner_id, loser_id, date
-            FROM match_data
-            WHERE winner_id IN ({placeholders}) OR loser_id IN ({placeholders})
-            ORDER BY date DESC
-        """
-        params = [*relevant_players, *relevant_players]
-        c.execute(streak_sql, tuple(params))
-        all_matches = c.fetchall()
-
-
-        streaks = defaultdict(int)      # or keep your dict and use .get
-        seen_loss_break = defaultdict(bool)
-
-        for w, l, d in all_matches:
-            if w in relevant_players and not seen_loss_break[w]:
-                streaks[w] += 1
-            if l in relevant_players and not seen_loss_break[l]:
-                seen_loss_break[l] = True
-
-        self._streaks = streaks
-
-        # now rankings (current page set): map player_id -> current rank
-        self._now_rankings = {}
-        for idx, (pid, _elo) in enumerate(current_top_rows, start=1):
-            self._now_rankings[pid] = idx
+        # Build context once for all players shown
+        return elo_rows, _build_movement_context(conn, self.filter_mode, self.filter_data, elo_rows)
 
     #end new code
 
@@ -210,59 +292,27 @@ class LeaderboardView(discord.ui.View):
     async def get_leaderboard_data(self, interaction, limit: int = 10):
         try:
             data = []
-            query = """
-                SELECT e.player_id, e.elo
-                FROM elo_data e
-                WHERE e.inactive = 0
-            """
-            params = []
-
-            if self.filter_mode == "months":
-                if self.filter_data > 0:
-                    cutoff_date = datetime.datetime.utcnow() - datetime.timedelta(days=30 * self.filter_data)
-                    cutoff_str = cutoff_date.strftime('%Y-%m-%d %H:%M:%S')
-                    query = """
-                        SELECT DISTINCT e.player_id, e.elo
-                        FROM elo_data e
-                        JOIN (
-                            SELECT winner_id AS p FROM match_data WHERE date >= ?
-                            UNION
-                            SELECT loser_id  AS p FROM match_data WHERE date >= ?
-                        ) sub ON sub.p = e.player_id
-                        WHERE e.inactive = 0
-                    """
-                    params = [cutoff_str, cutoff_str]
-
-            elif self.filter_mode == "gameid":
-                query = """
-                    SELECT DISTINCT e.player_id, e.elo
-                    FROM elo_data e
-                    JOIN (
-                        SELECT winner_id AS p FROM match_data WHERE game_id >= ?
-                        UNION
-                        SELECT loser_id  AS p FROM match_data WHERE game_id >= ?
-                    ) sub ON sub.p = e.player_id
-                    WHERE e.inactive = 0
-                """
-                params = [self.filter_data, self.filter_data]
-
-            query += " ORDER BY e.elo DESC LIMIT ?"
-            params.append(limit)
-
-            with sqlite3.connect('elo_data.db') as conn:
-                c = conn.cursor()
-                c.execute(query, params)
-                elo_rows = c.fetchall()  # [(player_id, elo), ...]
-
-                # Build context once for all players shown
-                self._build_context(conn, elo_rows)
-
-                for rank, (player_id, elo) in enumerate(elo_rows, start=1):
-                    movement = self.get_movement_emoji(player_id, rank)  # now a cheap lookup
-                    rank_str = f"`{rank}) `" if rank > 3 else [":first_place:", ":second_place:", ":third_place:"][rank - 1] + " \u200b"
-                    data.append(f"{rank_str} <@{player_id}> **({elo})** {movement}")
-                    if rank == 3:
-                        data.append("\u200b")
+            entries = standings.leaderboards.get(self.filter_mode, self.filter_data, limit)
+            if entries is None:
+                # Compute the whole bucket, so e.g. the top 10 is served from a cached top 200
+                bucket = standings.leaderboards.bucket(limit)
+                version = standings.version
+                query, params = leaderboard_query(self.filter_mode, self.filter_data, bucket)
+
+                # Query and build context off the event loop, on one reader connection
+                elo_rows, context = await database.run_read(self._fetch_rows_and_context, query, params)  # [(player_id, elo), ...]
+                entries = [
+                    (player_id, elo, self.get_movement_emoji(context, player_id, rank))  # now a cheap lookup
+                    for rank, (player_id, elo) in enumerate(elo_rows, start=1)
+                ]
+                standings.leaderboards.put(self.filter_mode, self.filter_data, bucket, entries, version)
+                entries = entries[:limit]
+
+            for rank, (player_id, elo, movement) in enumerate(entries, start=1):
+                rank_str = f"`{rank}) `" if rank > 3 else [":first_place:", ":second_place:", ":third_place:"][rank - 1] + " \u200b"
+                data.append(f"{rank_str} <@{player_id}> **({elo})** {movement}")
+                if rank == 3:
+                    data.append("\u200b")
 
             return data
 
@@ -277,23 +327,14 @@ class LeaderboardView(discord.ui.View):
 
     #begin code 3
 
-    def get_movement_emoji(self, player_id, current_rank):
-        # Only show movement if last played match was >= 30 days ago
-        last_str = getattr(self, "_last_match_date", {}).get(player_id)
-        if not last_str:
-            return ""  # no matches known → show nothing
-
-        # Parse to datetime (adjust format if your DB uses a different one)
-        try:
-            last_dt = datetime.datetime.strptime(last_str, "%Y-%m-%d %H:%M:%S")
-        except ValueError:
-            last_dt = datetime.datetime.fromisoformat(last_str)
-
-        if (datetime.datetime.utcnow() - last_dt).days > 30:
-            return ""  # too recent → no emoji
+    def get_movement_emoji(self, context, player_id, current_rank):
+        """Rank movement and streak emoji; only looks at the MovementContext _build_movement_context prepared."""
+        # Only show movement for players whose last match was within the last 30 days
+        if player_id not in context.recently_active:
+            return ""
 
         # existing rank movement + streak logic
-        old_rank = self._old_rankings.get(player_id)
+        old_rank = context.old_rankings.get(player_id)
         if old_rank is None:
             return ""
 
@@ -301,7 +342,7 @@ class LeaderboardView(discord.ui.View):
         movement = "<:testria7:1147540299434967081>" if rank_difference > 0 else \
                    ":small_red_triangle_down:" if rank_difference < 0 else ""
 
-        streak = self._streaks.get(player_id, 0)
+        streak = context.streaks.get(player_id, 0)
         rules = [
             (streak >= 3,  ":fire:"),
             (streak == 6,  ":boom:"),
@@ -323,7 +364,8 @@ class LeaderboardView(discord.ui.View):
         return await self.get_leaderboard_data(self.interaction, limit=200)
 
 
-    @discord.ui.button(label='See all', style=discord.ButtonStyle.primary)
+    # Fixed custom_id so the button keeps working on live leaderboards after a restart
+    @discord.ui.button(label='See all', style=discord.ButtonStyle.primary, custom_id="leaderboard:see_all")
     async def button_callback(self, interaction: discord.Interaction, button: discord.ui.Button):
         if not interaction.response.is_done():
             await interaction.response.defer(ephemeral=True)       
@@ -396,8 +438,9 @@ async def set_leaderbord(interaction, channel: discord.TextChannel, filter_type:
         filter_data = filter_value
 
     view = LeaderboardView(interaction, filter_mode=filter_mode, filter_data=filter_data) 
-    data = await view.get_leaderboard_data(interaction, limit=10)
+    # The full list first: the top 10 is then served from the same cached computation
     data_for_mentions = await view.get_leaderboard_data(interaction, limit=1000)
+    data = await view.get_leaderboard_data(interaction, limit=10)
 
     if not data:
         await interaction.followup.send(f"No matches found for `{filter_type.value}` ({filter_value}).")
@@ -419,10 +462,167 @@ async def set_leaderbord(interaction, channel: discord.TextChannel, filter_type:
     if player_mentions:
         await send_leaderboard_mentions(leaderboard_channel, player_mentions)
 
-    global leaderboard_message
-    leaderboard_message = await leaderboard_channel.send(embed=view.create_embed(data), view=view)
+    embed = view.create_embed(data)
+    message = await leaderboard_channel.send(embed=embed, view=view)
+
+    # Keep the message up to date from now on (replaces any live leaderboard already in that channel)
+    cog = interaction.client.get_cog("LeaderboardCog")
+    if cog is not None:
+        await cog.attach(message, filter_mode, filter_data, embed_hash(embed))
+
+    # Start tracking this filter so its movement arrows come from daily snapshots
+    try:
+        await take_rank_snapshots([(filter_mode, filter_data)])
+    except sqlite3.Error as e:
+        logger.error(f"Could not snapshot ranks for filter {filter_mode} ({filter_data}): {e}")
+
+
+def embed_hash(embed):
+    return hashlib.sha256(json.dumps(embed.to_dict(), sort_keys=True).encode()).hexdigest()
+
+
+class LiveLeaderboard:
+    """One auto-updating leaderboard message (a row of live_leaderboards).
+
+    schedule() is called on every standings change; the message is re-rendered once
+    changes have stopped for LEADERBOARD_REFRESH_DELAY seconds (at most
+    LEADERBOARD_REFRESH_MAX_DELAY after the first one), so a burst of matches costs
+    one edit. The edit is skipped when the rendered embed hashes the same as the
+    one already shown.
+    """
+
+    def __init__(self, bot, channel_id, message_id, filter_mode, filter_data, content_hash=None):
+        self.bot = bot
+        self.channel_id = channel_id
+        self.message_id = message_id
+        self.filter_mode = filter_mode
+        self.filter_data = filter_data
+        self.content_hash = content_hash
+        self.view = LeaderboardView(None, filter_mode=filter_mode, filter_data=filter_data, bot=bot)
+        self.gone = False  # the message was deleted; the cog drops this board
+        self.edits = 0
+        self.skipped_edits = 0
+        self._changed = asyncio.Event()
+        self._task = None
+
+    def schedule(self):
+        """Marks the standings as changed; a refresh follows once they settle."""
+        self._changed.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._refresh_when_settled())
+
+    def cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _refresh_when_settled(self):
+        loop = asyncio.get_running_loop()
+        # Changes that come in while a refresh is running trigger one more round
+        while self._changed.is_set():
+            deadline = loop.time() + settings.LEADERBOARD_REFRESH_MAX_DELAY
+            while True:
+                self._changed.clear()
+                timeout = min(settings.LEADERBOARD_REFRESH_DELAY, deadline - loop.time())
+                if timeout <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    break  # quiet for long enough
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception(f"Could not refresh the live leaderboard in channel {self.channel_id}")
+
+    async def refresh(self):
+        """Re-renders the message now, unless nothing it shows has changed."""
+        data = await self.view.get_leaderboard_data(None, limit=10)
+        if not data:
+            return
+        embed = self.view.create_embed(data)
+        content_hash = embed_hash(embed)
+        if content_hash == self.content_hash:
+            self.skipped_edits += 1
+            return
+
+        message = self.bot.get_partial_messageable(self.channel_id).get_partial_message(self.message_id)
+        try:
+            await message.edit(embed=embed, view=self.view)
+        except discord.NotFound:
+            logger.info(f"Live leaderboard message {self.message_id} was deleted; no longer updating it")
+            self.gone = True
+            await database.execute('DELETE FROM live_leaderboards WHERE channel_id = ? AND message_id = ?',
+                                   (self.channel_id, self.message_id))
+            return
+        self.content_hash = content_hash
+        self.edits += 1
+        await database.execute('UPDATE live_leaderboards SET content_hash = ? WHERE channel_id = ? AND message_id = ?',
+                               (content_hash, self.channel_id, self.message_id))
+
+
+class LeaderboardCog(commands.Cog):
+    """Daily rank snapshots and the live leaderboard messages."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.live = {}  # channel_id -> LiveLeaderboard
+        self.snapshot_task.start()
+
+    async def cog_load(self):
+        # Re-attach the live leaderboards saved by /set_leaderbord
+        rows = await database.fetchall('SELECT channel_id, message_id, filter_mode, filter_data, content_hash FROM live_leaderboards')
+        for row in rows:
+            self._add_live(*row)
+        standings.subscribe(self.schedule_refresh)
+        # Catch up on whatever changed while the bot was offline (unchanged boards aren't edited)
+        self.schedule_refresh()
+
+    def cog_unload(self):
+        self.snapshot_task.cancel()
+        standings.unsubscribe(self.schedule_refresh)
+        for live in self.live.values():
+            live.cancel()
+
+    def _add_live(self, channel_id, message_id, filter_mode, filter_data, content_hash=None):
+        live = LiveLeaderboard(self.bot, channel_id, message_id, filter_mode, filter_data, content_hash)
+        # Route the "See all" button on that message to this board's view
+        self.bot.add_view(live.view, message_id=message_id)
+        self.live[channel_id] = live
+        return live
+
+    async def attach(self, message, filter_mode, filter_data, content_hash):
+        """Makes `message` the live leaderboard of its channel."""
+        await database.execute(
+            'INSERT OR REPLACE INTO live_leaderboards (channel_id, message_id, filter_mode, filter_data, content_hash) VALUES (?, ?, ?, ?, ?)',
+            (message.channel.id, message.id, filter_mode, filter_data, content_hash))
+        previous = self.live.get(message.channel.id)
+        if previous is not None:
+            previous.cancel()
+        self._add_live(message.channel.id, message.id, filter_mode, filter_data, content_hash)
+
+    def schedule_refresh(self):
+        for channel_id, live in list(self.live.items()):
+            if live.gone:
+                del self.live[channel_id]
+            else:
+                live.schedule()
+
+    # Each filter gets at most one snapshot per UTC day; checking hourly means a
+    # restart or a late start never skips a day.
+    @tasks.loop(hours=1)
+    async def snapshot_task(self):
+        try:
+            taken = await take_rank_snapshots()
+        except sqlite3.Error as e:
+            logger.error(f"Rank snapshot failed: {e}")
+            return
+        if taken:
+            logger.info(f"Took daily rank snapshots for {taken} leaderboard filter(s)")
+        # Movement arrows and the 30-day activity cut-off move with time, not only with matches
+        standings.leaderboards.invalidate()
+        self.schedule_refresh()
 
 
 async def setup(bot):
     bot.tree.add_command(set_leaderbord)
-    return
+    await bot.add_cog(LeaderboardCog(bot))
@@ -2,20 +2,159 @@ import settings
 import discord
 from discord.ext import commands
 from discord import app_commands
+import asyncio
+import calendar
+import collections
 import datetime
+import math
 import sqlite3
+import database
 
 logger = settings.logging.getLogger("bot")
 
 PAGE_SIZE = 11
 INITIAL_PAGE = 1
 EMBED_COLOR = discord.Color.blue()  # or any color you prefer
+CACHED_PAGES = 8  # pages a KeysetPages keeps around for going back and forth
+
+
+class ListPages:
+    """Page source over an already built list of lines (what PaginationView.data used to be)."""
+
+    def __init__(self, lines, page_size=PAGE_SIZE):
+        self.lines = lines
+        self.page_size = page_size
+
+    async def count(self):
+        return len(self.lines)
+
+    async def page_count(self):
+        return max(1, math.ceil(len(self.lines) / self.page_size))
+
+    async def page(self, number):
+        return self.lines[(number - 1) * self.page_size:number * self.page_size]
+
+    def prefetch(self, number):
+        pass
+
+
+class KeysetPages:
+    """Page source that fetches one page of rows at a time with keyset pagination.
+
+    `source_sql` is any SELECT; its `key_columns` must identify a row uniquely, must
+    never be NULL (a NULL fails every key comparison, so its row would drop out of the
+    pages) and rows are ordered by them (all descending or all ascending). Instead of OFFSET,
+    the next page is sought with `(key) < (last key on this page)`, the previous one
+    with `>` in reverse order, and the last page by reading backwards from the end -
+    so with an index on the key columns every page costs the same, however deep.
+    `format_page(rows, first_rank)` turns a page of rows into embed lines.
+
+    Only the most recent CACHED_PAGES pages stay in memory, and prefetch() loads the
+    page after the one being shown in the background.
+    """
+
+    def __init__(self, source_sql, params, key_columns, format_page, page_size=PAGE_SIZE, descending=True):
+        self.source_sql = source_sql
+        self.params = tuple(params)
+        self.key_columns = tuple(key_columns)
+        self.format_page = format_page
+        self.page_size = page_size
+        self.descending = descending
+        self._count = None
+        self._pages = collections.OrderedDict()  # page number -> lines, least recently used first
+        self._first_keys = {}  # page number -> key of its first row
+        self._last_keys = {}   # page number -> key of its last row
+        self._prefetching = {}
+
+    def _fetch(self, conn, after_key, backwards, limit, offset=None):
+        keys = ", ".join(self.key_columns)
+        forward_op, order = ("<", "DESC") if self.descending else (">", "ASC")
+        if backwards:
+            forward_op, order = {"<": ">", ">": "<"}[forward_op], {"DESC": "ASC", "ASC": "DESC"}[order]
+        order_by = ", ".join(f"{column} {order}" for column in self.key_columns)
+        sql = f"SELECT * FROM ({self.source_sql})"
+        params = list(self.params)
+        if after_key is not None:
+            # The (redundant) bound on the first key column lets SQLite seek an index on it
+            # directly; the row-value comparison alone is only used as a filter by some plans.
+            sql += f" WHERE {self.key_columns[0]} {forward_op}= ? AND ({keys}) {forward_op} ({', '.join('?' * len(after_key))})"
+            params += [after_key[0], *after_key]
+        sql += f" ORDER BY {order_by} LIMIT ?"
+        params.append(limit)
+        if offset:
+            sql += " OFFSET ?"
+            params.append(offset)
+        c = conn.cursor()
+        c.execute(sql, params)
+        names = [column[0] for column in c.description]
+        key_index = [names.index(column) for column in self.key_columns]
+        rows = c.fetchall()
+        if backwards:
+            rows.reverse()
+        return rows, key_index
+
+    async def count(self):
+        if self._count is None:
+            self._count = (await database.fetchone(f"SELECT COUNT(*) FROM ({self.source_sql})", self.params))[0]
+        return self._count
+
+    async def page_count(self):
+        return max(1, math.ceil(await self.count() / self.page_size))
+
+    async def _load(self, number):
+        last_page = await self.page_count()
+        if number == 1:
+            args = (None, False, self.page_size)
+        elif number - 1 in self._last_keys:
+            args = (self._last_keys[number - 1], False, self.page_size)
+        elif number + 1 in self._first_keys:
+            args = (self._first_keys[number + 1], True, self.page_size)
+        elif number == last_page:
+            args = (None, True, await self.count() - (last_page - 1) * self.page_size)
+        else:
+            # No neighbouring page seen yet - only reachable if pages were skipped
+            args = (None, False, self.page_size, (number - 1) * self.page_size)
+        rows, key_index = await database.run_read(self._fetch, *args)
+        if rows:
+            self._first_keys[number] = [rows[0][i] for i in key_index]
+            self._last_keys[number] = [rows[-1][i] for i in key_index]
+        return self.format_page(rows, (number - 1) * self.page_size + 1)
+
+    async def page(self, number):
+        if number in self._pages:
+            self._pages.move_to_end(number)
+            return self._pages[number]
+        if number in self._prefetching:
+            lines = await self._prefetching[number]
+        else:
+            lines = await self._load(number)
+        self._pages[number] = lines
+        while len(self._pages) > CACHED_PAGES:
+            self._pages.popitem(last=False)
+        return lines
+
+    def prefetch(self, number):
+        """Starts loading page `number` in the background, if it exists and isn't loaded yet."""
+        if number < 1 or number in self._pages or number in self._prefetching:
+            return
+        if self._count is not None and number > math.ceil(self._count / self.page_size):
+            return
+        task = asyncio.get_running_loop().create_task(self._load(number))
+        self._prefetching[number] = task
+        task.add_done_callback(lambda done: self._prefetched(number, done))
+
+    def _prefetched(self, number, task):
+        self._prefetching.pop(number, None)
+        if not task.cancelled() and task.exception() is None and number not in self._pages:
+            self._pages[number] = task.result()
+            while len(self._pages) > CACHED_PAGES:
+                self._pages.popitem(last=False)
 
 
 class PaginationView(discord.ui.View):
     """View for paginated embeds."""
 
-    def __init__(self, interaction:discord.Interaction, title:str, description:str, embed_color:discord.Color, ephemeral:bool):
+    def __init__(self, interaction:discord.Interaction, title:str, description:str, embed_color:discord.Color, ephemeral:bool, pages=None):
         super().__init__(timeout=300)
         self.bot = interaction.client
         self.interaction = interaction
@@ -26,6 +165,10 @@ class PaginationView(discord.ui.View):
         self.embed_color = embed_color
         self.ephemeral = ephemeral
         self.message = None
+        # Either pass a page source (ListPages / KeysetPages) or set .data to a list of lines before send()
+        self.pages = pages
+        self.data = None
+        self.page_count : int = 1
 
 
     #async def send(self):
@@ -38,8 +181,13 @@ class PaginationView(discord.ui.View):
         """Send the initial message."""
         if not self.interaction.response.is_done():
             await self.interaction.response.defer(ephemeral=self.ephemeral)  # Acknowledge the interaction
+        if self.pages is None:
+            self.pages = ListPages(self.data, self.sep)
+        self.page_count = await self.pages.page_count()
+        self.update_buttons()
         # Send a follow-up message and store it for editing later
-        self.message = await self.interaction.followup.send(embed=self.create_embed(self.data[:self.sep]), view=self, ephemeral=self.ephemeral)
+        self.message = await self.interaction.followup.send(embed=self.create_embed(await self.pages.page(self.current_page)), view=self, ephemeral=self.ephemeral)
+        self.pages.prefetch(self.current_page + 1)
 
 
 
@@ -50,9 +198,13 @@ class PaginationView(discord.ui.View):
             description=self.description,
             color=self.embed_color
         )
-        data[-1] += "\n\u200b"  # Add a newline to the last item
+        data = list(data)  # pages may be cached; don't modify them
+        if data:
+            data[-1] += "\n\u200b"  # Add a newline to the last item
+        else:
+            data = ["Nothing to show on this page."]  # Discord rejects an empty field
         embed.add_field(name="\u200b", value="\n".join(data), inline=False)
-        embed.set_footer(text=f"{self.bot.user.name} • Page {self.current_page} / {int(len(self.data) / self.sep) + 1}",
+        embed.set_footer(text=f"{self.bot.user.name} • Page {self.current_page} / {self.page_count}",
                         icon_url=self.bot.user.display_avatar.url)
         return embed 
    
@@ -74,6 +226,8 @@ class PaginationView(discord.ui.View):
             self.message = await self.interaction.original_response()
     
         await self.message.edit(embed=self.create_embed(data), view=self)
+        # Most people page forward; have the next page ready by the time they click
+        self.pages.prefetch(self.current_page + 1)
 
 
 
@@ -89,7 +243,7 @@ class PaginationView(discord.ui.View):
             self.first_page_button.style = discord.ButtonStyle.green
             self.prev_button.style = discord.ButtonStyle.primary
 
-        if self.current_page == int(len(self.data) / self.sep) + 1:
+        if self.current_page == self.page_count:
             self.next_button.disabled = True
             self.last_page_button.disabled = True
             self.last_page_button.style = discord.ButtonStyle.gray
@@ -100,10 +254,8 @@ class PaginationView(discord.ui.View):
             self.last_page_button.style = discord.ButtonStyle.green
             self.next_button.style = discord.ButtonStyle.primary
 
-    def get_current_page_data(self):
-        until_item = self.current_page * self.sep
-        from_item = until_item - self.sep
-        return self.data[from_item:until_item]
+    async def get_current_page_data(self):
+        return await self.pages.page(self.current_page)
 
     @discord.ui.button(label="|<",
                        style=discord.ButtonStyle.green)
@@ -111,28 +263,185 @@ class PaginationView(discord.ui.View):
         await interaction.response.defer()
         self.current_page = 1
 
-        await self.update_message(self.get_current_page_data())
+        await self.update_message(await self.get_current_page_data())
 
     @discord.ui.button(label="<",
                        style=discord.ButtonStyle.primary)
     async def prev_button(self, interaction:discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer()
         self.current_page -= 1
-        await self.update_message(self.get_current_page_data())
+        await self.update_message(await self.get_current_page_data())
 
     @discord.ui.button(label=">",
                        style=discord.ButtonStyle.primary)
     async def next_button(self, interaction:discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer()
         self.current_page += 1
-        await self.update_message(self.get_current_page_data())
+        await self.update_message(await self.get_current_page_data())
 
     @discord.ui.button(label=">|",
                        style=discord.ButtonStyle.green)
     async def last_page_button(self, interaction:discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer()
-        self.current_page = int(len(self.data) / self.sep) + 1
-        await self.update_message(self.get_current_page_data())
+        self.current_page = self.page_count
+        await self.update_message(await self.get_current_page_data())
+
+
+def format_leaderboard_page(rows, first_rank):
+    data = []
+    for rank, (player_id, elo) in enumerate(rows, start=first_rank):
+        if rank == 1:
+            rank_str = ":first_place: \u200b"
+        elif rank == 2:
+            rank_str = ":second_place: \u200b"
+        elif rank == 3:
+            rank_str = ":third_place: \u200b"
+        else:
+            rank_str = f"`{rank}) `"
+        data.append(f"{rank_str} <@{player_id}> **({elo})**")
+        if rank == 3:
+            data.append("\u200b")  # Add a newline after the 3rd rank
+    return data
+
+def format_highest_elo_page(rows, first_rank):
+    return [f"`{rank}) `<@{player_id}> **[{elo_highest}]**" for rank, (player_id, elo_highest) in enumerate(rows, start=first_rank)]
+
+def format_wl_ratio_page(rows, first_rank):
+    return [f"`{rank})` <@{player_id}> **{wl_ratio:.2f} ({wins}W/{losses}L)**"
+            for rank, (player_id, wins, losses, wl_ratio) in enumerate(rows, start=first_rank)]
+
+def format_matches_page(rows, first_rank):
+    data = []
+    for game_id, date, winner_id, loser_id in rows:
+        data.append(f"**Match {game_id}** on {date}")
+        data.append(f"Winner: <@{winner_id}> | Loser: <@{loser_id}>")
+    return data
+
+def format_match_history_page(rows, first_rank):
+    data = []
+    for game_id, date, winner_id, loser_id, elo_change, multiplier in rows:
+        multiplier = multiplier or 1
+        data.append(f"**Match {game_id}** on {date}" + (f" (x{multiplier})" if multiplier != 1 else ""))
+        data.append(f"Winner: <@{winner_id}> (+{(elo_change or 0) * multiplier}) | Loser: <@{loser_id}> (-{elo_change or 0})")
+    return data
+
+def match_history_query(player_id=None, opponent_id=None, date_from=None, date_to=None, multiplier=None):
+    """(sql, params) selecting the matches that pass the /matches filters; dates are 'YYYY-MM-DD', both inclusive.
+
+    With a player the query is one branch per side (player won / player lost), so each
+    can seek idx_match_data_winner_game / idx_match_data_loser_game in game_id order and
+    KeysetPages merges them; the other filters are checked on the way.
+    """
+    columns = "SELECT game_id, date, winner_id, loser_id, elo_change, multiplier FROM match_data"
+    conditions, params = [], []
+    if date_from:
+        conditions.append("date >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append("date < ?")
+        params.append((datetime.date.fromisoformat(date_to) + datetime.timedelta(days=1)).isoformat())
+    if multiplier:
+        # Rows from before the multiplier existed have NULL there, which counts as 1 everywhere.
+        # The condition is only checked on rows the player/game_id seek already found, so
+        # wrapping the column costs no index.
+        conditions.append("COALESCE(multiplier, 1) = ?")
+        params.append(multiplier)
+
+    if player_id is None:
+        player_id, opponent_id = opponent_id, None
+    if player_id is None:
+        return columns + (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    branches, branch_params = [], []
+    for side, other_side in (("winner_id", "loser_id"), ("loser_id", "winner_id")):
+        branch = [f"{side} = ?"]
+        branch_params.append(player_id)
+        if opponent_id is not None:
+            branch.append(f"{other_side} = ?")
+            branch_params.append(opponent_id)
+        if side == "loser_id":
+            # A (bogus) game against oneself is already in the first branch; game_ids must stay unique
+            branch.append("winner_id <> ?")
+            branch_params.append(player_id)
+        branches.append(f"{columns} WHERE {' AND '.join(branch + conditions)}")
+        branch_params += params
+    return " UNION ALL ".join(branches), branch_params
+
+
+def months_cutoff(months):
+    """Start of a "last N months" filter window, as stored in match_data.date: now, N calendar
+    months back (on the 31st, going back to a shorter month lands on its last day)."""
+    now = datetime.datetime.utcnow()
+    year, month = divmod(now.year * 12 + now.month - 1 - months, 12)
+    month += 1
+    cutoff_date = now.replace(year=year, month=month, day=min(now.day, calendar.monthrange(year, month)[1]))
+    return cutoff_date.strftime('%Y-%m-%d %H:%M:%S')
+
+
+# Page sources of the /paginate lists and /matches. query_plans.py checks the statements
+# these page with, so the commands build their pages only through them.
+def leaderboard_pages(months=0):
+    # Same filter as the ELO leaderboard (leaderboard.leaderboard_query): active players,
+    # and with `months` only those who played in that period
+    query = '''
+        SELECT e.player_id, e.elo
+        FROM elo_data e
+        WHERE e.inactive = 0
+    '''
+    params = []
+
+    if months > 0:
+        cutoff_date = months_cutoff(months)
+        query = '''
+            SELECT DISTINCT e.player_id, e.elo
+            FROM elo_data e
+            JOIN (
+                SELECT winner_id AS p FROM match_data WHERE date >= ?
+                UNION
+                SELECT loser_id AS p FROM match_data WHERE date >= ?
+            ) sub ON sub.p = e.player_id
+            WHERE e.inactive = 0
+        '''
+        params = [cutoff_date, cutoff_date]
+
+    return KeysetPages(query, params, ("elo", "player_id"), format_leaderboard_page)
+
+def highest_elo_pages():
+    # Players who haven't played yet have no highest ELO, and no place in this list
+    return KeysetPages('SELECT player_id, highest_elo FROM elo_data WHERE inactive = 0 AND highest_elo IS NOT NULL', (),
+                       ("highest_elo", "player_id"), format_highest_elo_page)
+
+def wl_ratio_pages(months=0):
+    # Wins/losses come straight from player_stats, which every match write keeps up to date.
+    # Same activity filters as the ELO leaderboard: active players only, and with `months`
+    # only those who played in that period. The ratio expression matches
+    # idx_player_stats_wl_ratio, and CROSS JOIN keeps player_stats as the outer loop, so a
+    # page walks that index in order instead of sorting everyone.
+    query = '''
+    SELECT
+        s.player_id,
+        s.wins,
+        s.losses,
+        CASE WHEN s.losses = 0 THEN s.wins ELSE CAST(s.wins AS FLOAT) / s.losses END AS wl_ratio
+    FROM player_stats s
+    CROSS JOIN elo_data e ON e.player_id = s.player_id
+    WHERE e.inactive = 0 AND s.games_played > 0
+    '''
+    params = []
+    if months > 0:
+        query += " AND s.last_match_date >= ?"
+        params.append(months_cutoff(months))
+    return KeysetPages(query, params, ("wl_ratio", "wins", "player_id"), format_wl_ratio_page)
+
+def recent_matches_pages():
+    # Two lines per match
+    return KeysetPages('SELECT game_id, date, winner_id, loser_id FROM match_data', (),
+                       ("game_id",), format_matches_page, page_size=PAGE_SIZE // 2)
+
+def match_history_pages(player_id=None, opponent_id=None, date_from=None, date_to=None, multiplier=None):
+    # Two lines per match; newest first, paged with seeks on game_id
+    query, params = match_history_query(player_id, opponent_id, date_from, date_to, multiplier)
+    return KeysetPages(query, params, ("game_id",), format_match_history_page, page_size=PAGE_SIZE // 2)
 
 
 class PaginatorCog(commands.Cog):
@@ -141,56 +450,6 @@ class PaginatorCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
-    async def get_wl_ratio_data(self):
-        # Connect to the SQLite database
-        with sqlite3.connect('elo_data.db') as conn:
-            c = conn.cursor()
-            data = []
-            
-            # The SQL query for fetching the W/L ratio leaderboard
-            query = '''
-            WITH Wins AS (
-                SELECT winner_id as player_id, COUNT(*) as win_count
-                FROM match_data
-                GROUP BY winner_id
-            ),
-            Losses AS (
-                SELECT loser_id as player_id, COUNT(*) as loss_count
-                FROM match_data
-                GROUP BY loser_id
-            )
-            SELECT 
-                COALESCE(Wins.player_id, Losses.player_id) as player_id,
-                COALESCE(win_count, 0) as wins,
-                COALESCE(loss_count, 0) as losses,
-                CASE 
-                    WHEN COALESCE(loss_count, 0) = 0 THEN COALESCE(win_count, 0) 
-                    ELSE CAST(COALESCE(win_count, 0) AS FLOAT) / COALESCE(loss_count, 0) 
-                END AS wl_ratio 
-            FROM Wins 
-            LEFT JOIN Losses ON Wins.player_id = Losses.player_id
-            UNION 
-            SELECT 
-                COALESCE(Wins.player_id, Losses.player_id) as player_id,
-                COALESCE(win_count, 0) as wins,
-                COALESCE(loss_count, 0) as losses,
-                CASE 
-                    WHEN COALESCE(loss_count, 0) = 0 THEN COALESCE(win_count, 0) 
-                    ELSE CAST(COALESCE(win_count, 0) AS FLOAT) / COALESCE(loss_count, 0) 
-                END AS wl_ratio 
-            FROM Losses 
-            LEFT JOIN Wins ON Losses.player_id = Wins.player_id
-            ORDER BY wl_ratio DESC, wins DESC
-            '''
-
-            c.execute(query)
-            wl_data = c.fetchall()
-            
-            for rank, (player_id, wins, losses, wl_ratio) in enumerate(wl_data, start=1):
-                data.append(f"`{rank})` <@{player_id}> **{wl_ratio:.2f} ({wins}W/{losses}L)**")
-            
-            return data
-
     @app_commands.command(name = "paginate", description = "Shows the leaderboard or other data")
     @app_commands.choices(choices=[
         app_commands.Choice(name="Leaderboard", value="leaderboard"),
@@ -199,116 +458,104 @@ class PaginatorCog(commands.Cog):
         app_commands.Choice(name="Recent matches", value="recent_matches"),
         app_commands.Choice(name="Other", value="other")
     ])
-    @app_commands.describe(months="Filter by last X months (optional, only for Leaderboard)")
+    @app_commands.describe(months="Filter by last X months (optional, only for Leaderboard and W/L ratio)")
     async def paginate(self, interaction:discord.Interaction, choices: app_commands.Choice[str], private:bool=True, months:int=0):
         try:
-            # Create a connection to the SQLite database
-            with sqlite3.connect('elo_data.db') as conn:
-                c = conn.cursor()
-                data = []
-
-                # The defer interaction is passed to the PaginationView, it is possible to do it here if the interaction takes too long
-                # self.message = await interaction.response.defer(ephemeral=private)
-
-                # Fetch the ELO data from the database and sort it by ELO score
-                if (choices.value == "leaderboard"):
-                    title = "Leaderboard     \t\t\t\t\t\t\t\t\t\t\u200b"
-                    description = "Top ranking ELO players"
-                    embed_color = discord.Color.blue()
-
-
-                    query = '''
-                        SELECT DISTINCT e.player_id, e.elo
-                        FROM elo_data e
-                        WHERE e.inactive = 0
-                    '''
-                    params = []
-
-                    if months > 0:
-                        cutoff_date = (datetime.datetime.utcnow() - datetime.timedelta(days=30 * months)).strftime('%Y-%m-%d %H:%M:%S')
-                        query = '''
-                            SELECT DISTINCT e.player_id, e.elo
-                            FROM elo_data e
-                            JOIN (
-                                SELECT winner_id AS p FROM match_data WHERE date >= ?
-                                UNION
-                                SELECT loser_id AS p FROM match_data WHERE date >= ?
-                            ) sub ON sub.p = e.player_id
-                            WHERE e.inactive = 0
-                        '''
-                        params = [cutoff_date, cutoff_date]
-
-                    query += ' ORDER BY e.elo DESC'
-
-                    #c.execute('SELECT player_id, elo FROM elo_data WHERE inactive = 0 ORDER BY elo DESC')
-                    c.execute(query, params)
-                    elo_data = c.fetchall()     
-
-                    for rank, (player_id, elo) in enumerate(elo_data, start=1):
-                        #player = await self.bot.fetch_user(player_id)
-                        if rank == 1:
-                            rank_str = ":first_place: \u200b"
-                        elif rank == 2:
-                            rank_str = ":second_place: \u200b"
-                        elif rank == 3:
-                            rank_str = ":third_place: \u200b"
-                        else:
-                            rank_str = f"`{rank}) `"
-                        data.append(f"{rank_str} <@{player_id}> **({elo})**")
-                        if rank == 3:
-                            data.append("\u200b")  # Add a newline after the 3rd rank
-
-                if (choices.value == "highest_elo_achieved"):
-                    title = "Highest ELO's achieved   \t\t\t\t\t\t\u200b"
-                    description = "Personal best of all time"
-                    embed_color = discord.Color.yellow()
-
-                    c.execute('SELECT player_id, highest_elo FROM elo_data WHERE inactive = 0 ORDER BY highest_elo DESC')
-                    elo_data = c.fetchall()
-
-                    # Convert the ELO data to the format expected by the PaginationView
-                    for rank, (player_id, elo_highest) in enumerate(elo_data, start=1):
-                        #player = await self.bot.fetch_user(player_id)
-                        data.append(f"`{rank}) `<@{player_id}> **[{elo_highest}]**")
-                
-                if (choices.value == "other"):
-                    title = "Some other stuff \t\t\t\t\t\t\t\t\t\u200b"
-                    description = "Top ranking highest Balls"
-                    embed_color = discord.Color.purple()
-
-                    for i in range(1,100):
-                        data.append(f"Balls{i} has been added")
-                
-                if (choices.value == "wl_ratio"):
-                    title = "W/L Ratio Leaderboard \t\t\t\t\t\t\t\t\t\u200b"
-                    description = "Current W/L ratio ranking"
-                    embed_color = discord.Color.orange()
-
-                    data = await self.get_wl_ratio_data()
-                
-                if (choices.value == "recent_matches"):
-                    title = "Recent matches \t\t\t\t\t\t\t\t\t\u200b"
-                    description = "Last 99 matches played"
-                    embed_color = discord.Color.green()
-
-                    c.execute('SELECT game_id, date, winner_id, loser_id FROM match_data ORDER BY game_id DESC LIMIT 99')
-                    matches = c.fetchall()
-
-                    for game_id, date, winner_id, loser_id in matches:
-                            data.append(f"**Match {game_id}** on {date}")
-                            data.append(f"Winner: <@{winner_id}> | Loser: <@{loser_id}>")
-
-                if not data:  # If no data is found
-                    if (choices.value == "leaderboard"):
-                        await interaction.response.send_message("No matches have been played in the selected period.", ephemeral=True)
-                        return ""
-                    else:
-                        await interaction.response.send_message("No data found", ephemeral=True)
-                        return ""
-
-                pagination_view = PaginationView(interaction, title, description, embed_color, ephemeral=private)
-                pagination_view.data = data
-                await pagination_view.send()
+            # Pages are fetched from the database as they are viewed (see KeysetPages),
+            # so only the count is queried before the first page goes out.
+            pages = None
+
+            # The defer interaction is passed to the PaginationView, it is possible to do it here if the interaction takes too long
+            # self.message = await interaction.response.defer(ephemeral=private)
+
+            # Page through the ELO data, sorted by ELO score
+            if (choices.value == "leaderboard"):
+                title = "Leaderboard     \t\t\t\t\t\t\t\t\t\t\u200b"
+                description = "Top ranking ELO players"
+                embed_color = discord.Color.blue()
+
+                pages = leaderboard_pages(months)
+
+            if (choices.value == "highest_elo_achieved"):
+                title = "Highest ELO's achieved   \t\t\t\t\t\t\u200b"
+                description = "Personal best of all time"
+                embed_color = discord.Color.yellow()
+
+                pages = highest_elo_pages()
+            
+            if (choices.value == "other"):
+                title = "Some other stuff \t\t\t\t\t\t\t\t\t\u200b"
+                description = "Top ranking highest Balls"
+                embed_color = discord.Color.purple()
+
+                pages = ListPages([f"Balls{i} has been added" for i in range(1, 100)])
+            
+            if (choices.value == "wl_ratio"):
+                title = "W/L Ratio Leaderboard \t\t\t\t\t\t\t\t\t\u200b"
+                description = "Current W/L ratio ranking"
+                embed_color = discord.Color.orange()
+
+                pages = wl_ratio_pages(months)
+            
+            if (choices.value == "recent_matches"):
+                title = "Recent matches \t\t\t\t\t\t\t\t\t\u200b"
+                description = "All matches played, newest first"
+                embed_color = discord.Color.green()
+
+                pages = recent_matches_pages()
+
+            if pages is None or not await pages.count():  # If no data is found
+                if (choices.value in ("leaderboard", "wl_ratio")):
+                    await interaction.response.send_message("No matches have been played in the selected period.", ephemeral=True)
+                    return ""
+                else:
+                    await interaction.response.send_message("No data found", ephemeral=True)
+                    return ""
+
+            pagination_view = PaginationView(interaction, title, description, embed_color, ephemeral=private, pages=pages)
+            await pagination_view.send()
+
+        except sqlite3.Error as e:
+            logger.error(f"Database error: {e}")
+        except Exception as e:
+            logger.error(f"Unexpected error: {e}")
+
+    @app_commands.command(name="matches", description="Browse the match history, optionally filtered")
+    @app_commands.describe(
+        player="Only matches of this player",
+        opponent="Only matches against this opponent",
+        date_from="Only matches on or after this day (YYYY-MM-DD)",
+        date_to="Only matches on or before this day (YYYY-MM-DD)",
+        multiplier="Only matches played with this ELO multiplier",
+    )
+    async def matches(self, interaction: discord.Interaction, player: discord.User = None, opponent: discord.User = None,
+                      date_from: str = None, date_to: str = None, multiplier: int = None, private: bool = True):
+        try:
+            for day in (date_from, date_to):
+                if day:
+                    datetime.date.fromisoformat(day)
+        except ValueError:
+            await interaction.response.send_message("Dates have to look like `2024-05-31`.", ephemeral=True)
+            return
+
+        try:
+            pages = match_history_pages(player.id if player else None, opponent.id if opponent else None,
+                                        date_from, date_to, multiplier)
+            total = await pages.count()
+            if not total:
+                await interaction.response.send_message("No matches found with those filters.", ephemeral=True)
+                return
+
+            filters = [f"player {player.mention}" if player else "", f"vs {opponent.mention}" if opponent else "",
+                       f"from {date_from}" if date_from else "", f"until {date_to}" if date_to else "",
+                       f"x{multiplier} multiplier" if multiplier else ""]
+            description = f"{total} match(es), newest first"
+            if any(filters):
+                description += " • " + " ".join(f for f in filters if f)
+
+            pagination_view = PaginationView(interaction, "Match history \t\t\t\t\t\t\t\t\t\u200b", description,
+                                             discord.Color.green(), ephemeral=private, pages=pages)
+            await pagination_view.send()
 
         except sqlite3.Error as e:
             logger.error(f"Database error: {e}")
@@ -1,31 +1,11 @@
-import sqlite3
 import discord
 from discord import app_commands
 import datetime
 from io import BytesIO
 import asyncio
 import settings
+import database
 
-# Create database table for tournament signups
-with sqlite3.connect('elo_data.db') as conn:
-    c = conn.cursor()
-    
-    try:
-        # Create the table if it doesn't exist
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS tournament_signups (
-                signup_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                message_id INTEGER,
-                user_id INTEGER,
-                username TEXT,
-                signup_date TEXT,
-                tournament_name TEXT,
-                is_closed INTEGER DEFAULT 0
-            )
-        ''')
-    except sqlite3.Error as e:
-        print(f"SQLite error: {e}")
-        conn.rollback()
 
 class TournamentSignupView(discord.ui.View):
     def __init__(self, tournament_name, timeout=None):
@@ -57,13 +37,11 @@ class TournamentSignupView(discord.ui.View):
             embed = message.embeds[0]
             
             # Get current signup count
-            with sqlite3.connect('elo_data.db') as conn:
-                c = conn.cursor()
-                c.execute('''
-                    SELECT COUNT(*) FROM tournament_signups 
-                    WHERE message_id = ? AND tournament_name = ?
-                ''', (message.id, self.tournament_name))
-                signup_count = c.fetchone()[0]
+            row = await database.fetchone('''
+                SELECT COUNT(*) FROM tournament_signups 
+                WHERE message_id = ? AND tournament_name = ?
+            ''', (message.id, self.tournament_name))
+            signup_count = row[0]
             
             # Update the embed description to include signup count
             status_line = f"**Status:** 🟢 **OPEN** - **Total Signups: {signup_count}**"
@@ -85,6 +63,40 @@ class TournamentSignupView(discord.ui.View):
         except Exception as e:
             print(f"Error updating signup count: {e}")
 
+    def _add_signup(self, conn, message_id, user_id, username, signup_date):
+        """Inserts the signup unless it already exists; returns the existing row (or None)."""
+        c = conn.cursor()
+        c.execute('''
+            SELECT * FROM tournament_signups 
+            WHERE message_id = ? AND user_id = ? AND tournament_name = ?
+        ''', (message_id, user_id, self.tournament_name))
+        existing_signup = c.fetchone()
+
+        if not existing_signup:
+            # Add signup to database
+            c.execute('''
+                INSERT INTO tournament_signups (message_id, user_id, username, signup_date, tournament_name)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (message_id, user_id, username, signup_date, self.tournament_name))
+        return existing_signup
+
+    def _remove_signup(self, conn, message_id, user_id):
+        """Deletes the signup if it exists; returns the removed row (or None)."""
+        c = conn.cursor()
+        c.execute('''
+            SELECT * FROM tournament_signups 
+            WHERE message_id = ? AND user_id = ? AND tournament_name = ?
+        ''', (message_id, user_id, self.tournament_name))
+        existing_signup = c.fetchone()
+
+        if existing_signup:
+            # Remove signup from database
+            c.execute('''
+                DELETE FROM tournament_signups 
+                WHERE message_id = ? AND user_id = ? AND tournament_name = ?
+            ''', (message_id, user_id, self.tournament_name))
+        return existing_signup
+
     async def handle_signup(self, interaction: discord.Interaction):
         if self.is_closed:
             await interaction.response.send_message(
@@ -98,28 +110,17 @@ class TournamentSignupView(discord.ui.View):
         message_id = interaction.message.id
         signup_date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-        # Check if user is already signed up
-        with sqlite3.connect('elo_data.db') as conn:
-            c = conn.cursor()
-            c.execute('''
-                SELECT * FROM tournament_signups 
-                WHERE message_id = ? AND user_id = ? AND tournament_name = ?
-            ''', (message_id, user_id, self.tournament_name))
-            existing_signup = c.fetchone()
-
-            if existing_signup:
-                await interaction.response.send_message(
-                    f"{interaction.user.mention} You are already signed up for this tournament!", 
-                    ephemeral=True
-                )
-                return
+        # Check if user is already signed up, and add the signup if not
+        existing_signup = await database.run_write(
+            self._add_signup, message_id, user_id, username, signup_date
+        )
 
-            # Add signup to database
-            c.execute('''
-                INSERT INTO tournament_signups (message_id, user_id, username, signup_date, tournament_name)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (message_id, user_id, username, signup_date, self.tournament_name))
-            conn.commit()
+        if existing_signup:
+            await interaction.response.send_message(
+                f"{interaction.user.mention} You are already signed up for this tournament!", 
+                ephemeral=True
+            )
+            return
 
         await interaction.response.send_message(
             f"{interaction.user.mention} successfully signed up for **{self.tournament_name}**! ✅",
@@ -154,28 +155,15 @@ class TournamentSignupView(discord.ui.View):
         user_id = interaction.user.id
         message_id = interaction.message.id
 
-        # Check if user is signed up
-        with sqlite3.connect('elo_data.db') as conn:
-            c = conn.cursor()
-            c.execute('''
-                SELECT * FROM tournament_signups 
-                WHERE message_id = ? AND user_id = ? AND tournament_name = ?
-            ''', (message_id, user_id, self.tournament_name))
-            existing_signup = c.fetchone()
+        # Check if user is signed up, and remove the signup if so
+        existing_signup = await database.run_write(self._remove_signup, message_id, user_id)
 
-            if not existing_signup:
-                await interaction.response.send_message(
-                    f"{interaction.user.mention} You are not signed up for this tournament!", 
-                    ephemeral=True
-                )
-                return
-
-            # Remove signup from database
-            c.execute('''
-                DELETE FROM tournament_signups 
-                WHERE message_id = ? AND user_id = ? AND tournament_name = ?
-            ''', (message_id, user_id, self.tournament_name))
-            conn.commit()
+        if not existing_signup:
+            await interaction.response.send_message(
+                f"{interaction.user.mention} You are not signed up for this tournament!", 
+                ephemeral=True
+            )
+            return
 
         await interaction.response.send_message(
             f"{interaction.user.mention} successfully signed out from **{self.tournament_name}**! ❌",
@@ -194,13 +182,10 @@ class TournamentSignupView(discord.ui.View):
     async def handle_show_players(self, interaction: discord.Interaction):
         message_id = interaction.message.id
         
-        with sqlite3.connect('elo_data.db') as conn:
-            c = conn.cursor()
-            c.execute('''
-                SELECT username, signup_date FROM tournament_signups 
-                WHERE message_id = ? ORDER BY signup_date
-            ''', (message_id,))
-            signups = c.fetchall()
+        signups = await database.fetchall('''
+            SELECT username, signup_date FROM tournament_signups 
+            WHERE message_id = ? ORDER BY signup_date
+        ''', (message_id,))
         
         if not signups:
             await interaction.response.send_message("No players signed up for this tournament.", ephemeral=True)
@@ -254,13 +239,11 @@ async def create_tournament_signup(
         except ValueError:
             await interaction.response.send_message("❌ recover_message_id must be a number.", ephemeral=True)
             return
-        with sqlite3.connect('elo_data.db') as conn:
-            c = conn.cursor()
-            c.execute(
-                'SELECT COUNT(*) FROM tournament_signups WHERE message_id = ? AND tournament_name = ?',
-                (old_message_id_int, tournament_name)
-            )
-            recovered_count = c.fetchone()[0]
+        row = await database.fetchone(
+            'SELECT COUNT(*) FROM tournament_signups WHERE message_id = ? AND tournament_name = ?',
+            (old_message_id_int, tournament_name)
+        )
+        recovered_count = row[0]
 
     embed = discord.Embed(
         title=f"🏆 {tournament_name} - Sign Up",
@@ -289,13 +272,10 @@ async def create_tournament_signup(
 
     # Migrate recovered signups onto the new message
     if old_message_id_int is not None and recovered_count > 0:
-        with sqlite3.connect('elo_data.db') as conn:
-            c = conn.cursor()
-            c.execute(
-                'UPDATE tournament_signups SET message_id = ? WHERE message_id = ? AND tournament_name = ?',
-                (message.id, old_message_id_int, tournament_name)
-            )
-            conn.commit()
+        await database.execute(
+            'UPDATE tournament_signups SET message_id = ? WHERE message_id = ? AND tournament_name = ?',
+            (message.id, old_message_id_int, tournament_name)
+        )
 
         await interaction.followup.send(
             f"✅ Recovered {recovered_count} signup(s) from message ID `{old_message_id_int}` onto this new message.",
@@ -322,13 +302,11 @@ async def schedule_signup_close(bot, channel_id, message_id, tournament_name, ho
                 # Update description to show closed
                 if "**Status:**" in embed.description:
                     # Get current signup count
-                    with sqlite3.connect('elo_data.db') as conn:
-                        c = conn.cursor()
-                        c.execute('''
-                            SELECT COUNT(*) FROM tournament_signups 
-                            WHERE message_id = ? AND tournament_name = ?
-                        ''', (message.id, tournament_name))
-                        signup_count = c.fetchone()[0]
+                    row = await database.fetchone('''
+                        SELECT COUNT(*) FROM tournament_signups 
+                        WHERE message_id = ? AND tournament_name = ?
+                    ''', (message.id, tournament_name))
+                    signup_count = row[0]
                     
                     # Replace any existing status line
                     lines = embed.description.split('\n')
@@ -372,13 +350,11 @@ async def close_tournament_signup(interaction: discord.Interaction, message_id:
     embed.color = discord.Color.red()
     
     # Get current signup count
-    with sqlite3.connect('elo_data.db') as conn:
-        c = conn.cursor()
-        c.execute('''
-            SELECT COUNT(*) FROM tournament_signups 
-            WHERE message_id = ?
-        ''', (int(message_id),))
-        signup_count = c.fetchone()[0]
+    row = await database.fetchone('''
+        SELECT COUNT(*) FROM tournament_signups 
+        WHERE message_id = ?
+    ''', (int(message_id),))
+    signup_count = row[0]
     
     # Update description to show closed
     if "**Status:**" in embed.description:
@@ -408,14 +384,11 @@ async def close_tournament_signup(interaction: discord.Interaction, message_id:
     await message.edit(embed=embed, view=view)
     
     # Update database
-    with sqlite3.connect('elo_data.db') as conn:
-        c = conn.cursor()
-        c.execute('''
-            UPDATE tournament_signups 
-            SET is_closed = 1 
-            WHERE message_id = ?
-        ''', (int(message_id),))
-        conn.commit()
+    await database.execute('''
+        UPDATE tournament_signups 
+        SET is_closed = 1 
+        WHERE message_id = ?
+    ''', (int(message_id),))
     
     await interaction.response.send_message(f"✅ Tournament signups for message ID `{message_id}` have been closed!")
 
@@ -443,13 +416,11 @@ async def reopen_tournament_signup(interaction: discord.Interaction, message_id:
     embed.color = discord.Color.green()
     
     # Get current signup count
-    with sqlite3.connect('elo_data.db') as conn:
-        c = conn.cursor()
-        c.execute('''
-            SELECT COUNT(*) FROM tournament_signups 
-            WHERE message_id = ?
-        ''', (int(message_id),))
-        signup_count = c.fetchone()[0]
+    row = await database.fetchone('''
+        SELECT COUNT(*) FROM tournament_signups 
+        WHERE message_id = ?
+    ''', (int(message_id),))
+    signup_count = row[0]
     
     # Update description to show open
     if "**Status:**" in embed.description:
@@ -479,14 +450,11 @@ async def reopen_tournament_signup(interaction: discord.Interaction, message_id:
     await message.edit(embed=embed, view=view)
     
     # Update database
-    with sqlite3.connect('elo_data.db') as conn:
-        c = conn.cursor()
-        c.execute('''
-            UPDATE tournament_signups 
-            SET is_closed = 0 
-            WHERE message_id = ?
-        ''', (int(message_id),))
-        conn.commit()
+    await database.execute('''
+        UPDATE tournament_signups 
+        SET is_closed = 0 
+        WHERE message_id = ?
+    ''', (int(message_id),))
     
     await interaction.response.send_message(f"✅ Tournament signups for message ID `{message_id}` have been reopened!")
 
@@ -495,29 +463,24 @@ async def reopen_tournament_signup(interaction: discord.Interaction, message_id:
 async def list_tournament_signups(interaction: discord.Interaction, message_id: str = None, tournament_name: str = None):
     """List all signups for a specific tournament message or tournament name"""
     
-    with sqlite3.connect('elo_data.db') as conn:
-        c = conn.cursor()
-        
-        if message_id:
-            # Get signups by message ID
-            c.execute('''
-                SELECT username, signup_date FROM tournament_signups 
-                WHERE message_id = ? ORDER BY signup_date
-            ''', (int(message_id),))
-        elif tournament_name:
-            # Get signups by tournament name
-            c.execute('''
-                SELECT username, signup_date FROM tournament_signups 
-                WHERE tournament_name = ? ORDER BY signup_date
-            ''', (tournament_name,))
-        else:
-            # Get all signups
-            c.execute('''
-                SELECT username, tournament_name, signup_date FROM tournament_signups 
-                ORDER BY tournament_name, signup_date
-            ''')
-        
-        signups = c.fetchall()
+    if message_id:
+        # Get signups by message ID
+        signups = await database.fetchall('''
+            SELECT username, signup_date FROM tournament_signups 
+            WHERE message_id = ? ORDER BY signup_date
+        ''', (int(message_id),))
+    elif tournament_name:
+        # Get signups by tournament name
+        signups = await database.fetchall('''
+            SELECT username, signup_date FROM tournament_signups 
+            WHERE tournament_name = ? ORDER BY signup_date
+        ''', (tournament_name,))
+    else:
+        # Get all signups
+        signups = await database.fetchall('''
+            SELECT username, tournament_name, signup_date FROM tournament_signups 
+            ORDER BY tournament_name, signup_date
+        ''')
     
     if not signups:
         await interaction.response.send_message("No tournament signups found.", ephemeral=True)
@@ -568,17 +531,14 @@ async def clear_tournament_signups(interaction: discord.Interaction, message_id:
         return
     
     # First, check how many signups will be deleted
-    with sqlite3.connect('elo_data.db') as conn:
-        c = conn.cursor()
-        
-        if message_id:
-            c.execute('SELECT COUNT(*) FROM tournament_signups WHERE message_id = ?', (int(message_id),))
-            action = f"message ID {message_id}"
-        else:
-            c.execute('SELECT COUNT(*) FROM tournament_signups WHERE tournament_name = ?', (tournament_name,))
-            action = f"tournament '{tournament_name}'"
-        
-        signup_count = c.fetchone()[0]
+    if message_id:
+        row = await database.fetchone('SELECT COUNT(*) FROM tournament_signups WHERE message_id = ?', (int(message_id),))
+        action = f"message ID {message_id}"
+    else:
+        row = await database.fetchone('SELECT COUNT(*) FROM tournament_signups WHERE tournament_name = ?', (tournament_name,))
+        action = f"tournament '{tournament_name}'"
+    
+    signup_count = row[0]
     
     if signup_count == 0:
         await interaction.response.send_message(
@@ -622,7 +582,7 @@ async def clear_tournament_signups(interaction: discord.Interaction, message_id:
 
     # If confirmed: delete the signups, and grab who was signed up first so their
     # Tournament Contender role can be removed below
-    with sqlite3.connect('elo_data.db') as conn:
+    def _clear_signups(conn):
         c = conn.cursor()
 
         if message_id:
@@ -636,8 +596,9 @@ async def clear_tournament_signups(interaction: discord.Interaction, message_id:
         else:
             c.execute('DELETE FROM tournament_signups WHERE tournament_name = ?', (tournament_name,))
 
-        deleted_count = c.rowcount
-        conn.commit()
+        return signed_up_user_ids, c.rowcount
+
+    signed_up_user_ids, deleted_count = await database.run_write(_clear_signups)
 
     # Remove the Tournament Contender role from everyone who was signed up
     roles_removed = 0
@@ -660,13 +621,10 @@ async def clear_tournament_signups(interaction: discord.Interaction, message_id:
 async def export_tournament_signups(interaction: discord.Interaction, tournament_name: str):
     """Export signups to a text file"""
     
-    with sqlite3.connect('elo_data.db') as conn:
-        c = conn.cursor()
-        c.execute('''
-            SELECT username, signup_date FROM tournament_signups 
-            WHERE tournament_name = ? ORDER BY signup_date
-        ''', (tournament_name,))
-        signups = c.fetchall()
+    signups = await database.fetchall('''
+        SELECT username, signup_date FROM tournament_signups 
+        WHERE tournament_name = ? ORDER BY signup_date
+    ''', (tournament_name,))
     
     if not signups:
         await interaction.response.send_message(f"No signups found for tournament '{tournament_name}'.", ephemeral=True)
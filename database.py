@@ -0,0 +1,263 @@
+"""Shared SQLite access for the bot.
+
+All cogs go through this module instead of calling sqlite3.connect() themselves.
+It owns one long-lived writer connection (guarded by a lock, so writes are
+serialised) and a small pool of reader connections, all opened against
+settings.DB_PATH with settings.DB_PRAGMAS applied. The database runs in WAL
+mode, so readers never wait for a writer to finish.
+
+Coroutines must not touch SQLite directly - a slow query or a lock wait would
+freeze the event loop (and with it the gateway heartbeat). They await the async
+API instead, which runs the work on small dedicated thread pools:
+
+    row = await database.fetchone("SELECT elo FROM elo_data WHERE player_id = ?", (pid,))
+    await database.execute("UPDATE elo_data SET inactive = 1 WHERE player_id = ?", (pid,))
+
+    def _transfer(conn, a, b):            # several statements, one transaction
+        ...
+    await database.run_write(_transfer, a, b)
+
+Async writes don't each grab the writer themselves: run_write() puts the job on
+one asyncio queue, and a single writer task drains it. Jobs that pile up while
+a batch is committing go into the next batch together - each in its own
+SAVEPOINT, so one failing job only rolls back itself - and the whole batch is
+committed once (group commit). A burst of /report calls therefore costs a few
+fsyncs instead of one per match.
+
+The schema is created and upgraded by migrations.py the first time the database
+is opened, so cogs can assume every table and index exists.
+
+The synchronous read()/write() context managers are what those helpers use
+under the hood; call them directly only from code that is already off the loop.
+"""
+import asyncio
+import contextlib
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import migrations
+import settings
+
+logger = settings.logging.getLogger("bot")
+
+
+class Database:
+    """One writer connection plus a pool of `readers` reader connections to `path`."""
+
+    def __init__(self, path, pragmas=None, readers=4, write_batch=64):
+        self.path = path
+        self.pragmas = dict(pragmas or {})
+        self.write_batch = max(1, write_batch)
+        # RLock + depth counter: a write() block opened inside another one joins the
+        # outer transaction instead of deadlocking or committing half of it early.
+        self._write_lock = threading.RLock()
+        self._write_depth = 0
+        self._writer = self._connect()
+        self._readers = queue.Queue()
+        self._connections = [self._writer]
+        for _ in range(max(1, readers)):
+            conn = self._connect()
+            self._readers.put(conn)
+            self._connections.append(conn)
+        # Reads (and run()) get one thread per reader connection; write batches get a
+        # thread of their own, so a long write never waits behind reads for a thread
+        # to run on, and reads queued up behind each other never hold up a commit.
+        self._executor = ThreadPoolExecutor(max_workers=max(1, readers), thread_name_prefix="db-read")
+        self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-write")
+        # Created on the first run_write(), on whatever loop is running then
+        self._write_queue = None
+        self._writer_task = None
+        self.writes = 0   # jobs committed through the queue
+        self.commits = 0  # transactions those took
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    @contextlib.contextmanager
+    def read(self):
+        """Borrow a reader connection from the pool for the duration of the block."""
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    @contextlib.contextmanager
+    def write(self):
+        """Hold the writer connection for one transaction; commit on success, roll back on error."""
+        with self._write_lock:
+            self._write_depth += 1
+            try:
+                yield self._writer
+                if self._write_depth == 1:
+                    self._writer.commit()
+            except BaseException:
+                if self._write_depth == 1:
+                    self._writer.rollback()
+                raise
+            finally:
+                self._write_depth -= 1
+
+    def _call_read(self, fn, args):
+        with self.read() as conn:
+            return fn(conn, *args)
+
+    async def run_read(self, fn, *args):
+        """Runs fn(conn, *args) on a reader connection in the DB read thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call_read, fn, args)
+
+    async def run_write(self, fn, *args):
+        """Queues fn(conn, *args) for the writer task and waits for it to be committed.
+        fn runs atomically (inside its own SAVEPOINT) but may share a COMMIT with other jobs."""
+        loop = asyncio.get_running_loop()
+        if self._writer_task is None or self._writer_task.done() or self._writer_task.get_loop() is not loop:
+            self._write_queue = asyncio.Queue()
+            self._writer_task = loop.create_task(self._drain_writes(self._write_queue), name="db-writer")
+        future = loop.create_future()
+        self._write_queue.put_nowait((fn, args, future))
+        return await future
+
+    async def _drain_writes(self, write_queue):
+        """The single consumer of the write queue: takes whatever has queued up (up to
+        write_batch jobs) and applies it as one transaction."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await write_queue.get()]
+            while len(batch) < self.write_batch and not write_queue.empty():
+                batch.append(write_queue.get_nowait())
+            batch = [job for job in batch if not job[2].cancelled()]
+            if not batch:
+                continue
+
+            try:
+                outcomes = await loop.run_in_executor(self._write_executor, self._run_batch, [(fn, args) for fn, args, _ in batch])
+            except Exception as e:
+                # The COMMIT itself failed, so none of the batch was written
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, _, future), (ok, value) in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def _run_batch(self, jobs):
+        """Runs each (fn, args) in its own SAVEPOINT inside one transaction.
+        Returns [(True, result) or (False, exception), ...] in job order."""
+        outcomes = []
+        with self.write() as conn:
+            if not conn.in_transaction:
+                # Without an outer transaction, releasing the first savepoint would commit it
+                conn.execute("BEGIN")
+            for fn, args in jobs:
+                conn.execute("SAVEPOINT job")
+                try:
+                    result = fn(conn, *args)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    conn.execute("RELEASE job")
+                    outcomes.append((False, e))
+                else:
+                    conn.execute("RELEASE job")
+                    outcomes.append((True, result))
+        self.writes += len(jobs)
+        self.commits += 1
+        return outcomes
+
+    async def run(self, fn, *args):
+        """Runs a blocking callable that manages its own connections (e.g. backup) in the DB read thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def backup(self, dest_path):
+        """Copy the live database to `dest_path` using SQLite's online backup API."""
+        dest = sqlite3.connect(dest_path)
+        try:
+            with self.read() as conn:
+                conn.backup(dest)
+        finally:
+            dest.close()
+
+    def close(self):
+        task = self._writer_task
+        if task is not None and not task.get_loop().is_closed():
+            task.get_loop().call_soon_threadsafe(task.cancel)
+        self._executor.shutdown(wait=True)
+        self._write_executor.shutdown(wait=True)
+        for conn in self._connections:
+            conn.close()
+        self._connections = []
+
+
+_db = None
+_db_lock = threading.Lock()
+
+
+def get_db():
+    """Returns the process-wide Database, opening (and migrating) it on first use."""
+    global _db
+    with _db_lock:
+        if _db is None:
+            db = Database(settings.DB_PATH, settings.DB_PRAGMAS, settings.DB_READERS, settings.DB_WRITE_BATCH)
+            with db.write() as conn:
+                migrations.migrate(conn, logger)
+            _db = db
+            logger.info(f"Opened database {settings.DB_PATH} ({settings.DB_READERS} readers, "
+                        f"schema version {migrations.get_version(db._writer)})")
+        return _db
+
+
+def read():
+    return get_db().read()
+
+
+def write():
+    return get_db().write()
+
+
+def backup(dest_path):
+    get_db().backup(dest_path)
+
+
+async def run_read(fn, *args):
+    return await get_db().run_read(fn, *args)
+
+
+async def run_write(fn, *args):
+    return await get_db().run_write(fn, *args)
+
+
+async def run(fn, *args):
+    return await get_db().run(fn, *args)
+
+
+async def fetchone(sql, params=()):
+    return await run_read(lambda conn: conn.execute(sql, params).fetchone())
+
+
+async def fetchall(sql, params=()):
+    return await run_read(lambda conn: conn.execute(sql, params).fetchall())
+
+
+async def execute(sql, params=()):
+    """Runs one write statement in its own transaction; returns the cursor (for rowcount/lastrowid)."""
+    return await run_write(lambda conn: conn.execute(sql, params))
+
+
+def close():
+    global _db
+    with _db_lock:
+        if _db is not None:
+            _db.close()
+            _db = None
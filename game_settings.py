@@ -0,0 +1,122 @@
+"""Typed, cached view of the `settings` table.
+
+The rows in `settings` (ELO multiplier switch, K-factor tiers, starting ELO)
+only change through the bot's own commands, yet used to be SELECTed on every
+use. The store loads the whole table once and hands out immutable GameSettings
+snapshots; writing a setting through set() invalidates it, and the next
+current() call reloads.
+
+Callers take one snapshot per unit of work and pass it down, so a single match
+- or a whole Challonge import - is computed with one consistent set of values
+even if someone runs /toggle_elo_multiplier halfway through.
+
+Unknown or unparsable rows fall back to the defaults below (and are logged).
+Lives outside cogs/ for the same reason as ratings.py.
+"""
+from typing import NamedTuple
+
+import database
+import settings
+
+logger = settings.logging.getLogger("bot")
+
+
+class GameSettings(NamedTuple):
+    """One snapshot of every tunable. The defaults are what the bot used before they were configurable."""
+    elo_multiplier: int = 1  # applied to the winner's gain; 2 while the multiplier is switched on
+    # (minimum winner ELO, K) pairs, ascending: the winner's K is taken from the highest tier reached
+    k_factor_tiers: tuple = ((0, 40), (1800, 20), (2400, 10))
+    starting_elo: int = 1200
+
+    def k_factor(self, winner_elo):
+        k = self.k_factor_tiers[0][1]
+        for threshold, tier_k in self.k_factor_tiers:
+            if winner_elo >= threshold:
+                k = tier_k
+        return k
+
+
+DEFAULTS = GameSettings()
+
+
+def _parse_multiplier(value):
+    # Stored as 'on'/'off' since before this module existed; anything else is an explicit number
+    if value in ("on", "off"):
+        return 2 if value == "on" else 1
+    return int(value)
+
+
+def _format_multiplier(multiplier):
+    return "on" if multiplier == 2 else "off" if multiplier == 1 else str(multiplier)
+
+
+def _parse_tiers(value):
+    """'0:40,1800:20,2400:10' -> ((0, 40), (1800, 20), (2400, 10))"""
+    tiers = tuple(sorted(tuple(int(part) for part in tier.split(":")) for tier in value.split(",")))
+    if not tiers or any(len(tier) != 2 for tier in tiers):
+        raise ValueError(f"expected 'elo:k,elo:k,...', got {value!r}")
+    return tiers
+
+
+def _format_tiers(tiers):
+    return ",".join(f"{threshold}:{k}" for threshold, k in tiers)
+
+
+# setting_name -> (parse stored text, format value for storage)
+FIELDS = {
+    "elo_multiplier": (_parse_multiplier, _format_multiplier),
+    "k_factor_tiers": (_parse_tiers, _format_tiers),
+    "starting_elo": (int, str),
+}
+
+
+class SettingsStore:
+    """Caches the settings table as a GameSettings snapshot until the next write."""
+
+    def __init__(self):
+        self._snapshot = None
+
+    def load(self, conn):
+        """(Re)reads the settings table. Takes a connection, so run it via database.run_read()."""
+        c = conn.cursor()
+        c.execute('SELECT setting_name, setting_value FROM settings')
+        values = {}
+        for name, raw in c.fetchall():
+            if name not in FIELDS:
+                continue
+            parse, _ = FIELDS[name]
+            try:
+                values[name] = parse(raw)
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Ignoring invalid setting {name}={raw!r} ({e}); using the default")
+        self._snapshot = DEFAULTS._replace(**values)
+        return self._snapshot
+
+    def snapshot(self, conn=None):
+        """The cached snapshot; pass `conn` (from code already off the event loop) to load it if needed."""
+        if self._snapshot is None and conn is not None:
+            self.load(conn)
+        return self._snapshot or DEFAULTS
+
+    async def current(self):
+        """The current snapshot, loading it from the database if it was invalidated."""
+        if self._snapshot is None:
+            await database.run_read(self.load)
+        return self._snapshot
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def write(self, conn, name, value):
+        """Stores one setting inside the caller's transaction. Call invalidate() once it has committed."""
+        parse, format_value = FIELDS[name]
+        stored = format_value(value)
+        parse(stored)  # refuse to store something load() would reject
+        conn.execute('INSERT OR REPLACE INTO settings (setting_name, setting_value) VALUES (?, ?)', (name, stored))
+
+    async def set(self, name, value):
+        await database.run_write(self.write, name, value)
+        self.invalidate()
+
+
+store = SettingsStore()
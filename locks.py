@@ -0,0 +1,68 @@
+"""Per-player asyncio locks.
+
+Every database write is already atomic on its own (see database.py), but some
+flows read a player's rating, await something, and then write based on what
+they read - the Challonge import, /register, the report flows that go on to
+grant roles from the result, and /remove_game and /edit_result, which re-rate
+everyone who played after the game. Two of those touching the same player at the
+same time could lose an update or act on a stale rating.
+
+`async with locks.players.hold(winner_id, loser_id):` serialises flows that
+share a player, while flows for disjoint players don't wait on each other at
+all. Locks are always taken in ascending player_id order, so two holders can
+never each wait on a lock the other has (no deadlocks), and a player's lock is
+dropped again once nobody holds or waits for it.
+
+Lives outside cogs/ for the same reason as ratings.py: reloading a cog must
+not hand it a second, separate set of locks.
+"""
+import asyncio
+import contextlib
+
+
+class PlayerLocks:
+    """player_id -> asyncio.Lock, created on demand and discarded when idle."""
+
+    def __init__(self):
+        self._locks = {}
+        self._users = {}  # player_id -> number of holders + waiters
+
+    def _checkout(self, player_id):
+        self._users[player_id] = self._users.get(player_id, 0) + 1
+        return self._locks.setdefault(player_id, asyncio.Lock())
+
+    def _checkin(self, player_id):
+        self._users[player_id] -= 1
+        if not self._users[player_id]:
+            del self._users[player_id]
+            del self._locks[player_id]
+
+    @contextlib.asynccontextmanager
+    async def hold(self, *player_ids):
+        """Holds the locks of all given players (duplicates and None are ignored) for the block."""
+        ordered = sorted({pid for pid in player_ids if pid is not None})
+        acquired = []
+        try:
+            for pid in ordered:
+                lock = self._checkout(pid)
+                try:
+                    await lock.acquire()
+                except BaseException:
+                    self._checkin(pid)
+                    raise
+                acquired.append(pid)
+            yield
+        finally:
+            for pid in reversed(acquired):
+                self._locks[pid].release()
+                self._checkin(pid)
+
+    def locked(self, player_id):
+        lock = self._locks.get(player_id)
+        return lock is not None and lock.locked()
+
+    def __len__(self):
+        return len(self._locks)
+
+
+players = PlayerLocks()
@@ -41,6 +41,12 @@ def run():
             if cmd_file.name != "__init__.py":
                 await bot.load_extension(f"cmds.{cmd_file.name[:-3]}")
 
+        if logger.isEnabledFor(settings.logging.DEBUG):
+            # Imported only now so it checks the cog modules the extensions just loaded
+            import query_plans
+            for description, scans in query_plans.check_query_plans().items():
+                logger.error(f"Query plan check failed - {description}: {'; '.join(scans)}")
+
         bot.tree.copy_global_to(guild=settings.GUILDS_ID)
         await bot.tree.sync(guild=settings.GUILDS_ID)
 
@@ -0,0 +1,194 @@
+"""Versioned schema migrations for the bot's database.
+
+The schema version lives in SQLite's `PRAGMA user_version`. database.get_db()
+calls migrate() once when it opens the database, which applies every entry of
+MIGRATIONS newer than that version, each in its own transaction, and bumps the
+version after each one. A database created before this module existed is at
+version 0; migration 1 is written with IF NOT EXISTS so it adopts those tables
+as they are.
+
+To change the schema, append a new (version, description, sql) entry - never
+edit one that has already shipped, servers that ran it won't run it again.
+
+The indexes are chosen to cover the hot queries (leaderboard filters, W/L
+aggregates, rank history lookups); query_plans.py checks that those queries
+don't fall back to a full table scan - run it after touching the schema.
+"""
+
+MIGRATIONS = [
+    (1, "base tables", """
+        CREATE TABLE IF NOT EXISTS elo_data (
+            player_id INTEGER PRIMARY KEY,
+            elo INTEGER,
+            highest_elo INTEGER,
+            inactive INTEGER DEFAULT 0
+        );
+
+        CREATE TABLE IF NOT EXISTS match_data (
+            game_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT,
+            winner_id INTEGER,
+            loser_id INTEGER,
+            elo_change INTEGER,
+            elo_winner INTEGER,
+            elo_loser INTEGER,
+            multiplier INTEGER DEFAULT 1
+        );
+
+        CREATE TABLE IF NOT EXISTS historical_rankings (
+            ranking_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            player_id INTEGER,
+            date TEXT,
+            rank INTEGER
+        );
+
+        CREATE TABLE IF NOT EXISTS settings (
+            setting_name TEXT PRIMARY KEY,
+            setting_value TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS tournament_signups (
+            signup_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            message_id INTEGER,
+            user_id INTEGER,
+            username TEXT,
+            signup_date TEXT,
+            tournament_name TEXT,
+            is_closed INTEGER DEFAULT 0
+        );
+
+        CREATE TABLE IF NOT EXISTS challonge_processed_matches (
+            match_id INTEGER PRIMARY KEY,
+            tournament_id TEXT,
+            processed_at TEXT
+        );
+    """),
+    (2, "covering indexes for match_data, historical_rankings and tournament_signups", """
+        -- Date-window filters (leaderboard months filter, movement window)
+        CREATE INDEX IF NOT EXISTS idx_match_data_date
+            ON match_data (date, winner_id, loser_id, elo_winner, elo_loser);
+        -- Per-player lookups and W/L GROUP BYs; game_id rides along as the rowid
+        CREATE INDEX IF NOT EXISTS idx_match_data_winner
+            ON match_data (winner_id, date, elo_winner);
+        CREATE INDEX IF NOT EXISTS idx_match_data_loser
+            ON match_data (loser_id, date, elo_loser);
+
+        -- Rank of a player at a point in time / their latest rank
+        CREATE INDEX IF NOT EXISTS idx_historical_rankings_player_date
+            ON historical_rankings (player_id, date, rank);
+
+        CREATE INDEX IF NOT EXISTS idx_tournament_signups_message
+            ON tournament_signups (message_id, user_id);
+        CREATE INDEX IF NOT EXISTS idx_tournament_signups_name
+            ON tournament_signups (tournament_name);
+    """),
+    (3, "player_stats", """
+        -- Per-player aggregates of match_data, kept up to date by every match write
+        -- (see elo_system._apply_match_stats). current_streak > 0 is a win streak,
+        -- < 0 a losing streak; best_streak is the longest win streak.
+        -- Filled from existing history by /rebuild_player_stats (run automatically
+        -- on startup while the table is still empty).
+        CREATE TABLE IF NOT EXISTS player_stats (
+            player_id INTEGER PRIMARY KEY,
+            wins INTEGER NOT NULL DEFAULT 0,
+            losses INTEGER NOT NULL DEFAULT 0,
+            games_played INTEGER NOT NULL DEFAULT 0,
+            current_streak INTEGER NOT NULL DEFAULT 0,
+            best_streak INTEGER NOT NULL DEFAULT 0,
+            last_match_date TEXT
+        );
+    """),
+    (4, "rank_snapshots", """
+        -- One row per player per tracked leaderboard filter per day: the ranking as the
+        -- leaderboard showed it then (see leaderboard._take_rank_snapshots). Movement
+        -- arrows compare against the snapshot from LEADERBOARD_MOVEMENT_DAYS ago.
+        CREATE TABLE IF NOT EXISTS rank_snapshots (
+            filter_mode TEXT NOT NULL,
+            filter_data INTEGER NOT NULL,
+            snapshot_date TEXT NOT NULL,  -- UTC day, 'YYYY-MM-DD'
+            player_id INTEGER NOT NULL,
+            rank INTEGER NOT NULL,
+            PRIMARY KEY (filter_mode, filter_data, snapshot_date, player_id)
+        ) WITHOUT ROWID;
+        -- Pruning old days
+        CREATE INDEX IF NOT EXISTS idx_rank_snapshots_date ON rank_snapshots (snapshot_date);
+    """),
+    (5, "live_leaderboards", """
+        -- Leaderboard messages kept up to date by the leaderboard cog, at most one per
+        -- channel. content_hash is the hash of the last rendered embed, so an edit
+        -- that wouldn't change anything is skipped (also across restarts).
+        CREATE TABLE IF NOT EXISTS live_leaderboards (
+            channel_id INTEGER PRIMARY KEY,
+            message_id INTEGER NOT NULL,
+            filter_mode TEXT NOT NULL,
+            filter_data INTEGER NOT NULL,
+            content_hash TEXT
+        );
+    """),
+    (6, "elo_data ranking indexes", """
+        -- Keyset pagination of the ranked lists (/paginate): each page seeks to
+        -- (elo, player_id) < (last row of the previous page) instead of using OFFSET
+        CREATE INDEX IF NOT EXISTS idx_elo_data_active_elo
+            ON elo_data (inactive, elo, player_id);
+        CREATE INDEX IF NOT EXISTS idx_elo_data_active_highest_elo
+            ON elo_data (inactive, highest_elo, player_id);
+    """),
+    (7, "match_data per-player indexes in game order", """
+        -- /matches pages through one player's games newest first: a seek to
+        -- game_id < (last one shown) on each side, merged, then LIMIT
+        CREATE INDEX IF NOT EXISTS idx_match_data_winner_game
+            ON match_data (winner_id, game_id);
+        CREATE INDEX IF NOT EXISTS idx_match_data_loser_game
+            ON match_data (loser_id, game_id);
+    """),
+    (8, "player_stats W/L ratio index", """
+        -- The W/L ranking is ordered by this expression, so keyset pages can walk the
+        -- index instead of computing and sorting every player's ratio. The expression
+        -- must stay identical to the one in paginator.wl_ratio_pages.
+        CREATE INDEX IF NOT EXISTS idx_player_stats_wl_ratio
+            ON player_stats ((CASE WHEN losses = 0 THEN wins ELSE CAST(wins AS FLOAT) / losses END), wins, player_id);
+    """),
+    (9, "compact historical_rankings to rank changes only", """
+        -- Databases written before historical_rankings was delta-encoded hold every
+        -- player's rank after every match. A player's rank at any moment is now their
+        -- latest row at or before it, so a row repeating the rank of the player's
+        -- previous one adds nothing get_rank_at / get_rankings_at could use; drop them.
+        -- A no-op on databases that were delta-encoded from the start. SQLite reuses the
+        -- freed pages; run VACUUM by hand to give them back to the filesystem.
+        DELETE FROM historical_rankings
+        WHERE ranking_id IN (
+            SELECT ranking_id FROM (
+                SELECT ranking_id, rank,
+                       LAG(rank) OVER (PARTITION BY player_id ORDER BY date, ranking_id) AS prev_rank
+                FROM historical_rankings
+            )
+            WHERE rank = prev_rank
+        );
+    """),
+    (10, "historical_rankings latest rank per player index", """
+        -- Each match compares the new ranking with every player's latest row: one
+        -- seek to the end of that player's entries instead of grouping the whole table
+        CREATE INDEX IF NOT EXISTS idx_historical_rankings_player_latest
+            ON historical_rankings (player_id, ranking_id, rank);
+    """),
+]
+
+
+def get_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, logger=None):
+    """Brings the database up to the latest version; returns the versions applied."""
+    applied = []
+    current = get_version(conn)
+    for version, description, sql in MIGRATIONS:
+        if version <= current:
+            continue
+        # executescript() commits any pending transaction first, so wrap it ourselves
+        # to get all-or-nothing per migration (user_version is transactional too).
+        conn.executescript(f"BEGIN;\n{sql}\nPRAGMA user_version = {version};\nCOMMIT;")
+        applied.append(version)
+        if logger:
+            logger.info(f"Applied database migration {version}: {description}")
+    return applied
@@ -0,0 +1,128 @@
+"""EXPLAIN QUERY PLAN checks for the statements that read the growing tables.
+
+Each check runs the bot's own code - the leaderboard and movement queries, the
+/paginate and /matches page seeks, the rating history lookups - against a fresh
+in-memory database at the latest schema version, records every statement it
+executed (sqlite3's trace callback hands them over with their parameters filled
+in) and looks at how SQLite would answer each one. The checked SQL is therefore
+always the SQL the bot runs; there is no copy of it to keep in sync.
+
+Run
+
+    python query_plans.py
+
+after touching the schema or those queries (needs the bot's requirements). With
+the "bot" logger at DEBUG level the bot also runs the checks on startup and logs
+an error for each one that fails.
+"""
+import datetime
+import sqlite3
+
+import settings
+import migrations
+from cogs import elo_system, leaderboard, paginator
+
+# Only the tables that grow with history count - elo_data has one row per player
+# and scanning it (or a CTE/subquery) is expected.
+GROWING_TABLES = {"match_data", "historical_rankings", "tournament_signups", "challonge_processed_matches",
+                  "rank_snapshots", "player_stats"}
+# Statements that have a query plan (the trace also sees BEGIN, SAVEPOINT, PRAGMA...)
+PLANNED_STATEMENTS = {"SELECT", "WITH", "INSERT", "REPLACE", "UPDATE", "DELETE"}
+
+
+def full_scans(conn, sql, params=(), whole_table=False):
+    """The EXPLAIN QUERY PLAN lines for `sql` that read a whole growing table (or,
+    unless `whole_table`, a whole index of one) instead of searching it."""
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    scans = []
+    for *_, detail in plan:
+        words = detail.split()
+        if words[0] != "SCAN":
+            continue
+        table = words[2] if words[1] == "TABLE" else words[1]  # older SQLite says "SCAN TABLE x"
+        if table in GROWING_TABLES and not (whole_table and "COVERING INDEX" in detail):
+            scans.append(detail)
+    return scans
+
+
+def traced_statements(conn, run):
+    """Calls run(conn) and returns the statements it executed, parameters inlined."""
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        run(conn)
+    finally:
+        conn.set_trace_callback(None)
+    return [sql for sql in statements if sql.split(None, 1)[0].upper() in PLANNED_STATEMENTS]
+
+
+def page_seeks(conn, pages):
+    """Fetches a KeysetPages' first page and seeks the pages after and before some key."""
+    key = (1,) * len(pages.key_columns)
+    pages._fetch(conn, None, False, pages.page_size)
+    pages._fetch(conn, key, False, pages.page_size)
+    pages._fetch(conn, key, True, pages.page_size)
+
+
+def movement_from_snapshot(conn):
+    day = (datetime.datetime.utcnow() - datetime.timedelta(days=settings.LEADERBOARD_MOVEMENT_DAYS + 1)).strftime('%Y-%m-%d')
+    conn.execute("INSERT INTO rank_snapshots (filter_mode, filter_data, snapshot_date, player_id, rank) VALUES ('months', 0, ?, 1, 1)",
+                 (day,))
+    leaderboard._build_movement_context(conn, "months", 0, [(1, 1200)])
+
+
+# (description, run(conn), whole_table) - every statement run(conn) executes must be
+# answered from an index. Lookups must SEARCH one; whole_table aggregates have to read
+# every row anyway, so for those a SCAN is fine as long as it's over a covering index.
+# Lists that walk match_data in game_id order from the newest game (/paginate recent
+# matches, /matches without a player) scan the table by design and aren't checked.
+QUERY_PLAN_CHECKS = [
+    ("leaderboard of the last months",
+     lambda conn: conn.execute(*leaderboard.leaderboard_query("months", 3, 10)), False),
+    ("leaderboard since a game",
+     lambda conn: conn.execute(*leaderboard.leaderboard_query("gameid", 1, 10)), False),
+    ("leaderboard movement rebuilt from match_data",
+     lambda conn: (leaderboard._build_movement_context(conn, "months", 3, [(1, 1200)]),
+                   leaderboard._build_movement_context(conn, "gameid", 1, [(1, 1200)])), False),
+    ("leaderboard movement from a rank snapshot", movement_from_snapshot, False),
+    ("daily rank snapshot and pruning",
+     lambda conn: leaderboard._take_rank_snapshots(conn, datetime.date.today().isoformat(), [("months", 3)]), False),
+    ("/paginate leaderboard pages",
+     lambda conn: (page_seeks(conn, paginator.leaderboard_pages()), page_seeks(conn, paginator.leaderboard_pages(3))), False),
+    ("/paginate highest ELO pages", lambda conn: page_seeks(conn, paginator.highest_elo_pages()), False),
+    ("/paginate W/L ratio pages",
+     lambda conn: (page_seeks(conn, paginator.wl_ratio_pages()), page_seeks(conn, paginator.wl_ratio_pages(3))), False),
+    ("/matches pages of a player",
+     lambda conn: (page_seeks(conn, paginator.match_history_pages(1)),
+                   page_seeks(conn, paginator.match_history_pages(1, 2, "2024-01-01", "2024-12-31", 2))), False),
+    ("rank of a player at a time", lambda conn: elo_system._get_rank_at(conn, 1, "2024-01-01 00:00:00"), False),
+    ("ranking at a time", lambda conn: elo_system._get_rankings_at(conn, "2024-01-01 00:00:00"), True),
+    ("recording the ranking after a match", elo_system._update_historical_rankings, False),
+    ("player_stats of re-rated players", lambda conn: elo_system._refresh_player_stats(conn, [1, 2]), False),
+    ("highest ELO left in a player's matches", lambda conn: elo_system._highest_elo_from_matches(conn, 1), False),
+]
+
+
+def check_query_plans(conn=None):
+    """Returns {description: ["<full-scan plan line> in: <sql>", ...]} for every check that
+    failed, run on `conn` or a fresh in-memory database."""
+    if conn is None:
+        conn = sqlite3.connect(":memory:")
+        migrations.migrate(conn)
+    failures = {}
+    for description, run, whole_table in QUERY_PLAN_CHECKS:
+        scans = [f"{scan} in: {' '.join(sql.split())}"
+                 for sql in traced_statements(conn, run)
+                 for scan in full_scans(conn, sql, whole_table=whole_table)]
+        if scans:
+            failures[description] = scans
+    return failures
+
+
+if __name__ == "__main__":
+    failures = check_query_plans()
+    for description, scans in failures.items():
+        for scan in scans:
+            print(f"FULL SCAN - {description}: {scan}")
+    print(f"{len(QUERY_PLAN_CHECKS) - len(failures)}/{len(QUERY_PLAN_CHECKS)} checks use an index for every statement")
+    raise SystemExit(1 if failures else 0)
@@ -0,0 +1,76 @@
+"""Process-wide, write-through cache of player ratings.
+
+elo_data is small and only changes through the bot's own writes, so the whole
+table is loaded once at startup and every write path updates the cache right
+after its transaction commits. Reading a player's elo / highest_elo / inactive
+flag is then a dict lookup instead of a query.
+
+Lives outside cogs/ on purpose: `>reload elo_system` re-imports that module,
+and other cogs hold references to its functions - keeping the cache here means
+there's only ever one copy of it.
+
+Anything that edits elo_data behind the bot's back (e.g. running one of the
+scripts/*.sql files against the live database) needs a restart, or a call to
+load(), to be picked up.
+"""
+
+_UNCHANGED = object()
+
+
+class RatingCache:
+    """player_id -> (elo, highest_elo, inactive), plus hit/miss counters."""
+
+    def __init__(self):
+        self._players = {}
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, conn):
+        """(Re)loads every row of elo_data. Takes a connection, so run it via database.run_read()."""
+        c = conn.cursor()
+        c.execute('SELECT player_id, elo, highest_elo, inactive FROM elo_data')
+        # Build the new dict first and swap it in, so readers never see a half-loaded cache
+        self._players = {
+            player_id: (elo, highest_elo, inactive or 0)
+            for player_id, elo, highest_elo, inactive in c.fetchall()
+        }
+        self.loaded = True
+
+    def get(self, player_id):
+        """Returns (elo, highest_elo, inactive) for a registered player, None otherwise."""
+        entry = self._players.get(player_id)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def update(self, player_id, elo=_UNCHANGED, highest_elo=_UNCHANGED, inactive=_UNCHANGED):
+        """Write-through: call after the matching elo_data write has committed.
+        A player not yet in the cache is added (as a fresh registration would be)."""
+        old_elo, old_highest, old_inactive = self._players.get(player_id, (None, None, 0))
+        self._players[player_id] = (
+            old_elo if elo is _UNCHANGED else elo,
+            old_highest if highest_elo is _UNCHANGED else highest_elo,
+            old_inactive if inactive is _UNCHANGED else inactive,
+        )
+
+    def set_all_elo(self, elo):
+        """Mirror of `UPDATE elo_data SET elo = ?` for every player."""
+        self._players = {
+            player_id: (elo, highest_elo, inactive)
+            for player_id, (_, highest_elo, inactive) in self._players.items()
+        }
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "players": len(self._players),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+cache = RatingCache()
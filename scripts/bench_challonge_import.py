@@ -0,0 +1,182 @@
+#! /usr/bin/python3
+"""Benchmark for recording a Challonge import (/import_challonge_results).
+
+Builds a scratch database with an existing player base and match history, then
+imports the same tournament (500 matches by default between 128 entrants, a
+quarter of them new players) twice, each time starting from the same database:
+  - the original way: per match, the get_elo / set_elo / score change / ELO
+    update / highest-ELO / match insert / mark-processed calls, each its own
+    round trip and transaction, then one historical_rankings update (the
+    helpers that path used are gone from the bot, so they are rebuilt below),
+  - the current one: cogs/challonge._import_matches as a single write job.
+Checks both leave elo_data, match_data, player_stats, historical_rankings and
+challonge_processed_matches identical, and prints the time each took.
+
+Run from the repository root (needs the bot's requirements installed):
+    python scripts/bench_challonge_import.py [matches] [players] [history]
+"""
+import asyncio
+import datetime
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# Point the bot at a scratch database before settings.py is imported
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="elobot-bench-"), "bench.db")
+os.environ.setdefault("GUILD", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import ratings  # noqa: E402
+from cogs import elo_system  # noqa: E402
+from cogs.challonge import _import_matches  # noqa: E402
+from cogs.elo_system import compute_elo_change  # noqa: E402
+
+TOURNAMENT = "bench"
+TABLES = {
+    "elo_data": "SELECT player_id, elo, highest_elo, inactive FROM elo_data ORDER BY player_id",
+    "match_data": "SELECT game_id, date, winner_id, loser_id, elo_change, elo_winner, elo_loser, multiplier "
+                  "FROM match_data ORDER BY game_id",
+    "player_stats": "SELECT * FROM player_stats ORDER BY player_id",
+    "historical_rankings": "SELECT player_id, rank FROM historical_rankings ORDER BY ranking_id",
+    "challonge_processed_matches": "SELECT match_id, tournament_id FROM challonge_processed_matches ORDER BY match_id",
+}
+
+
+def populate(conn, players, history):
+    random.seed(players)
+    now = datetime.datetime.utcnow()
+    conn.executemany(
+        "INSERT INTO elo_data (player_id, elo, highest_elo, inactive) VALUES (?, ?, ?, 0)",
+        [(pid, elo, elo + random.randint(0, 100)) for pid in range(1, players + 1)
+         for elo in [random.randint(800, 2000)]],
+    )
+    rows = []
+    for _ in range(history):
+        winner_id, loser_id = random.sample(range(1, players + 1), 2)
+        date = now - datetime.timedelta(minutes=random.randint(0, 60 * 24 * 365))
+        rows.append((date.strftime('%Y-%m-%d %H:%M:%S'), winner_id, loser_id, 10, 1200, 1200, 1))
+    rows.sort()
+    conn.executemany(
+        "INSERT INTO match_data (date, winner_id, loser_id, elo_change, elo_winner, elo_loser, multiplier) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    elo_system._rebuild_player_stats(conn)
+    elo_system._update_historical_rankings(conn)
+
+
+def tournament(matches, players):
+    """(challonge_match_id, winner_id, loser_id, date) between 96 existing players and 32 newcomers."""
+    entrants = random.sample(range(1, players + 1), 96) + list(range(players + 1, players + 33))
+    start = datetime.datetime.utcnow()
+    return [
+        (900000 + number, *random.sample(entrants, 2),
+         (start + datetime.timedelta(minutes=number)).strftime('%Y-%m-%d %H:%M:%S'))
+        for number in range(matches)
+    ]
+
+
+def _update_elo(conn, winner, loser, game):
+    _, winner_new_elo, loser_new_elo = compute_elo_change(
+        elo_system._get_elo(conn, winner), elo_system._get_elo(conn, loser), game.elo_multiplier, game)
+    elo_system._set_elo(conn, winner, winner_new_elo)
+    elo_system._set_elo(conn, loser, loser_new_elo)
+    return winner_new_elo, loser_new_elo
+
+
+async def update_elo(winner, loser, game):
+    winner_new_elo, loser_new_elo = await database.run_write(_update_elo, winner, loser, game)
+    ratings.cache.update(winner, elo=winner_new_elo)
+    ratings.cache.update(loser, elo=loser_new_elo)
+
+
+async def set_highest_elo(player_id, highest_elo):
+    await database.execute("UPDATE elo_data SET highest_elo = ? WHERE player_id = ?", (highest_elo, player_id))
+    ratings.cache.update(player_id, highest_elo=highest_elo)
+
+
+async def original(matches, game):
+    """What /import_challonge_results did per match before it was batched."""
+    for match_id, w_disc, l_disc, date_str in matches:
+        if await database.fetchone("SELECT 1 FROM challonge_processed_matches WHERE match_id = ?", (match_id,)):
+            continue
+        if await elo_system.get_elo(w_disc) is None:
+            await elo_system.set_elo(w_disc, game.starting_elo)
+        if await elo_system.get_elo(l_disc) is None:
+            await elo_system.set_elo(l_disc, game.starting_elo)
+        score_change, _, _ = compute_elo_change(await elo_system.get_elo(w_disc), await elo_system.get_elo(l_disc), game=game)
+        await update_elo(w_disc, l_disc, game)
+        elo_winner = await elo_system.get_elo(w_disc)
+        elo_loser = await elo_system.get_elo(l_disc)
+        if await elo_system.get_highest_elo(w_disc) is None:
+            await set_highest_elo(w_disc, elo_winner)
+        if await elo_system.get_highest_elo(l_disc) is None:
+            await set_highest_elo(l_disc, elo_loser)
+        if elo_winner > (await elo_system.get_highest_elo(w_disc) or 0):
+            await set_highest_elo(w_disc, elo_winner)
+        if elo_loser > (await elo_system.get_highest_elo(l_disc) or 0):
+            await set_highest_elo(l_disc, elo_loser)
+        await database.run_write(elo_system._insert_match, date_str, w_disc, l_disc, score_change,
+                                 elo_winner, elo_loser, game.elo_multiplier)
+        await database.execute(
+            "INSERT OR IGNORE INTO challonge_processed_matches (match_id, tournament_id, processed_at) VALUES (?, ?, ?)",
+            (match_id, TOURNAMENT, datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
+        )
+    await database.run_write(elo_system._update_historical_rankings)
+
+
+async def batched(matches, game):
+    results = await database.run_write(_import_matches, TOURNAMENT, matches, game)
+    elo_system.cache_match_results([result for _, result in results])
+
+
+def snapshot(conn):
+    return {table: conn.execute(sql).fetchall() for table, sql in TABLES.items()}
+
+
+async def run(label, fn, matches, game, pristine):
+    database.close()
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(database.settings.DB_PATH + suffix):
+            os.remove(database.settings.DB_PATH + suffix)
+    shutil.copy(pristine, database.settings.DB_PATH)
+    await database.run_read(ratings.cache.load)
+    started = time.perf_counter()
+    await fn(matches, game)
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<10} {elapsed * 1000:8.1f} ms")
+    return await database.run_read(snapshot)
+
+
+async def main(match_count, players, history):
+    with database.write() as conn:
+        populate(conn, players, history)
+    pristine = database.settings.DB_PATH + ".pristine"
+    database.backup(pristine)
+    game = await elo_system.current_settings()
+    matches = tournament(match_count, players)
+    print(f"Importing {match_count} matches into {players} players / {history} matches of history")
+
+    before = await run("original", original, matches, game, pristine)
+    after = await run("batched", batched, matches, game, pristine)
+    for table in TABLES:
+        assert before[table] == after[table], f"{table} differs between the two imports"
+    print("  Both imports left identical tables.")
+
+    # Importing again must skip every match
+    started = time.perf_counter()
+    results = await database.run_write(_import_matches, TOURNAMENT, matches, game)
+    print(f"  re-import  {(time.perf_counter() - started) * 1000:8.1f} ms  ({len(results)} matches recorded)")
+    assert not results
+    database.close()
+
+
+if __name__ == "__main__":
+    match_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    players = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    history = int(sys.argv[3]) if len(sys.argv) > 3 else 100_000
+    asyncio.run(main(match_count, players, history))
@@ -0,0 +1,98 @@
+#! /usr/bin/python3
+"""Benchmark for building the leaderboard (LeaderboardView.get_leaderboard_data).
+
+Builds a scratch database with N players and a few matches per player, about a
+quarter of them inside the five-day movement window, then times the 10-row and
+1000-row leaderboards under each filter mode - computed from scratch, and served
+from the leaderboard cache.
+
+Run from the repository root (needs the bot's requirements installed):
+    python scripts/bench_leaderboard.py [players ...]      # default: 5000 50000
+"""
+import asyncio
+import datetime
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import types
+
+# Point the bot at a scratch database before settings.py is imported
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="elobot-bench-"), "bench.db")
+os.environ.setdefault("GUILD", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import standings  # noqa: E402
+from cogs import elo_system  # noqa: E402
+from cogs.leaderboard import LeaderboardView  # noqa: E402
+
+MATCHES_PER_PLAYER = 4
+RUNS = 3
+
+
+def populate(conn, players):
+    random.seed(players)
+    now = datetime.datetime.utcnow()
+    conn.execute("DELETE FROM elo_data")
+    conn.execute("DELETE FROM match_data")
+    conn.executemany(
+        "INSERT INTO elo_data (player_id, elo, highest_elo, inactive) VALUES (?, ?, ?, ?)",
+        [(pid, random.randint(800, 2000), 2000, int(random.random() < 0.1)) for pid in range(1, players + 1)],
+    )
+    matches = []
+    for _ in range(players * MATCHES_PER_PLAYER):
+        winner_id, loser_id = random.sample(range(1, players + 1), 2)
+        date = now - datetime.timedelta(minutes=random.randint(0, 60 * 24 * 20))
+        matches.append((date.strftime('%Y-%m-%d %H:%M:%S'), winner_id, loser_id, 10,
+                        random.randint(800, 2000), random.randint(800, 2000), 1))
+    matches.sort()
+    conn.executemany(
+        "INSERT INTO match_data (date, winner_id, loser_id, elo_change, elo_winner, elo_loser, multiplier) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        matches,
+    )
+    elo_system._rebuild_player_stats(conn)
+    return len(matches)
+
+
+async def time_leaderboard(filter_mode, filter_data, limit):
+    view = LeaderboardView(types.SimpleNamespace(client=None), filter_mode=filter_mode, filter_data=filter_data)
+    best = None
+    for _ in range(RUNS):
+        standings.leaderboards.invalidate()
+        started = time.perf_counter()
+        rows = await view.get_leaderboard_data(None, limit=limit)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    started = time.perf_counter()
+    await view.get_leaderboard_data(None, limit=limit)
+    cached = time.perf_counter() - started
+    return best, cached, len(rows or [])
+
+
+async def main(sizes):
+    with database.write() as conn:
+        limit = conn.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER) if hasattr(conn, "getlimit") else None
+    if limit:
+        print(f"SQLite bound-variable limit here: {limit}")
+
+    for players in sizes:
+        with database.write() as conn:
+            matches = populate(conn, players)
+        print(f"\n{players} players, {matches} matches")
+        first_game = matches - matches // 4
+        for filter_mode, filter_data in (("months", 0), ("months", 3), ("gameid", first_game)):
+            for limit in (10, 1000):
+                best, cached, shown = await time_leaderboard(filter_mode, filter_data, limit)
+                print(f"  {filter_mode}={filter_data:<7} limit={limit:<5} {best * 1000:8.1f} ms, "
+                      f"cached {cached * 1000:6.2f} ms  ({shown} lines)")
+
+    database.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main([int(arg) for arg in sys.argv[1:]] or [5000, 50000]))
@@ -0,0 +1,136 @@
+#! /usr/bin/python3
+"""Benchmark for the W/L ratio ranking (/paginate -> W/L ratio).
+
+Builds a scratch database with a synthetic match history (200k matches by
+default), then times:
+  - the original query: wins and losses grouped out of match_data, joined both
+    ways and sorted, with every row formatted up front,
+  - the current one: player_stats through KeysetPages - the COUNT, the first
+    page, a page deep into the list, and the same with the months filter,
+  - /rebuild_player_stats, the full rebuild path for player_stats.
+
+Run from the repository root (needs the bot's requirements installed):
+    python scripts/bench_wl_ratio.py [matches] [players]
+"""
+import asyncio
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Point the bot at a scratch database before settings.py is imported
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="elobot-bench-"), "bench.db")
+os.environ.setdefault("GUILD", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+from cogs import elo_system  # noqa: E402
+from cogs.paginator import wl_ratio_pages  # noqa: E402
+
+RUNS = 5
+
+# What /paginate ran before player_stats existed
+ORIGINAL_QUERY = '''
+    WITH Wins AS (
+        SELECT winner_id as player_id, COUNT(*) as win_count FROM match_data GROUP BY winner_id
+    ),
+    Losses AS (
+        SELECT loser_id as player_id, COUNT(*) as loss_count FROM match_data GROUP BY loser_id
+    )
+    SELECT COALESCE(Wins.player_id, Losses.player_id) as player_id,
+           COALESCE(win_count, 0) as wins, COALESCE(loss_count, 0) as losses,
+           CASE WHEN COALESCE(loss_count, 0) = 0 THEN COALESCE(win_count, 0)
+                ELSE CAST(COALESCE(win_count, 0) AS FLOAT) / COALESCE(loss_count, 0) END AS wl_ratio
+    FROM Wins LEFT JOIN Losses ON Wins.player_id = Losses.player_id
+    UNION
+    SELECT COALESCE(Wins.player_id, Losses.player_id) as player_id,
+           COALESCE(win_count, 0) as wins, COALESCE(loss_count, 0) as losses,
+           CASE WHEN COALESCE(loss_count, 0) = 0 THEN COALESCE(win_count, 0)
+                ELSE CAST(COALESCE(win_count, 0) AS FLOAT) / COALESCE(loss_count, 0) END AS wl_ratio
+    FROM Losses LEFT JOIN Wins ON Losses.player_id = Wins.player_id
+    ORDER BY wl_ratio DESC, wins DESC
+'''
+
+
+def populate(conn, matches, players):
+    random.seed(matches)
+    now = datetime.datetime.utcnow()
+    conn.executemany(
+        "INSERT INTO elo_data (player_id, elo, highest_elo, inactive) VALUES (?, ?, ?, ?)",
+        [(pid, random.randint(800, 2000), 2000, int(random.random() < 0.1)) for pid in range(1, players + 1)],
+    )
+    rows = []
+    for _ in range(matches):
+        winner_id, loser_id = random.sample(range(1, players + 1), 2)
+        date = now - datetime.timedelta(minutes=random.randint(0, 60 * 24 * 365))
+        rows.append((date.strftime('%Y-%m-%d %H:%M:%S'), winner_id, loser_id, 10, 1200, 1200, 1))
+    rows.sort()
+    conn.executemany(
+        "INSERT INTO match_data (date, winner_id, loser_id, elo_change, elo_winner, elo_loser, multiplier) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+
+
+def original(conn):
+    rows = conn.execute(ORIGINAL_QUERY).fetchall()
+    return [f"`{rank})` <@{player_id}> **{wl_ratio:.2f} ({wins}W/{losses}L)**"
+            for rank, (player_id, wins, losses, wl_ratio) in enumerate(rows, start=1)]
+
+
+async def best_of(fn):
+    best = None
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        await fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+async def time_pages(months):
+    counted = await best_of(lambda: wl_ratio_pages(months).count())
+    first = await best_of(lambda: wl_ratio_pages(months).page(1))
+
+    # Walk to the middle once so the deep page can be sought from its neighbour, as the buttons would
+    pages = wl_ratio_pages(months)
+    middle = await pages.page_count() // 2 or 1
+    for number in range(1, middle):
+        await pages.page(number)
+
+    async def deep_page():
+        pages._pages.pop(middle, None)
+        await pages.page(middle)
+
+    deep = await best_of(deep_page)
+    return counted, first, deep, middle
+
+
+async def main(matches, players):
+    with database.write() as conn:
+        populate(conn, matches, players)
+    started = time.perf_counter()
+    await elo_system.rebuild_player_stats()
+    rebuild = (time.perf_counter() - started) * 1000
+    print(f"{matches} matches, {players} players")
+    print(f"  rebuild player_stats          {rebuild:8.1f} ms")
+
+    original_ms = await best_of(lambda: database.run_read(original))
+    print(f"  original query + format all   {original_ms:8.1f} ms")
+
+    for months in (0, 1):
+        counted, first, deep, middle = await time_pages(months)
+        label = f"months={months}"
+        print(f"  {label:<9} COUNT               {counted:8.2f} ms")
+        print(f"  {label:<9} first page          {first:8.2f} ms")
+        print(f"  {label:<9} page {middle:<5}          {deep:8.2f} ms")
+
+    database.close()
+
+
+if __name__ == "__main__":
+    matches = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    players = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    asyncio.run(main(matches, players))
@@ -0,0 +1,146 @@
+#! /usr/bin/python3
+"""Runs the Challonge client (challonge_api.py) against a local fake server that
+injects failures, and checks how it copes:
+  - 5xx on a share of GETs: retried with backoff until they go through,
+  - a server-side rate limit answering 429 + Retry-After (as seconds or as an
+    HTTP date): the token bucket pauses and every request still succeeds,
+  - a POST that gets a 5xx: not resent (it may have gone through),
+  - a request slower than the timeout, a 404, a Retry-After past
+    CHALLONGE_BACKOFF_MAX, a port nothing listens on: each raises its
+    ChallongeError subclass after the expected number of attempts.
+Prints the client's counters (what /challonge_stats shows) after each part.
+
+Run from the repository root (needs the bot's requirements installed):
+    python scripts/stress_challonge.py [requests]      # default: 200
+"""
+import asyncio
+import email.utils
+import os
+import random
+import sys
+import time
+
+# Short waits so the run takes seconds, not minutes; set before settings.py is imported
+os.environ.setdefault("GUILD", "0")
+os.environ.setdefault("CHALLONGE_BACKOFF_BASE", "0.05")
+os.environ.setdefault("CHALLONGE_BACKOFF_MAX", "2")
+os.environ.setdefault("CHALLONGE_RETRIES", "6")
+os.environ.setdefault("CHALLONGE_RATE_LIMIT", "100")
+os.environ.setdefault("CHALLONGE_RATE_BURST", "20")
+os.environ.setdefault("CHALLONGE_TIMEOUT", "0.5")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import web  # noqa: E402
+
+import challonge_api  # noqa: E402
+
+SERVER_RATE = 40  # requests per second the fake server takes on /limited before answering 429
+
+
+class FakeChallonge:
+    def __init__(self):
+        self.window = (0, 0)  # (second, requests in it) for /limited
+        self.posts = 0
+
+    async def flaky(self, request):
+        if random.random() < 0.3:
+            return web.Response(status=random.choice((500, 502, 503)), text="injected")
+        return web.json_response({"data": []})
+
+    async def limited(self, request):
+        second = int(time.monotonic())
+        count = self.window[1] + 1 if self.window[0] == second else 1
+        self.window = (second, count)
+        if count > SERVER_RATE:
+            if random.random() < 0.5:
+                retry_after = "1"
+            else:
+                retry_after = email.utils.formatdate(time.time() + 1, usegmt=True)
+            return web.Response(status=429, text="slow down", headers={"Retry-After": retry_after})
+        return web.json_response({"data": []})
+
+    async def post_fails(self, request):
+        self.posts += 1
+        return web.Response(status=500, text="injected")
+
+    async def slow(self, request):
+        await asyncio.sleep(2)
+        return web.json_response({})
+
+    async def missing(self, request):
+        return web.Response(status=404, text="not found")
+
+    async def long_retry_after(self, request):
+        return web.Response(status=429, text="come back tomorrow", headers={"Retry-After": "3600"})
+
+
+def print_stats(title, client):
+    stats = client.stats()
+    print(f"{title}\n  requests {stats['requests']}, attempts {stats['attempts']}, retries {stats['retries']}, "
+          f"failures {stats['failures']}, 429s {stats['rate_limited']}, throttled {stats['throttled']} "
+          f"({stats['throttle_wait']:.2f}s), latency avg {stats['latency_avg'] * 1000:.1f} ms / "
+          f"p95 {stats['latency_p95'] * 1000:.1f} ms\n  statuses {stats['statuses']}")
+
+
+async def expect_error(client, error_type, attempts, method, endpoint):
+    before = client.attempts
+    try:
+        await client.request(method, endpoint)
+    except error_type as e:
+        assert client.attempts - before == attempts, (endpoint, client.attempts - before)
+        print(f"  {method} {endpoint}: {type(e).__name__} after {attempts} attempt(s)")
+        return
+    raise AssertionError(f"{method} {endpoint} didn't raise {error_type.__name__}")
+
+
+async def main(requests):
+    random.seed(requests)
+    fake = FakeChallonge()
+    app = web.Application()
+    app.router.add_get("/flaky", fake.flaky)
+    app.router.add_get("/limited", fake.limited)
+    app.router.add_post("/post_fails", fake.post_fails)
+    app.router.add_get("/slow", fake.slow)
+    app.router.add_get("/missing", fake.missing)
+    app.router.add_get("/long_retry_after", fake.long_retry_after)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    retries = challonge_api.settings.CHALLONGE_RETRIES
+
+    client = challonge_api.ChallongeClient("key", f"http://127.0.0.1:{port}")
+    started = time.perf_counter()
+    await asyncio.gather(*(client.request("GET", "flaky") for _ in range(requests)))
+    print_stats(f"{requests} GETs, 30% answered 5xx: all succeeded in {time.perf_counter() - started:.2f}s", client)
+    assert client.failures == 0 and client.retried > 0
+    await client.close()
+
+    client = challonge_api.ChallongeClient("key", f"http://127.0.0.1:{port}")
+    started = time.perf_counter()
+    await asyncio.gather(*(client.request("GET", "limited") for _ in range(requests)))
+    print_stats(f"{requests} GETs against a {SERVER_RATE}/s limit: all succeeded in "
+                f"{time.perf_counter() - started:.2f}s", client)
+    assert client.failures == 0 and client.rate_limited > 0
+    await client.close()
+
+    client = challonge_api.ChallongeClient("key", f"http://127.0.0.1:{port}")
+    print("Failures that reach the caller")
+    await expect_error(client, challonge_api.ChallongeServerError, 1, "POST", "post_fails")
+    assert fake.posts == 1
+    await expect_error(client, challonge_api.ChallongeConnectionError, retries + 1, "GET", "slow")
+    await expect_error(client, challonge_api.ChallongeError, 1, "GET", "missing")
+    await expect_error(client, challonge_api.ChallongeRateLimited, 1, "GET", "long_retry_after")
+    await client.close()
+
+    refused = challonge_api.ChallongeClient("key", "http://127.0.0.1:9")
+    await expect_error(refused, challonge_api.ChallongeConnectionError, retries + 1, "POST", "refused")
+    print_stats("Failures", client)
+    await refused.close()
+    await runner.cleanup()
+    print("OK")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
@@ -0,0 +1,148 @@
+#! /usr/bin/python3
+"""Checks that heavy database reads don't block the event loop.
+
+Builds a scratch database with a synthetic match history, then runs a ticker
+task that sleeps TICK seconds at a time and records how late each wake-up is
+(the event loop lag) while slow reads go through database.run_read:
+  - the W/L ratio aggregate that /paginate used to run over all of match_data
+    (the old get_wl_ratio_data), repeated so each read takes a while,
+  - /audit_elo's full replay of match_data.
+As a control, the same aggregate is then run directly on the event loop, which
+the ticker must see as lag - otherwise it couldn't have caught a blocked loop.
+
+Exits non-zero if the lag during the reads passes the threshold, or if the
+control doesn't. The default threshold (150 ms) leaves room for the reads'
+Python work competing with the loop for the GIL - tens of milliseconds on a
+single core - while a read on the loop itself blocks it for the whole read.
+
+Run from the repository root (needs the bot's requirements installed):
+    python scripts/stress_event_loop.py [threshold_ms] [matches] [players]
+"""
+import asyncio
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Point the bot at a scratch database before settings.py is imported
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="elobot-stress-"), "stress.db")
+os.environ.setdefault("GUILD", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+from cogs import elo_system  # noqa: E402
+
+TICK = 0.005
+REPEATS = 10  # aggregates per slow read
+
+# What /paginate ran for the W/L ratio before player_stats existed
+WL_RATIO_QUERY = '''
+    WITH Wins AS (
+        SELECT winner_id as player_id, COUNT(*) as win_count FROM match_data GROUP BY winner_id
+    ),
+    Losses AS (
+        SELECT loser_id as player_id, COUNT(*) as loss_count FROM match_data GROUP BY loser_id
+    )
+    SELECT COALESCE(Wins.player_id, Losses.player_id) as player_id,
+           COALESCE(win_count, 0) as wins, COALESCE(loss_count, 0) as losses,
+           CASE WHEN COALESCE(loss_count, 0) = 0 THEN COALESCE(win_count, 0)
+                ELSE CAST(COALESCE(win_count, 0) AS FLOAT) / COALESCE(loss_count, 0) END AS wl_ratio
+    FROM Wins LEFT JOIN Losses ON Wins.player_id = Losses.player_id
+    UNION
+    SELECT COALESCE(Wins.player_id, Losses.player_id) as player_id,
+           COALESCE(win_count, 0) as wins, COALESCE(loss_count, 0) as losses,
+           CASE WHEN COALESCE(loss_count, 0) = 0 THEN COALESCE(win_count, 0)
+                ELSE CAST(COALESCE(win_count, 0) AS FLOAT) / COALESCE(loss_count, 0) END AS wl_ratio
+    FROM Losses LEFT JOIN Wins ON Losses.player_id = Wins.player_id
+    ORDER BY wl_ratio DESC, wins DESC
+'''
+
+
+def populate(conn, matches, players):
+    random.seed(matches)
+    now = datetime.datetime.utcnow()
+    conn.executemany(
+        "INSERT INTO elo_data (player_id, elo, highest_elo, inactive) VALUES (?, ?, ?, 0)",
+        [(pid, 1200, 1200) for pid in range(1, players + 1)],
+    )
+    rows = []
+    for _ in range(matches):
+        winner_id, loser_id = random.sample(range(1, players + 1), 2)
+        date = now - datetime.timedelta(minutes=random.randint(0, 60 * 24 * 365))
+        rows.append((date.strftime('%Y-%m-%d %H:%M:%S'), winner_id, loser_id, 10, 1200, 1200, 1))
+    rows.sort()
+    conn.executemany(
+        "INSERT INTO match_data (date, winner_id, loser_id, elo_change, elo_winner, elo_loser, multiplier) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+
+
+def slow_wl_ratio(conn):
+    for _ in range(REPEATS):
+        rows = conn.execute(WL_RATIO_QUERY).fetchall()
+    return len(rows)
+
+
+async def ticker(stop, lags):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + TICK
+        await asyncio.sleep(TICK)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def measure(work):
+    """Runs `work` (a coroutine) next to the ticker; returns (seconds it took, worst lag)."""
+    stop = asyncio.Event()
+    lags = []
+    tick = asyncio.create_task(ticker(stop, lags))
+    await asyncio.sleep(TICK * 4)  # let the ticker get going
+    started = time.perf_counter()
+    await work
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await tick
+    return elapsed, max(lags)
+
+
+async def main(threshold, matches, players):
+    with database.write() as conn:
+        populate(conn, matches, players)
+    print(f"{matches} matches between {players} players, lag threshold {threshold * 1000:.0f} ms")
+
+    async def heavy_reads():
+        await asyncio.gather(
+            database.run_read(slow_wl_ratio),
+            database.run_read(slow_wl_ratio),
+            database.run_read(elo_system._audit_elo),
+        )
+
+    async def blocking_read():
+        with database.read() as conn:
+            slow_wl_ratio(conn)
+
+    elapsed, lag = await measure(heavy_reads())
+    print(f"  reads through run_read: {elapsed:.2f}s, worst loop lag {lag * 1000:.1f} ms")
+    control_elapsed, control_lag = await measure(blocking_read())
+    print(f"  same read on the loop:  {control_elapsed:.2f}s, worst loop lag {control_lag * 1000:.1f} ms (control)")
+
+    problems = []
+    if lag > threshold:
+        problems.append(f"the event loop lagged {lag * 1000:.1f} ms while reads ran in the thread pool")
+    if control_lag <= threshold:
+        problems.append("the control read didn't block the loop past the threshold; use more matches")
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    database.close()
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    threshold = (float(sys.argv[1]) if len(sys.argv) > 1 else 150) / 1000
+    matches = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+    players = int(sys.argv[3]) if len(sys.argv) > 3 else 5000
+    raise SystemExit(asyncio.run(main(threshold, matches, players)))
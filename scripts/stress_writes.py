@@ -0,0 +1,135 @@
+#! /usr/bin/python3
+"""Stress test for the database writer queue.
+
+Fires a burst of concurrent fake /report calls (plus a few writes that fail on
+purpose) at a throwaway database while leaderboard-style reads run alongside,
+then checks that:
+  - every report was recorded exactly once and the failing writes left nothing behind,
+  - the stored ratings match a full replay of match_data (/audit_elo),
+  - bursts were group-committed (fewer commits than writes),
+  - reads kept flowing while the writes were queued,
+  - per-player locks lose no updates in a deliberately racy read-await-write,
+    never deadlock on pairs taken in both orders, and let disjoint pairs overlap.
+
+Run from the repository root (needs the bot's requirements installed):
+    python scripts/stress_writes.py [reports] [players]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Point the bot at a scratch database before settings.py is imported
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="elobot-stress-"), "stress.db")
+os.environ.setdefault("GUILD", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import locks  # noqa: E402
+from cogs import elo_system  # noqa: E402
+
+
+class FakeReportError(Exception):
+    pass
+
+
+def _failing_write(conn):
+    conn.execute("INSERT INTO match_data (date, winner_id, loser_id) VALUES ('never', -1, -2)")
+    raise FakeReportError("this write must be rolled back")
+
+
+async def report(winner_id, loser_id):
+    await asyncio.sleep(random.random() / 100)  # spread the burst out a little, like real interactions
+    return await elo_system.record_match(winner_id, loser_id)
+
+
+async def reader(stop, latencies):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await database.fetchall("SELECT player_id, elo FROM elo_data WHERE inactive = 0 ORDER BY elo DESC")
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0)
+
+
+async def locked_increment(counters, a, b, active):
+    # Read both counters, yield to the loop, then write them back: without the
+    # locks, concurrent calls on a shared player would overwrite each other.
+    async with locks.players.hold(b, a):
+        active["now"] += 1
+        active["max"] = max(active["max"], active["now"])
+        seen_a, seen_b = counters[a], counters[b]
+        await asyncio.sleep(random.random() / 1000)
+        counters[a], counters[b] = seen_a + 1, seen_b + 1
+        active["now"] -= 1
+
+
+async def check_player_locks(pairs, players):
+    counters = {pid: 0 for pid in range(1, players + 1)}
+    expected = dict.fromkeys(counters, 0)
+    for a, b in pairs:
+        expected[a] += 1
+        expected[b] += 1
+    active = {"now": 0, "max": 0}
+    await asyncio.wait_for(asyncio.gather(*(locked_increment(counters, a, b, active) for a, b in pairs)), timeout=60)
+    return counters == expected, active["max"], len(locks.players)
+
+
+async def main(reports, players):
+    random.seed(reports)
+    jobs = [report(*random.sample(range(1, players + 1), 2)) for _ in range(reports)]
+    jobs += [database.run_write(_failing_write) for _ in range(5)]
+    random.shuffle(jobs)
+
+    stop = asyncio.Event()
+    latencies = []
+    readers = [asyncio.create_task(reader(stop, latencies)) for _ in range(4)]
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*jobs, return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(*readers)
+
+    failures = [o for o in outcomes if isinstance(o, Exception)]
+    unexpected = [o for o in failures if not isinstance(o, FakeReportError)]
+    recorded = (await database.fetchone("SELECT COUNT(*) FROM match_data"))[0]
+    match_count, divergences = await elo_system.audit_elo()
+    db = database.get_db()
+    locks_ok, max_parallel, leftover_locks = await check_player_locks(
+        [random.sample(range(1, players + 1), 2) for _ in range(reports)], players
+    )
+
+    print(f"{reports} reports in {elapsed:.2f}s - {db.writes} writes in {db.commits} commits")
+    print(f"{len(latencies)} reads during the burst, slowest {max(latencies) * 1000:.1f} ms")
+    print(f"player locks: up to {max_parallel} disjoint pairs at once")
+
+    problems = []
+    if unexpected:
+        problems.append(f"unexpected errors: {unexpected[:3]}")
+    if len(failures) != 5:
+        problems.append(f"expected 5 failed writes, got {len(failures)}")
+    if recorded != reports or match_count != reports:
+        problems.append(f"expected {reports} matches, found {recorded}")
+    if divergences:
+        problems.append(f"{len(divergences)} players differ from a full replay")
+    if db.commits >= db.writes:
+        problems.append("writes were not group-committed")
+    if not locks_ok:
+        problems.append("lost updates under per-player locks")
+    if max_parallel < 2:
+        problems.append("disjoint pairs never held their locks at the same time")
+    if leftover_locks:
+        problems.append(f"{leftover_locks} player locks left behind")
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    database.close()
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    reports = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    players = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    raise SystemExit(asyncio.run(main(reports, players)))
@@ -18,6 +18,66 @@ VIDEOCMDS_DIR = BASE_DIR / "videocmds"
 
 GUILDS_ID = discord.Object(id=int(os.getenv("GUILD")))
 
+# --- Database ----------------------------------------------------------------
+# Every cog goes through database.py, which keeps one writer connection plus a
+# small pool of reader connections open to this file. Override DB_PATH in .env
+# to point a test server at its own copy.
+DB_PATH = os.getenv("DB_PATH", "elo_data.db")
+DB_READERS = int(os.getenv("DB_READERS", 4))
+# Writes queued while another batch is committing are applied together in one
+# transaction (group commit); this caps how many go into a single batch.
+DB_WRITE_BATCH = int(os.getenv("DB_WRITE_BATCH", 64))
+# Applied to every connection as `PRAGMA name = value` right after it's opened.
+DB_PRAGMAS = {
+    # WAL lets readers (leaderboard, paginator, ...) keep going while a write commits
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",  # safe with WAL; only the last commits can be lost on power failure
+    "busy_timeout": 5000,     # ms to wait for a lock (e.g. an external sqlite3 shell) before erroring
+    "temp_store": "MEMORY",
+    "cache_size": -16000,  # negative = KiB, so ~16 MB page cache per connection
+}
+
+# --- Leaderboard -------------------------------------------------------------
+# The movement arrows compare each player's rank with the daily rank snapshot
+# taken this many days earlier (see cogs/leaderboard.py). Snapshots older than
+# RANK_SNAPSHOT_KEEP_DAYS are pruned.
+LEADERBOARD_MOVEMENT_DAYS = int(os.getenv("LEADERBOARD_MOVEMENT_DAYS", 5))
+RANK_SNAPSHOT_KEEP_DAYS = int(os.getenv("RANK_SNAPSHOT_KEEP_DAYS", 30))
+# Live leaderboard messages (/set_leaderbord) re-render once the standings have
+# been quiet for LEADERBOARD_REFRESH_DELAY seconds, so a burst of reports or a
+# Challonge import turns into one edit - but never wait more than
+# LEADERBOARD_REFRESH_MAX_DELAY seconds after the first change.
+LEADERBOARD_REFRESH_DELAY = float(os.getenv("LEADERBOARD_REFRESH_DELAY", 10))
+LEADERBOARD_REFRESH_MAX_DELAY = float(os.getenv("LEADERBOARD_REFRESH_MAX_DELAY", 60))
+
+# --- Challonge ---------------------------------------------------------------
+# cogs/challonge.py keeps one pooled HTTP session open to the API (see
+# challonge_api.py). CHALLONGE_BASE_URL can point it at a local stand-in server.
+CHALLONGE_BASE_URL = os.getenv("CHALLONGE_BASE_URL", "https://api.challonge.com/v2.1")
+CHALLONGE_MAX_CONNECTIONS = int(os.getenv("CHALLONGE_MAX_CONNECTIONS", 10))
+CHALLONGE_KEEPALIVE = float(os.getenv("CHALLONGE_KEEPALIVE", 30))  # s an idle connection stays open
+CHALLONGE_TIMEOUT = float(os.getenv("CHALLONGE_TIMEOUT", 30))  # s for a whole request, response included
+CHALLONGE_CONNECT_TIMEOUT = float(os.getenv("CHALLONGE_CONNECT_TIMEOUT", 10))
+# Requests are paced to CHALLONGE_RATE_LIMIT per second (bursts of up to
+# CHALLONGE_RATE_BURST); lower it if /challonge_stats shows 429s. A 429, 5xx or
+# timeout is retried up to CHALLONGE_RETRIES times, waiting a random share of
+# CHALLONGE_BACKOFF_BASE * 2^n seconds (capped at CHALLONGE_BACKOFF_MAX) or
+# whatever Retry-After asks for.
+CHALLONGE_RATE_LIMIT = float(os.getenv("CHALLONGE_RATE_LIMIT", 5))
+CHALLONGE_RATE_BURST = int(os.getenv("CHALLONGE_RATE_BURST", 10))
+CHALLONGE_RETRIES = int(os.getenv("CHALLONGE_RETRIES", 4))
+CHALLONGE_BACKOFF_BASE = float(os.getenv("CHALLONGE_BACKOFF_BASE", 0.5))
+CHALLONGE_BACKOFF_MAX = float(os.getenv("CHALLONGE_BACKOFF_MAX", 30))
+# Lists (participants, matches, tournaments) are fetched this many per page;
+# the API may cap it lower, in which case its next-page links take over.
+CHALLONGE_PAGE_SIZE = int(os.getenv("CHALLONGE_PAGE_SIZE", 100))
+# /create_tournament adds participants through the bulk_add endpoint; if that's
+# refused it falls back to one request per participant, at most
+# CHALLONGE_CONCURRENCY in flight. Participants that fail are retried for up to
+# CHALLONGE_ADD_RETRIES more rounds before being reported as not added.
+CHALLONGE_CONCURRENCY = int(os.getenv("CHALLONGE_CONCURRENCY", 5))
+CHALLONGE_ADD_RETRIES = int(os.getenv("CHALLONGE_ADD_RETRIES", 2))
+
 
 def _role_id(env_name, default):
     """Read a role ID from the environment, falling back to `default`.
@@ -0,0 +1,105 @@
+"""Change notifications for the standings (ratings and match history), and a
+cache of leaderboards computed from them.
+
+Every write path in elo_system that changes what a leaderboard would show -
+a recorded or imported match, a removed or edited game, a manual ELO change,
+(in)activity, a reset, an /audit_elo rewrite or a player_stats rebuild - calls
+changed() once its transaction has committed.
+That bumps `version` and calls every subscribed callback, which is how the
+live leaderboard messages know to re-render.
+
+Callbacks run synchronously, inside the coroutine that made the change,
+so they must only schedule work (e.g. set an event), never await or block.
+
+`leaderboards` keeps rendered leaderboard rows until the version moves on, so
+repeated "See all" clicks or a live refresh after an unrelated write don't
+redo the queries.
+
+Lives outside cogs/ for the same reason as ratings.py: a reloaded cog has to
+find the same subscriber list everyone else notifies.
+"""
+import settings
+
+logger = settings.logging.getLogger("bot")
+
+version = 0
+_listeners = []
+
+
+def subscribe(callback):
+    if callback not in _listeners:
+        _listeners.append(callback)
+
+
+def unsubscribe(callback):
+    if callback in _listeners:
+        _listeners.remove(callback)
+
+
+def changed():
+    global version
+    version += 1
+    for callback in list(_listeners):
+        try:
+            callback()
+        except Exception:
+            # The write already committed; a broken listener must not fail it
+            logger.exception("Standings listener failed")
+
+
+# Leaderboards are computed for the smallest of these that covers the requested
+# limit, so the top 10 (embed), 200 ("See all") and 1000 (/set_leaderbord's
+# mention list) each cost at most one computation per version.
+LIMIT_BUCKETS = (10, 200, 1000)
+
+
+class LeaderboardCache:
+    """(filter_mode, filter_data, limit bucket) -> rows, valid for one standings version."""
+
+    def __init__(self):
+        self._version = version
+        self._rows = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def bucket(limit):
+        return next((size for size in LIMIT_BUCKETS if size >= limit), limit)
+
+    def get(self, filter_mode, filter_data, limit):
+        """The first `limit` rows, served from any cached bucket that holds them; None on a miss."""
+        if self._version != version:
+            self.invalidate()
+        for (mode, data, size), rows in self._rows.items():
+            # A bucket that came back short holds every row there is
+            if (mode, data) == (filter_mode, filter_data) and (size >= limit or len(rows) < size):
+                self.hits += 1
+                return rows[:limit]
+        self.misses += 1
+        return None
+
+    def put(self, filter_mode, filter_data, size, rows, computed_at):
+        """Stores rows computed for `size` while the standings were at version `computed_at`
+        (dropped if they changed in the meantime)."""
+        if computed_at != version:
+            return
+        if self._version != version:
+            self.invalidate()
+        self._rows[(filter_mode, filter_data, size)] = rows
+
+    def invalidate(self):
+        """Drops everything, e.g. when the time-dependent parts (movement window) move on."""
+        self._rows = {}
+        self._version = version
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._rows),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+leaderboards = LeaderboardCache()